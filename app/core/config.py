@@ -27,7 +27,43 @@ class Settings:
     INSTAGRAM_CLIENT_ID = os.getenv("INSTAGRAM_CLIENT_ID", "")
     INSTAGRAM_CLIENT_SECRET = os.getenv("INSTAGRAM_CLIENT_SECRET", "")
 
+    # PAYMENT GATEWAY (Paymongo)
+    PAYMONGO_SECRET_KEY = os.getenv("PAYMONGO_SECRET_KEY", "")
+    PAYMONGO_API_BASE = os.getenv("PAYMONGO_API_BASE", "https://api.paymongo.com/v1")
+    PAYMONGO_TIMEOUT_SECONDS = float(os.getenv("PAYMONGO_TIMEOUT_SECONDS", 10))
+    PAYMENT_LINK_TTL_HOURS = int(os.getenv("PAYMENT_LINK_TTL_HOURS", 48)) # Bookings with a checkout link aren't expired sooner
+
+    # BACKGROUND JOBS
+    BOOKING_SWEEP_INTERVAL_SECONDS = int(os.getenv("BOOKING_SWEEP_INTERVAL_SECONDS", 900)) # 0 disables
+    PAYMENT_EVENT_POLL_SECONDS = float(os.getenv("PAYMENT_EVENT_POLL_SECONDS", 5)) # 0 disables the in-app worker
+
+    # IMAGE UPLOADS
+    IMAGE_MAX_UPLOAD_MB = int(os.getenv("IMAGE_MAX_UPLOAD_MB", 10))
+    IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", 4))
+    MEDIA_CACHE_DIR = os.getenv("MEDIA_CACHE_DIR", "storage/media_cache")
+    MEDIA_CACHE_MAX_MB = int(os.getenv("MEDIA_CACHE_MAX_MB", 512))
+
+    # CONTRACT PDFs
+    CONTRACT_DIR = os.getenv("CONTRACT_DIR", "storage/contracts") # private; served only through auth-checked routes
+    CONTRACT_RENDER_WORKERS = int(os.getenv("CONTRACT_RENDER_WORKERS", 2))
+
+    # OBJECT STORAGE
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local") # "local" or "s3"
+    PRIVATE_STORAGE_DIR = os.getenv("PRIVATE_STORAGE_DIR", "storage/private") # local backend only
+    STORAGE_PRESIGN_SECONDS = int(os.getenv("STORAGE_PRESIGN_SECONDS", 300))
+    S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL", "http://127.0.0.1:9000")
+    S3_REGION = os.getenv("S3_REGION", "us-east-1")
+    S3_BUCKET = os.getenv("S3_BUCKET", "occashare")
+    S3_ACCESS_KEY = os.getenv("S3_ACCESS_KEY", "")
+    S3_SECRET_KEY = os.getenv("S3_SECRET_KEY", "")
+    S3_VIRTUAL_HOST = os.getenv("S3_VIRTUAL_HOST", "False") == "True" # bucket.host instead of host/bucket
+    S3_PUBLIC_URL = os.getenv("S3_PUBLIC_URL", "") # CDN or public-read base for uploads/; empty = presigned redirects
+
     # KYC CONFIG
     KYC_ENCRYPTION_KEY = os.getenv("KYC_ENCRYPTION_KEY", "")
+    KYC_PREVIOUS_KEYS = os.getenv("KYC_PREVIOUS_KEYS", "") # comma-separated, decrypt-only during rotation
+    KYC_THUMB_CACHE_DIR = os.getenv("KYC_THUMB_CACHE_DIR", "storage/kyc_thumbs") # never under app/static
+    KYC_THUMB_CACHE_MAX_MB = int(os.getenv("KYC_THUMB_CACHE_MAX_MB", 64))
+    KYC_THUMB_TTL_HOURS = int(os.getenv("KYC_THUMB_TTL_HOURS", 72))
 
 settings = Settings()
@@ -1,6 +1,15 @@
 from .config import settings
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, MultiFernet
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, Optional
+import base64
+import hashlib
 import os
+import struct
 
 # prioritize environment-based keys for persistence
 ENCRYPTION_KEY = settings.KYC_ENCRYPTION_KEY
@@ -8,7 +17,10 @@ if not ENCRYPTION_KEY:
     # Fallback only for local development/first run
     ENCRYPTION_KEY = Fernet.generate_key().decode()
 
-cipher_suite = Fernet(ENCRYPTION_KEY.encode())
+# Keys being rotated out: still accepted for reading, never used to encrypt
+PREVIOUS_KEYS = [key.strip() for key in settings.KYC_PREVIOUS_KEYS.split(",") if key.strip()]
+
+cipher_suite = MultiFernet([Fernet(key.encode()) for key in [ENCRYPTION_KEY, *PREVIOUS_KEYS]])
 
 def encrypt_data(data: bytes) -> bytes:
     """Encrypt binary data."""
@@ -17,3 +29,143 @@ def encrypt_data(data: bytes) -> bytes:
 def decrypt_data(data: bytes) -> bytes:
     """Decrypt binary data."""
     return cipher_suite.decrypt(data)
+
+# --- Segmented streaming encryption ---
+#
+# File layout:  header | segment 0 | segment 1 | ... | segment n-1
+# header:       b"OKYC" | version (1) | key id (4) | segment size (u32) | salt (16) | nonce prefix (7)
+# segment:      AES-256-GCM(plaintext[i * size:(i + 1) * size]) + 16-byte tag
+#
+# Each file gets its own AES key, derived with HKDF from the master key named by the
+# header's key id and the random salt. Segment nonces are nonce prefix | segment index (u32) | last-segment flag, and
+# every segment authenticates the header, so segments cannot be reordered, swapped
+# between files or truncated without failing decryption. Only a segment at a time is
+# held in memory, and a byte range decrypts just the segments it touches.
+
+STREAM_MAGIC = b"OKYC"
+STREAM_VERSION = 1
+SEGMENT_SIZE = 64 * 1024
+TAG_SIZE = 16
+_HEADER = struct.Struct(">4sB4sI16s7s")
+HEADER_SIZE = _HEADER.size
+
+class DecryptionError(Exception):
+    """The file is corrupt, was tampered with, or was encrypted under another key."""
+
+def _master_key(key: str) -> bytes:
+    # The Fernet key doubles as the master key: 32 random bytes, urlsafe-base64 encoded
+    return base64.urlsafe_b64decode(key.encode())
+
+def key_id(key: str = ENCRYPTION_KEY) -> bytes:
+    return hashlib.sha256(_master_key(key)).digest()[:4]
+
+# key id -> key, for every key that can still decrypt; the current key wins a collision
+KEYRING: Dict[bytes, str] = {key_id(key): key for key in reversed([ENCRYPTION_KEY, *PREVIOUS_KEYS])}
+
+@dataclass
+class StreamHeader:
+    key_id: bytes
+    segment_size: int
+    salt: bytes
+    nonce_prefix: bytes
+    raw: bytes
+
+    @classmethod
+    def new(cls, key: str = ENCRYPTION_KEY, segment_size: int = SEGMENT_SIZE) -> "StreamHeader":
+        kid, salt, prefix = key_id(key), os.urandom(16), os.urandom(7)
+        raw = _HEADER.pack(STREAM_MAGIC, STREAM_VERSION, kid, segment_size, salt, prefix)
+        return cls(kid, segment_size, salt, prefix, raw)
+
+    @classmethod
+    def parse(cls, raw: bytes) -> "StreamHeader":
+        if len(raw) < HEADER_SIZE or not is_stream(raw):
+            raise DecryptionError("Not a segmented KYC file")
+        magic, version, kid, segment_size, salt, prefix = _HEADER.unpack(raw[:HEADER_SIZE])
+        if version != STREAM_VERSION or not segment_size:
+            raise DecryptionError(f"Unsupported KYC file version {version}")
+        return cls(kid, segment_size, salt, prefix, raw[:HEADER_SIZE])
+
+    @property
+    def is_current(self) -> bool:
+        """Encrypted under KYC_ENCRYPTION_KEY (rather than a key being rotated out)."""
+        return self.key_id == key_id()
+
+    def cipher(self, key: Optional[str] = None) -> AESGCM:
+        """File cipher; without `key` the master key is looked up in KEYRING by key id."""
+        key = key or KEYRING.get(self.key_id)
+        if key is None or self.key_id != key_id(key):
+            raise DecryptionError(f"File was encrypted under key {self.key_id.hex()}, which is not configured")
+        hkdf = HKDF(algorithm=hashes.SHA256(), length=32, salt=self.salt, info=b"occashare-kyc-stream")
+        return AESGCM(hkdf.derive(_master_key(key)))
+
+    def nonce(self, index: int, last: bool) -> bytes:
+        return self.nonce_prefix + struct.pack(">IB", index, 1 if last else 0)
+
+    def segment_count(self, ciphertext_size: int) -> int:
+        body = ciphertext_size - HEADER_SIZE
+        sealed = self.segment_size + TAG_SIZE
+        return max(1, -(-body // sealed))
+
+    def plaintext_size(self, ciphertext_size: int) -> int:
+        return ciphertext_size - HEADER_SIZE - self.segment_count(ciphertext_size) * TAG_SIZE
+
+def is_stream(prefix: bytes) -> bool:
+    return prefix[:len(STREAM_MAGIC)] == STREAM_MAGIC
+
+def encrypt_stream(chunks: Iterable[bytes], key: str = ENCRYPTION_KEY, segment_size: int = SEGMENT_SIZE) -> Iterator[bytes]:
+    """Yields the header, then one sealed segment per `segment_size` bytes of input."""
+    header = StreamHeader.new(key, segment_size)
+    cipher = header.cipher(key)
+    yield header.raw
+    buffer = bytearray()
+    index = 0
+    for chunk in chunks:
+        buffer += chunk
+        # Strictly more than a segment buffered, so the final segment is always known as such
+        while len(buffer) > segment_size:
+            yield cipher.encrypt(header.nonce(index, False), bytes(buffer[:segment_size]), header.raw)
+            del buffer[:segment_size]
+            index += 1
+    yield cipher.encrypt(header.nonce(index, True), bytes(buffer), header.raw)
+
+def decrypt_range(
+    header: StreamHeader,
+    fetch: Callable[[int, int], Iterable[bytes]],
+    ciphertext_size: int,
+    start: int = 0,
+    end: int = None,
+    key: Optional[str] = None
+) -> Iterator[bytes]:
+    """
+    Plaintext bytes start..end (inclusive). `fetch(first, last)` returns ciphertext bytes
+    first..last, e.g. a storage range read; only the covering segments are fetched.
+    """
+    size = header.plaintext_size(ciphertext_size)
+    end = size - 1 if end is None else min(end, size - 1)
+    if start > end:
+        return
+    cipher = header.cipher(key)
+    segment_size, sealed = header.segment_size, header.segment_size + TAG_SIZE
+    count = header.segment_count(ciphertext_size)
+    first, last = start // segment_size, end // segment_size
+
+    def open_segment(index: int, data: bytes) -> bytes:
+        try:
+            plain = cipher.decrypt(header.nonce(index, index == count - 1), data, header.raw)
+        except InvalidTag as e:
+            raise DecryptionError(f"Segment {index} failed authentication") from e
+        offset = index * segment_size
+        return plain[max(0, start - offset):end - offset + 1]
+
+    buffer = bytearray()
+    index = first
+    stop = min(ciphertext_size, HEADER_SIZE + (last + 1) * sealed) - 1
+    for chunk in fetch(HEADER_SIZE + first * sealed, stop):
+        buffer += chunk
+        while len(buffer) >= sealed and index < last:
+            yield open_segment(index, bytes(buffer[:sealed]))
+            del buffer[:sealed]
+            index += 1
+    if index != last or not buffer:
+        raise DecryptionError("File is truncated")
+    yield open_segment(index, bytes(buffer))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Float, DateTime, ForeignKey, Boolean, Date, Time, DECIMAL, ARRAY
+from sqlalchemy import BigInteger, Column, Integer, String, Text, Float, DateTime, ForeignKey, Boolean, Date, Time, DECIMAL, ARRAY, Index, UniqueConstraint, CheckConstraint
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -87,6 +87,14 @@ class CatererProfile(Base):
     primary_color = Column(String, default="#2D3748") # Deep Blue/Gray
     secondary_color = Column(String, default="#4A5568") # Gray
     accent_color = Column(String, default="#48BB78") # Green
+
+    # Bumped whenever blocked dates or confirmed bookings change (calendar ETags)
+    availability_version = Column(Integer, default=0)
+    availability_updated_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Daily capacity enforced by caterer_day_slots
+    max_events_per_day = Column(Integer, default=1)
+    max_pax_per_day = Column(Integer, nullable=True) # None means no pax limit
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
@@ -129,6 +137,7 @@ class CateringPackage(Base):
     is_active = Column(Boolean, default=True)
     status = Column(String, default="active") # active, inactive, draft
     is_featured = Column(Boolean, default=False)
+    pricing_version = Column(Integer, default=0) # Bumped on any price/add-on change; keys the pricing cache
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     caterer = relationship("CatererProfile", back_populates="packages")
@@ -202,6 +211,7 @@ class Booking(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     expires_at = Column(DateTime(timezone=True), nullable=True)
+    slot_reserved = Column(Boolean, default=False) # Holds a caterer_day_slots reservation
     reservation_fee = Column(DECIMAL, nullable=True)
     event_location = Column(Text, nullable=True) # Alias for venue_address
 
@@ -216,6 +226,13 @@ class Booking(Base):
     selected_items = relationship("BookingMenuItem", back_populates="booking", cascade="all, delete-orphan")
     payout = relationship("Payout", back_populates="bookings")
 
+    __table_args__ = (
+        # Date-availability lookups (marketplace filter, calendars)
+        Index("ix_bookings_caterer_event_date", "caterer_id", "event_date", "status"),
+        # Booking sweeper scans by status and deadline
+        Index("ix_bookings_status_expires_at", "status", "expires_at"),
+    )
+
 class BookingMenuItem(Base):
     __tablename__ = "booking_menu_items"
 
@@ -300,6 +317,66 @@ class Availability(Base):
 
     caterer = relationship("CatererProfile", back_populates="availability")
 
+    __table_args__ = (
+        # One row per caterer per day; also the conflict target for bulk upserts
+        UniqueConstraint("caterer_id", "date", name="uq_availability_caterer_date"),
+    )
+
+class CatererDaySlot(Base):
+    __tablename__ = "caterer_day_slots"
+
+    id = Column(Integer, primary_key=True, index=True)
+    caterer_id = Column(Integer, ForeignKey("caterer_profiles.id"), nullable=False)
+    date = Column(Date, nullable=False)
+    events_reserved = Column(Integer, default=0, nullable=False)
+    pax_reserved = Column(Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("caterer_id", "date", name="uq_caterer_day_slot"),
+        CheckConstraint("events_reserved >= 0", name="ck_caterer_day_slot_events"),
+    )
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    id = Column(Integer, primary_key=True, index=True)
+    booking_id = Column(Integer, ForeignKey("bookings.id"), nullable=False)
+    action = Column(String(50), nullable=False) # 'reservation_payment', 'balance_payment'…
+    key = Column(String(255), nullable=False) # Client-supplied Idempotency-Key
+    fingerprint = Column(String(64), nullable=True) # Hash of the request parameters the key was first used with
+    status = Column(String(20), default="in_progress") # in_progress, completed
+    response_status = Column(Integer, nullable=True)
+    response_location = Column(String, nullable=True) # Redirect target for HTML flows
+    response_body = Column(Text, nullable=True) # JSON body for API flows
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("booking_id", "action", "key", name="uq_idempotency_booking_action_key"),
+        Index("ix_idempotency_keys_created_at", "created_at"),
+    )
+
+class PaymentEvent(Base):
+    __tablename__ = "payment_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    event_id = Column(String(255), unique=True, nullable=False) # Gateway event id, or a hash of the raw body
+    event_type = Column(String(100), nullable=True) # 'link.payment.paid', 'mock'…
+    booking_id = Column(Integer, ForeignKey("bookings.id"), nullable=True)
+    booking_reference = Column(String(64), nullable=True) # Booking id named by the gateway, kept when it matches no booking
+    payload = Column(JSONB)
+    status = Column(String(20), default="received") # received, processed, ignored, failed
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=True) # Retry backoff after a failed attempt
+    last_error = Column(Text, nullable=True)
+    received_at = Column(DateTime(timezone=True), server_default=func.now())
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Worker scans pending events in arrival order per booking
+        Index("ix_payment_events_status_booking", "status", "booking_id", "id"),
+    )
+
 class Inquiry(Base):
     __tablename__ = "inquiries"
 
@@ -338,6 +415,30 @@ class IdentityVerification(Base):
 
     user = relationship("User", back_populates="identity_verification")
 
+class IdDocumentHash(Base):
+    """Perceptual hashes of every submitted ID image, for duplicate-document lookups."""
+    __tablename__ = "id_document_hashes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), index=True)
+    document_url = Column(String)
+    # 64-bit hashes stored as signed BIGINT
+    phash = Column(BigInteger, nullable=False)
+    dhash = Column(BigInteger, nullable=False)
+    # pHash split into four 16-bit bands; each is indexed for multi-index Hamming search
+    phash_band_0 = Column(Integer, nullable=False)
+    phash_band_1 = Column(Integer, nullable=False)
+    phash_band_2 = Column(Integer, nullable=False)
+    phash_band_3 = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_id_document_hashes_band_0", "phash_band_0"),
+        Index("ix_id_document_hashes_band_1", "phash_band_1"),
+        Index("ix_id_document_hashes_band_2", "phash_band_2"),
+        Index("ix_id_document_hashes_band_3", "phash_band_3"),
+    )
+
 class Notification(Base):
     __tablename__ = "notifications"
 
@@ -399,6 +500,8 @@ class Quotation(Base):
     downpayment_percent = Column(Integer) # CHECK (downpayment_percent BETWEEN 30 AND 50) - handle in app logic or custom CheckConstraint
     contract_url = Column(String, nullable=True) # signed PDF
     status = Column(String(20), default='draft') # draft, sent, signed, rejected
+    signed_name = Column(String, nullable=True) # typed signature of the client
+    signed_at = Column(DateTime(timezone=True), nullable=True)
     
     # Digital Signatures (Base64 or URL to image)
     
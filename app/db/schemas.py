@@ -113,3 +113,27 @@ class BookingResponse(BookingBase):
     class Config:
         from_attributes = True
 
+
+
+# --- Availability Schemas ---
+class AvailabilityRange(BaseModel):
+    start: date
+    end: date
+    weekdays: Optional[List[int]] = None # 0=Monday ... 6=Sunday; None means every day
+
+class AvailabilityBulkUpdate(BaseModel):
+    ranges: List[AvailabilityRange] = []
+    dates: List[date] = []
+    is_available: bool = False
+    reason: Optional[str] = ""
+
+# --- Quotation Pricing ---
+class QuoteBatchRequest(BaseModel):
+    guest_counts: List[int]
+    downpayment_percents: List[int] = [30, 40, 50]
+    overtime_hours: Optional[int] = None # defaults to the quoted overtime
+
+# --- Bulk Booking Actions ---
+class BookingBulkAction(BaseModel):
+    booking_ids: List[int]
+    reason: Optional[str] = None # Shown in history for bulk rejections
@@ -2,9 +2,9 @@ from fastapi import FastAPI, Request, HTTPException
 # Trigger reload for DB schema sync
 from fastapi.responses import RedirectResponse, JSONResponse
 import os
-from fastapi.staticfiles import StaticFiles
+from .services.assets import PrecompressedStaticFiles, asset_manifest
 from .db.database import engine, Base
-from .routers import website, auth, admin, bookings, social_auth, caterers, packages, caterer_dashboard, customer_dashboard, verification, kyc, quotations, payments, contact
+from .routers import website, auth, admin, bookings, social_auth, caterers, packages, caterer_dashboard, customer_dashboard, verification, kyc, quotations, payments, contact, media, files
 from .db import models
 
 # Create tables
@@ -52,7 +52,7 @@ app.add_middleware(
 # Adding this AFTER SessionMiddleware ensures it's at the TOP of the stack (runs first on request)
 app.add_middleware(ProxyHeadersMiddleware, trusted_hosts="*")
 
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
+app.mount("/static", PrecompressedStaticFiles(directory="app/static"), name="static")
 
 app.include_router(website.router)
 app.include_router(auth.router)
@@ -69,9 +69,57 @@ app.include_router(contact.router)
 app.include_router(quotations.router)
 app.include_router(kyc.router)
 app.include_router(payments.router)
+app.include_router(media.router)
+app.include_router(files.router)
+
+from .services.media import media_cache
+from .services.kyc_thumbnails import kyc_thumbnails
+
+# Helpers available in every router's Jinja environment
+for router_module in (website, auth, admin, bookings, social_auth, caterers, packages, caterer_dashboard, customer_dashboard, verification, contact, quotations, kyc, payments):
+    router_templates = getattr(router_module, "templates", None)
+    if router_templates is not None:
+        router_templates.env.globals["srcset"] = media_cache.srcset
+        router_templates.env.globals["media_url"] = media_cache.url
+        router_templates.env.globals["asset_url"] = asset_manifest.url
+        router_templates.env.globals["kyc_thumb_url"] = kyc_thumbnails.url
 
 from .services.realtime import manager
+from .services.sweeper import booking_sweeper
+from .services.payment_gateway import paymongo_client
+from .services.payment_events import payment_event_service
+from .services.contracts import contract_renderer
+from .services.storage import private_storage, upload_storage
 from fastapi import WebSocket, WebSocketDisconnect
+import asyncio
+
+@app.on_event("startup")
+async def start_background_jobs():
+    # Open the shared, keep-alive payment gateway client once per process
+    await paymongo_client.start()
+
+    # Periodically expire abandoned drafts and unpaid bookings
+    if settings.BOOKING_SWEEP_INTERVAL_SECONDS > 0:
+        app.state.booking_sweeper_task = asyncio.create_task(
+            booking_sweeper.run_forever(settings.BOOKING_SWEEP_INTERVAL_SECONDS)
+        )
+
+    # Apply stored payment webhook events off the request path
+    if settings.PAYMENT_EVENT_POLL_SECONDS > 0:
+        app.state.payment_event_task = asyncio.create_task(
+            payment_event_service.run_forever(settings.PAYMENT_EVENT_POLL_SECONDS)
+        )
+
+@app.on_event("shutdown")
+async def stop_background_jobs():
+    for name in ("booking_sweeper_task", "payment_event_task"):
+        task = getattr(app.state, name, None)
+        if task:
+            task.cancel()
+    await paymongo_client.close()
+    contract_renderer.shutdown()
+    upload_storage.close()
+    private_storage.close()
 
 @app.websocket("/ws/{client_id}")
 async def websocket_endpoint(websocket: WebSocket, client_id: str):
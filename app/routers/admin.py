@@ -6,6 +6,9 @@ from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 from ..db import database, models
 from ..core import security as auth
+from ..services.booking_state import booking_state, TransitionError
+from ..services.kyc_thumbnails import kyc_thumbnails
+import asyncio
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 templates = Jinja2Templates(directory="templates")
@@ -238,9 +241,14 @@ def delete_customer(customer_id: int, db: Session = Depends(database.get_db), us
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
     
+    # Review thumbnails are cached outside the database; drop them with the record
+    for kyc in db.query(models.IdentityVerification).filter(models.IdentityVerification.user_id == customer_id):
+        kyc_thumbnails.discard([kyc.document_url, kyc.selfie_url, kyc.selfie_2_url, kyc.selfie_3_url])
+
     # Manually delete related data that doesn't have cascade-delete or might cause issues
     db.query(models.RefreshToken).filter(models.RefreshToken.user_id == customer_id).delete()
     db.query(models.IdentityVerification).filter(models.IdentityVerification.user_id == customer_id).delete()
+    db.query(models.IdDocumentHash).filter(models.IdDocumentHash.user_id == customer_id).delete()
     db.query(models.AuditLog).filter(models.AuditLog.user_id == customer_id).delete()
     db.query(models.Notification).filter(models.Notification.user_id == customer_id).delete()
     db.query(models.VerificationAttempt).filter(models.VerificationAttempt.user_id == customer_id).delete()
@@ -276,21 +284,16 @@ def manual_confirm_booking_payment(
     db: Session = Depends(database.get_db), 
     user: models.User = Depends(admin_only)
 ):
-    booking = db.query(models.Booking).get(booking_id)
-    if not booking:
-        raise HTTPException(status_code=404, detail="Booking not found")
-        
-    booking.payment_status = "paid"
-    booking.status = "confirmed"
-    booking.payment_reference = "MANUAL_ADMIN_OVERRIDE"
-    
-    # Add history log
-    log = models.BookingHistory(
-        booking_id=booking.id,
-        status="confirmed",
-        notes=f"Payment manually confirmed by Admin {user.first_name} {user.last_name}."
-    )
-    db.add(log)
+    # Marks paid, confirms and logs history in one conditional update
+    try:
+        booking_state.transition(
+            db, booking_id, "manual_confirm",
+            f"Payment manually confirmed by Admin {user.first_name} {user.last_name}."
+        )
+    except TransitionError as e:
+        if e.current_status is None:
+            raise HTTPException(status_code=404, detail="Booking not found")
+        raise HTTPException(status_code=400, detail=str(e))
     db.commit()
     
     return RedirectResponse(url="/admin/bookings", status_code=status.HTTP_303_SEE_OTHER)
@@ -405,6 +408,9 @@ async def kyc_manual_action(
     )
     db.add(audit)
     db.commit()
+
+    # Review is over; thumbnails are re-rendered if someone opens the record again
+    await asyncio.to_thread(kyc_thumbnails.discard, [kyc.document_url, kyc.selfie_url, kyc.selfie_2_url, kyc.selfie_3_url])
     
     return RedirectResponse(url="/admin/kyc", status_code=303)
 
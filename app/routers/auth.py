@@ -4,6 +4,7 @@ from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 from sqlalchemy.sql import func
+import asyncio
 import os
 import uuid
 from datetime import datetime, timedelta
@@ -12,12 +13,18 @@ from pydantic import EmailStr, ValidationError
 
 from ..db import database, schemas, models
 from ..core import security as auth, utils
+from ..services.storage import upload_storage
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 templates = Jinja2Templates(directory="templates")
 
-UPLOAD_DIR = "app/static/uploads/verification"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+async def save_registration_file(upload: UploadFile, key: str) -> str:
+    await asyncio.to_thread(upload_storage.put, key, upload.file, upload.content_type)
+    return upload_storage.public_url(key)
+
+def client_filename(upload: UploadFile) -> str:
+    # Client file names may carry directories; keep only the last part in the key
+    return os.path.basename(upload.filename.replace("\\", "/"))
 
 @router.get("/register", response_class=HTMLResponse)
 def register_page(request: Request, next: Optional[str] = None, db: Session = Depends(database.get_db)):
@@ -161,36 +168,19 @@ async def register(
         permit_url = ""
         sample_menu_url = ""
         logo_url = "/static/images/default_caterer.png"
-        
-        # Ensure upload directory for profiles
-        PROFILE_DIR = "app/static/uploads/profiles"
-        os.makedirs(PROFILE_DIR, exist_ok=True)
 
         if logo and logo.filename:
             file_ext = os.path.splitext(logo.filename)[1]
-            file_name = f"{new_user.id}_logo{file_ext}"
-            file_path = os.path.join(PROFILE_DIR, file_name)
-            with open(file_path, "wb") as buffer:
-                buffer.write(await logo.read())
-            logo_url = f"/static/uploads/profiles/{file_name}"
+            logo_url = await save_registration_file(logo, f"profiles/{new_user.id}_logo{file_ext}")
 
         if gov_id and gov_id.filename:
-            file_path = os.path.join(UPLOAD_DIR, f"{new_user.id}_gov_id_{gov_id.filename}")
-            with open(file_path, "wb") as buffer:
-                buffer.write(await gov_id.read())
-            gov_id_url = f"/static/uploads/verification/{new_user.id}_gov_id_{gov_id.filename}"
+            gov_id_url = await save_registration_file(gov_id, f"verification/{new_user.id}_gov_id_{client_filename(gov_id)}")
             
         if permit and permit.filename:
-            file_path = os.path.join(UPLOAD_DIR, f"{new_user.id}_permit_{permit.filename}")
-            with open(file_path, "wb") as buffer:
-                buffer.write(await permit.read())
-            permit_url = f"/static/uploads/verification/{new_user.id}_permit_{permit.filename}"
+            permit_url = await save_registration_file(permit, f"verification/{new_user.id}_permit_{client_filename(permit)}")
 
         if sample_menu and sample_menu.filename:
-            file_path = os.path.join(UPLOAD_DIR, f"{new_user.id}_menu_{sample_menu.filename}")
-            with open(file_path, "wb") as buffer:
-                buffer.write(await sample_menu.read())
-            sample_menu_url = f"/static/uploads/verification/{new_user.id}_menu_{sample_menu.filename}"
+            sample_menu_url = await save_registration_file(sample_menu, f"verification/{new_user.id}_menu_{client_filename(sample_menu)}")
 
         # Handle event_types
         event_list = []
@@ -9,16 +9,19 @@ from ..db import database, models
 from ..core import security as auth
 from ..services.verification import verification_service
 from ..services.email import EmailService
-import shutil
+from ..services.slots import slot_service
+from ..services.availability import availability_service
+from ..services.payment_gateway import paymongo_client, PaymentGatewayError
+from ..services.idempotency import idempotency_service
+from ..services.storage import upload_storage
+from ..core.config import settings
 import os
 import uuid
+import asyncio
 
 router = APIRouter(prefix="/bookings", tags=["bookings"])
 templates = Jinja2Templates(directory="templates")
 
-UPLOAD_DIR = "app/static/uploads/verification"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
 # --- Helper Functions ---
 
 def get_current_user_from_session(request: Request, db: Session):
@@ -35,15 +38,12 @@ def get_current_user_from_session(request: Request, db: Session):
     except:
         return None
 
-def save_upload_file(upload_file: UploadFile) -> str:
+async def save_upload_file(upload_file: UploadFile) -> str:
     file_extension = os.path.splitext(upload_file.filename)[1]
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = os.path.join(UPLOAD_DIR, unique_filename)
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(upload_file.file, buffer)
-        
-    return f"/static/uploads/verification/{unique_filename}"
+    key = f"verification/{uuid.uuid4()}{file_extension}"
+    # Blocking upload (disk or S3); keep it off the event loop
+    await asyncio.to_thread(upload_storage.put, key, upload_file.file, upload_file.content_type)
+    return upload_storage.public_url(key)
 
 @router.get("/my")
 async def my_bookings_redirect():
@@ -190,6 +190,30 @@ async def step_details_submit(
     if availability:
         return RedirectResponse(url=f"/packages/{package_id}?error=date_unavailable", status_code=303)
 
+    # Resolve all selected items (base and add-ons) in one IN query, scoped to the chosen package
+    all_item_ids = set(selected_items) | set(selected_addons)
+    menu_items = []
+    if all_item_ids:
+        menu_items = db.query(
+            models.MenuItem.id,
+            models.MenuItem.is_addon,
+            models.MenuItem.addon_price
+        ).filter(
+            models.MenuItem.id.in_(all_item_ids),
+            models.MenuItem.package_id == package_id
+        ).all()
+        if len(menu_items) != len(all_item_ids):
+            return RedirectResponse(url=f"/packages/{package_id}?error=invalid_menu_selection", status_code=303)
+
+    # Drafts hold no capacity (the slot is taken at the payment step), but turn away days
+    # that are already full rather than letting the customer fill in a booking for one
+    has_room = availability_service.filter_available_on(
+        db.query(models.CatererProfile.id).filter(models.CatererProfile.id == caterer_id),
+        event_date
+    ).first()
+    if not has_room:
+        return RedirectResponse(url=f"/packages/{package_id}?error=date_full", status_code=303)
+
     # 2. Create Draft Booking
     new_booking = models.Booking(
         user_id=user.id,
@@ -208,21 +232,19 @@ async def step_details_submit(
         status="draft"
     )
     db.add(new_booking)
-    db.commit()
-    db.refresh(new_booking)
-
-    # 3. Save Selected Items (Base and Add-ons)
-    all_items = selected_items + selected_addons
-    for item_id in all_items:
-        menu_item = db.query(models.MenuItem).get(item_id)
-        if menu_item:
-            booking_item = models.BookingMenuItem(
-                booking_id=new_booking.id,
-                menu_item_id=item_id,
-                is_add_on=menu_item.is_addon,
-                price=menu_item.addon_price if menu_item.is_addon else 0.0
-            )
-            db.add(booking_item)
+    db.flush() # Assign the booking ID without ending the transaction
+
+    # 3. Save Selected Items (Base and Add-ons) as one multi-row INSERT
+    if menu_items:
+        db.execute(models.BookingMenuItem.__table__.insert(), [
+            {
+                "booking_id": new_booking.id,
+                "menu_item_id": item.id,
+                "is_add_on": item.is_addon,
+                "price": item.addon_price if item.is_addon else 0.0
+            }
+            for item in menu_items
+        ])
     
     db.commit()
 
@@ -284,6 +306,7 @@ async def step_payment_v2_page(booking_id: int, request: Request, db: Session =
         "booking": booking,
         "user": user,
         "current_step": 4,
+        "idempotency_key": uuid.uuid4().hex,
         "active_page": "bookings"
     })
 
@@ -301,6 +324,7 @@ async def step_payment_submit(
         booking_id = int(booking_id_str) if booking_id_str else None
         payment_method = form_data.get("payment_method", "GCash")
     except Exception:
+        form_data = None
         booking_id = None
         payment_method = "GCash"
         
@@ -318,6 +342,21 @@ async def step_payment_submit(
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
 
+    key = idempotency_service.key_from_request(request, form_data)
+    return await idempotency_service.run(
+        db, key, booking.id, "reservation_payment",
+        idempotency_service.fingerprint(payment_method=payment_method),
+        lambda: _submit_reservation_payment(booking, payment_method, db)
+    )
+
+async def _submit_reservation_payment(booking: models.Booking, payment_method: str, db: Session):
+    # Leaving draft takes the capacity slot; concurrent requests contend only on this caterer/date row
+    if not slot_service.hold(db, booking.id):
+        db.rollback()
+        return RedirectResponse(url=f"/packages/{booking.package_id}?error=date_full", status_code=303)
+    # The held slot may fill the day, so cached calendars for this caterer are stale
+    availability_service.bump_version(db, booking.caterer_id)
+
     # Handle Cash Payment
     if payment_method == "Cash":
         booking.payment_method = "Cash"
@@ -334,56 +373,39 @@ async def step_payment_submit(
         db.commit()
         return RedirectResponse(url=f"/bookings/success/{booking.id}", status_code=303)
 
-    import os
-    import httpx
-    
-    paymongo_secret = os.getenv("PAYMONGO_SECRET_KEY")
-    if paymongo_secret:
+    if paymongo_client.is_configured:
         # Generate Paymongo Checkout Link
-        url = "https://api.paymongo.com/v1/links"
         amount_cents = int((booking.reservation_fee or 0) * 100)
         
         # Paymongo requires at least 100 PHP (10000 cents) usually, but we assume reservation_fee is valid
         if amount_cents >= 10000:
-            base_url = os.getenv("SITE_URL", "http://localhost:8000")
-            payload = {
-                "data": {
-                    "attributes": {
-                        "amount": amount_cents,
-                        "description": f"Reservation Fee for Booking #{booking.id}",
-                        "remarks": f"booking_id:{booking.id}",
-                        "redirect": {
-                            "success": f"{base_url}/bookings/my?payment=success",
-                            "failed": f"{base_url}/bookings/my?payment=failed"
-                        }
-                    }
-                }
-            }
-            
-            async with httpx.AsyncClient() as client:
-                try:
-                    response = await client.post(url, json=payload, auth=(paymongo_secret, ""))
-                    if response.status_code == 200:
-                        data = response.json()
-                        checkout_url = data["data"]["attributes"]["checkout_url"]
-                        reference_number = data["data"]["attributes"]["reference_number"]
-                        
-                        booking.payment_method = payment_method
-                        booking.status = "pending_payment" # Wait for webhook
-                        
-                        history = models.BookingHistory(
-                            booking_id=booking.id,
-                            status="pending_payment",
-                            notes=f"Redirected to Paymongo ({reference_number})"
-                        )
-                        db.add(history)
-                        db.commit()
-                        
-                        return RedirectResponse(url=checkout_url, status_code=303)
-                    else:
-                        print("Paymongo API Error:", response.text)
-                except Exception as e:
-                    print("Paymongo Request Error:", str(e))
+            base_url = settings.SITE_URL
+            try:
+                link = await paymongo_client.create_link(
+                    amount_cents=amount_cents,
+                    description=f"Reservation Fee for Booking #{booking.id}",
+                    remarks=f"booking_id:{booking.id}",
+                    success_url=f"{base_url}/bookings/my?payment=success",
+                    failed_url=f"{base_url}/bookings/my?payment=failed"
+                )
+                checkout_url = link["checkout_url"]
+                reference_number = link["reference_number"]
+                
+                booking.payment_method = payment_method
+                booking.payment_reference = link["id"] # Checkout link id, used by the payment reconciler
+                booking.status = "pending_payment" # Wait for webhook
+                
+                history = models.BookingHistory(
+                    booking_id=booking.id,
+                    status="pending_payment",
+                    notes=f"Redirected to Paymongo ({reference_number})"
+                )
+                db.add(history)
+                db.commit()
+                
+                return RedirectResponse(url=checkout_url, status_code=303)
+            except PaymentGatewayError as e:
+                print("Paymongo API Error:", str(e), e.body or "")
 
     # Simulate payment processing (Fallback for other methods)
     booking.payment_method = payment_method
@@ -423,6 +445,15 @@ async def pay_balance_submit(
     if outstanding_balance <= 0:
         return RedirectResponse(url=f"/customer/bookings/manage/{booking.id}?info=balance_zero", status_code=303)
 
+    form_data = await request.form()
+    key = idempotency_service.key_from_request(request, form_data)
+    return await idempotency_service.run(
+        db, key, booking.id, "balance_payment",
+        idempotency_service.fingerprint(payment_method=payment_method, amount=outstanding_balance),
+        lambda: _submit_balance_payment(booking, payment_method, outstanding_balance, db)
+    )
+
+async def _submit_balance_payment(booking: models.Booking, payment_method: str, outstanding_balance: float, db: Session):
     # Handle Cash Payment for Balance
     if payment_method == "Cash":
         # Keep status as confirmed, but perhaps add a note
@@ -435,47 +466,31 @@ async def pay_balance_submit(
         db.commit()
         return RedirectResponse(url=f"/customer/bookings/manage/{booking.id}?success=payment_marked_cash", status_code=303)
 
-    import os
-    import httpx
-    
-    paymongo_secret = os.getenv("PAYMONGO_SECRET_KEY")
-    if paymongo_secret:
-        url = "https://api.paymongo.com/v1/links"
+    if paymongo_client.is_configured:
         amount_cents = int(outstanding_balance * 100)
         
         if amount_cents >= 10000:
-            base_url = os.getenv("SITE_URL", "http://localhost:8000")
-            payload = {
-                "data": {
-                    "attributes": {
-                        "amount": amount_cents,
-                        "description": f"Outstanding Balance for Booking #{booking.id}",
-                        "remarks": f"booking_id:{booking.id}_balance",
-                        "redirect": {
-                            "success": f"{base_url}/customer/bookings/manage/{booking.id}?payment=success",
-                            "failed": f"{base_url}/customer/bookings/manage/{booking.id}?payment=failed"
-                        }
-                    }
-                }
-            }
-            
-            async with httpx.AsyncClient() as client:
-                try:
-                    response = await client.post(url, json=payload, auth=(paymongo_secret, ""))
-                    if response.status_code == 200:
-                        data = response.json()
-                        checkout_url = data["data"]["attributes"]["checkout_url"]
-                        
-                        history = models.BookingHistory(
-                            booking_id=booking.id,
-                            status="confirmed",
-                            notes=f"Redirected to Paymongo for balance payment (₱{outstanding_balance:,.2f})"
-                        )
-                        db.add(history)
-                        db.commit()
-                        return RedirectResponse(url=checkout_url, status_code=303)
-                except Exception as e:
-                    print("Paymongo Balance Payment Error:", str(e))
+            base_url = settings.SITE_URL
+            try:
+                link = await paymongo_client.create_link(
+                    amount_cents=amount_cents,
+                    description=f"Outstanding Balance for Booking #{booking.id}",
+                    remarks=f"booking_id:{booking.id}_balance",
+                    success_url=f"{base_url}/customer/bookings/manage/{booking.id}?payment=success",
+                    failed_url=f"{base_url}/customer/bookings/manage/{booking.id}?payment=failed"
+                )
+                checkout_url = link["checkout_url"]
+                
+                history = models.BookingHistory(
+                    booking_id=booking.id,
+                    status="confirmed",
+                    notes=f"Redirected to Paymongo for balance payment (₱{outstanding_balance:,.2f})"
+                )
+                db.add(history)
+                db.commit()
+                return RedirectResponse(url=checkout_url, status_code=303)
+            except PaymentGatewayError as e:
+                print("Paymongo Balance Payment Error:", str(e), e.body or "")
 
     # Fallback/Simulation
     booking.payment_status = "paid"
@@ -2,23 +2,42 @@ from fastapi import APIRouter, Depends, HTTPException, status, Form, Request, Up
 from typing import Optional
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
-from sqlalchemy import func
+from sqlalchemy import func, insert
 from sqlalchemy.orm import Session
 from ..db import database, models, schemas
 from ..core import security as auth
-import os
-import shutil
-import uuid
+from ..services.availability import availability_service
+from ..services.slots import slot_service
+from ..services.booking_state import booking_state, TransitionError
+from ..services.pricing import pricing_engine
+from ..services.contracts import contract_renderer
+from ..services.images import image_pipeline
 
 router = APIRouter(prefix="/caterer", tags=["caterer"])
 templates = Jinja2Templates(directory="templates")
 
-UPLOAD_DIR = "app/static/uploads/caterer"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
 # Standard dependency for caterer access
 caterer_only = auth.RoleChecker(["caterer"])
 
+# action -> (history notes, notification title, notification message, notification type)
+BULK_BOOKING_ACTIONS = {
+    "accept": ("Booking accepted by caterer", "Booking Accepted", "Your booking for {event} on {date} has been accepted.", "success"),
+    "reject": ("Booking rejected by caterer", "Booking Declined", "Your booking for {event} on {date} was declined by the caterer.", "warning"),
+    "complete": ("Booking marked as completed by caterer", "Event Completed", "Your event {event} on {date} has been marked as completed.", "info"),
+}
+MAX_BULK_BOOKINGS = 200
+
+def caterer_transition(db: Session, user: models.User, booking_id: int, action: str, notes: str, redirect_url: str = "/caterer/bookings"):
+    """Runs a booking state transition scoped to the caterer's own bookings and redirects back."""
+    try:
+        booking_state.transition(db, booking_id, action, notes, scope={"caterer_id": user.caterer_profile.id})
+    except TransitionError as e:
+        if e.current_status is None:
+            raise HTTPException(status_code=404, detail="Booking not found")
+        return RedirectResponse(url=f"{redirect_url}?error=invalid_status", status_code=303)
+    db.commit()
+    return RedirectResponse(url=redirect_url, status_code=303)
+
 @router.get("/dashboard", response_class=HTMLResponse)
 async def caterer_dashboard(
     request: Request, 
@@ -81,6 +100,21 @@ async def view_contract_caterer(
         "active_page": "bookings"
     })
 
+@router.get("/bookings/{booking_id}/contract.pdf")
+async def download_contract_caterer(
+    booking_id: int,
+    request: Request,
+    db: Session = Depends(database.get_db),
+    user: models.User = Depends(caterer_only)
+):
+    booking = db.query(models.Booking).get(booking_id)
+    if not booking or booking.caterer_id != user.caterer_profile.id:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    if not booking.quotation:
+        raise HTTPException(status_code=404, detail="Quotation not found for this booking")
+
+    return await contract_renderer.response(request, booking, booking.quotation)
+
 @router.get("/payments", response_class=HTMLResponse)
 async def caterer_payments(
     request: Request, 
@@ -102,23 +136,12 @@ async def confirm_caterer_payment(
     db: Session = Depends(database.get_db),
     user: models.User = Depends(caterer_only)
 ):
-    booking = db.query(models.Booking).get(booking_id)
-    if not booking or booking.caterer_id != user.caterer_profile.id:
-        raise HTTPException(status_code=404, detail="Booking not found")
-        
-    # Mark as paid
-    booking.payment_status = 'paid'
-    
-    # Also log history
-    history = models.BookingHistory(
-        booking_id=booking.id,
-        status="payment_received",
-        notes="Service provider confirmed payment manually."
+    # Mark as paid and log history
+    return caterer_transition(
+        db, user, booking_id, "mark_paid",
+        "Service provider confirmed payment manually.",
+        redirect_url="/caterer/payments"
     )
-    db.add(history)
-    db.commit()
-    
-    return RedirectResponse(url="/caterer/payments", status_code=303)
 
 @router.get("/reviews", response_class=HTMLResponse)
 async def caterer_reviews(
@@ -205,30 +228,107 @@ async def toggle_availability(
     from datetime import datetime
     target_date = datetime.strptime(date_str, "%Y-%m-%d").date()
     
-    # Check if entry already exists
-    existing = db.query(models.Availability).filter(
-        models.Availability.caterer_id == user.caterer_profile.id,
-        models.Availability.date == target_date
-    ).first()
-    
-    if existing:
-        existing.is_available = is_available
-        existing.reason = reason
-    else:
-        new_avail = models.Availability(
-            caterer_id=user.caterer_profile.id,
-            date=target_date,
-            is_available=is_available,
-            reason=reason
-        )
-        db.add(new_avail)
-    
+    # Single-statement upsert on (caterer_id, date)
+    availability_service.set_dates(db, user.caterer_profile.id, [target_date], is_available, reason)
     db.commit()
     return {"status": "success"}
 
+@router.post("/api/availability/bulk")
+async def bulk_update_availability(
+    data: schemas.AvailabilityBulkUpdate,
+    db: Session = Depends(database.get_db),
+    user: models.User = Depends(caterer_only)
+):
+    """Blocks or unblocks date ranges and recurring weekdays (e.g. every Monday) in one upsert."""
+    try:
+        dates = availability_service.expand_rules(data.ranges, data.dates)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not dates:
+        raise HTTPException(status_code=400, detail="No dates selected")
+
+    count = availability_service.set_dates(db, user.caterer_profile.id, dates, data.is_available, data.reason)
+    db.commit()
+    return {
+        "status": "success",
+        "updated_count": count,
+        "first_date": dates[0].isoformat(),
+        "last_date": dates[-1].isoformat()
+    }
+
+@router.post("/api/bookings/bulk/{action}")
+async def bulk_booking_action(
+    action: str,
+    data: schemas.BookingBulkAction,
+    db: Session = Depends(database.get_db),
+    user: models.User = Depends(caterer_only)
+):
+    """
+    Accepts, rejects or completes many bookings at once: one ownership query, one
+    set-based transition (with its history rows), one notification insert, one commit.
+    """
+    if action not in BULK_BOOKING_ACTIONS:
+        raise HTTPException(status_code=404, detail="Unknown bulk action")
+
+    booking_ids = list(dict.fromkeys(data.booking_ids))
+    if not booking_ids:
+        raise HTTPException(status_code=400, detail="No bookings selected")
+    if len(booking_ids) > MAX_BULK_BOOKINGS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_BOOKINGS} bookings can be updated at once")
+
+    caterer_id = user.caterer_profile.id
+    owned = {
+        row.id: row for row in db.query(
+            models.Booking.id,
+            models.Booking.status,
+            models.Booking.user_id,
+            models.Booking.event_name,
+            models.Booking.event_date
+        ).filter(
+            models.Booking.id.in_(booking_ids),
+            models.Booking.caterer_id == caterer_id
+        )
+    }
+    eligible = [i for i in booking_ids if i in owned and booking_state.can(action, owned[i].status)]
+
+    notes, title, message, notif_type = BULK_BOOKING_ACTIONS[action]
+    if action == "reject" and data.reason:
+        notes = f"{notes}. Reason: {data.reason}"
+
+    moved = booking_state.transition_many(db, eligible, action, notes, scope={"caterer_id": caterer_id})
+
+    notifications = [
+        {
+            "user_id": owned[i].user_id,
+            "title": title,
+            "message": message.format(event=owned[i].event_name or "your event", date=owned[i].event_date),
+            "type": notif_type
+        }
+        for i in moved if owned[i].user_id
+    ]
+    if notifications:
+        db.execute(insert(models.Notification), notifications)
+    db.commit()
+
+    moved_set = set(moved)
+    skipped = []
+    for i in booking_ids:
+        if i in moved_set:
+            continue
+        if i not in owned:
+            skipped.append({"id": i, "reason": "not_found"})
+        else:
+            # Either never eligible or changed by someone else since the ownership check
+            skipped.append({"id": i, "reason": "invalid_status"})
+
+    return {"status": "success", "action": action, "updated": moved, "skipped": skipped}
+
 @router.get("/api/events")
 async def get_calendar_events(
     caterer_id: Optional[int] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
     db: Session = Depends(database.get_db),
     user: models.User = Depends(auth.get_current_user_optional)
 ):
@@ -240,9 +340,59 @@ async def get_calendar_events(
     if not target_caterer_id:
         return []
 
-    bookings = db.query(models.Booking).filter(
+    # FullCalendar sends the visible window as ISO datetimes (end is exclusive)
+    from datetime import date, timedelta
+    try:
+        window_start = date.fromisoformat(start[:10]) if start else date.today().replace(day=1)
+        window_end = date.fromisoformat(end[:10]) if end else window_start + timedelta(days=42)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid start/end date")
+    if window_end <= window_start:
+        return []
+    if (window_end - window_start).days > availability_service.MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Calendar window cannot exceed {availability_service.MAX_RANGE_DAYS} days")
+
+    # Check if we should show full details (only for the caterer owner)
+    is_owner = user and user.role == 'caterer' and user.caterer_profile.id == target_caterer_id
+
+    # Public views are identical for every visitor, so they are served from a
+    # per-caterer cache tagged with the caterer's availability version.
+    version = None
+    if not is_owner:
+        version_row = availability_service.get_version(db, target_caterer_id)
+        if version_row is None:
+            return []
+        version = version_row[0]
+        cached = availability_service.calendar_cache.get(target_caterer_id, window_start, window_end, version)
+        if cached is not None:
+            return cached
+
+    booking_columns = [
+        models.Booking.id,
+        models.Booking.event_date,
+        models.Booking.event_time,
+        models.Booking.event_type,
+    ]
+    if is_owner:
+        # Owner details need customer and package names: fetch them in the same query
+        bookings_query = db.query(
+            *booking_columns,
+            models.Booking.event_name,
+            models.Booking.guest_count,
+            models.Booking.venue_address,
+            models.User.first_name,
+            models.User.last_name,
+            models.CateringPackage.name.label("package_name")
+        ).outerjoin(models.User, models.Booking.user_id == models.User.id)\
+         .outerjoin(models.CateringPackage, models.Booking.package_id == models.CateringPackage.id)
+    else:
+        bookings_query = db.query(*booking_columns)
+
+    bookings = bookings_query.filter(
         models.Booking.caterer_id == target_caterer_id,
-        models.Booking.status == 'confirmed'
+        models.Booking.status == 'confirmed',
+        models.Booking.event_date >= window_start,
+        models.Booking.event_date < window_end
     ).all()
     
     events = []
@@ -252,9 +402,6 @@ async def get_calendar_events(
         "Corporate": "#10b981", # Green
         "Private Party": "#f59e0b" # Orange
     }
-    
-    # Check if we should show full details (only for the caterer owner)
-    is_owner = user and user.role == 'caterer' and user.caterer_profile.id == target_caterer_id
 
     for b in bookings:
         start_dt = str(b.event_date)
@@ -269,13 +416,13 @@ async def get_calendar_events(
         }
 
         if is_owner:
-            event_data["title"] = f"{b.event_type or 'Event'} - {b.event_name or b.user.first_name}"
+            event_data["title"] = f"{b.event_type or 'Event'} - {b.event_name or b.first_name}"
             event_data["extendedProps"] = {
-                "customer": f"{b.user.first_name} {b.user.last_name}",
+                "customer": f"{b.first_name} {b.last_name}",
                 "type": b.event_type or "N/A",
                 "guests": b.guest_count,
                 "venue": b.venue_address or "TBD",
-                "package": b.package.name if b.package else "Custom",
+                "package": b.package_name or "Custom",
                 "time": str(b.event_time) if b.event_time else "TBD"
             }
         else:
@@ -286,20 +433,36 @@ async def get_calendar_events(
         events.append(event_data)
         
     # Add blocked dates from availability
-    availabilities = db.query(models.Availability).filter(
+    blocked_dates = db.query(models.Availability.date).filter(
         models.Availability.caterer_id == target_caterer_id,
-        models.Availability.is_available == False
+        models.Availability.is_available == False,
+        models.Availability.date >= window_start,
+        models.Availability.date < window_end
     ).all()
     
-    for a in availabilities:
+    for (blocked_date,) in blocked_dates:
         events.append({
             "title": "BLOCKED",
-            "start": str(a.date),
+            "start": str(blocked_date),
             "allDay": True,
             "display": "background",
             "backgroundColor": "#fee2e2",
             "overlap": False
         })
+
+    # Days whose event slots are all held (drafts and unpaid bookings included)
+    for (full_date,) in db.execute(slot_service.full_days(target_caterer_id, window_start, window_end - timedelta(days=1))):
+        events.append({
+            "title": "FULLY BOOKED",
+            "start": str(full_date),
+            "allDay": True,
+            "display": "background",
+            "backgroundColor": "#e5e7eb",
+            "overlap": False
+        })
+
+    if not is_owner:
+        availability_service.calendar_cache.put(target_caterer_id, window_start, window_end, version, events)
         
     return events
 
@@ -379,6 +542,8 @@ async def caterer_profile_update(
     primary_color: str = Form("#2D3748"),
     secondary_color: str = Form("#4A5568"),
     accent_color: str = Form("#48BB78"),
+    max_events_per_day: int = Form(1),
+    max_pax_per_day: Optional[int] = Form(None),
     logo: Optional[UploadFile] = File(None),
     cover_image: Optional[UploadFile] = File(None),
     gallery: Optional[list[UploadFile]] = File(None),
@@ -394,38 +559,24 @@ async def caterer_profile_update(
     profile.primary_color = primary_color
     profile.secondary_color = secondary_color
     profile.accent_color = accent_color
+    profile.max_events_per_day = max(1, max_events_per_day)
+    profile.max_pax_per_day = max_pax_per_day if max_pax_per_day and max_pax_per_day > 0 else None
     
     # Handle Logo Upload
     if logo and logo.filename:
-        file_ext = os.path.splitext(logo.filename)[1]
-        file_name = f"{profile.id}_logo_{uuid.uuid4().hex[:8]}{file_ext}"
-        file_path = os.path.join(UPLOAD_DIR, file_name)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(logo.file, buffer)
-        profile.logo_url = f"/static/uploads/caterer/{file_name}"
+        profile.logo_url = await image_pipeline.save(logo)
 
     # Handle Cover Image Upload
     if cover_image and cover_image.filename:
-        file_ext = os.path.splitext(cover_image.filename)[1]
-        file_name = f"{profile.id}_cover_{uuid.uuid4().hex[:8]}{file_ext}"
-        file_path = os.path.join(UPLOAD_DIR, file_name)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(cover_image.file, buffer)
-        profile.cover_image_url = f"/static/uploads/caterer/{file_name}"
+        profile.cover_image_url = await image_pipeline.save(cover_image)
 
     # Handle Gallery Uploads
     if gallery:
         for image in gallery:
             if image.filename:
-                file_ext = os.path.splitext(image.filename)[1]
-                file_name = f"{profile.id}_gallery_{uuid.uuid4().hex[:8]}{file_ext}"
-                file_path = os.path.join(UPLOAD_DIR, file_name)
-                with open(file_path, "wb") as buffer:
-                    shutil.copyfileobj(image.file, buffer)
-                
                 new_gallery_item = models.CatererGallery(
                     caterer_id=profile.id,
-                    media_url=f"/static/uploads/caterer/{file_name}"
+                    media_url=await image_pipeline.save(image)
                 )
                 db.add(new_gallery_item)
 
@@ -488,12 +639,7 @@ async def add_package(
     # Handle package image upload
     image_url = None
     if image and image.filename:
-        file_ext = os.path.splitext(image.filename)[1]
-        file_name = f"pkg_{user.caterer_profile.id}_{uuid.uuid4().hex[:8]}{file_ext}"
-        file_path = os.path.join(UPLOAD_DIR, file_name)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(image.file, buffer)
-        image_url = f"/static/uploads/caterer/{file_name}"
+        image_url = await image_pipeline.save(image)
 
     new_package = models.CateringPackage(
         caterer_id=user.caterer_profile.id,
@@ -557,9 +703,11 @@ async def get_package_details_json(
         "service_type": package.service_type,
         "price_per_head": package.price_per_head,
         "min_contract_amount": package.min_contract_amount,
+        "additional_guest_price": package.additional_guest_price,
         "min_guests": package.min_guests,
         "max_guests": package.max_guests,
         "service_duration": package.service_duration,
+        "overtime_fee": package.overtime_fee,
         "inclusions": package.inclusions or {}
     }
 
@@ -573,7 +721,9 @@ async def update_package(
     service_type: str = Form("General"),
     price_per_head: Optional[float] = Form(None),
     min_contract_amount: Optional[float] = Form(None),
+    additional_guest_price: Optional[float] = Form(None),
     service_duration: int = Form(4),
+    overtime_fee: Optional[float] = Form(None),
     inclusions: list[str] = Form([]),
     image: Optional[UploadFile] = File(None),
     db: Session = Depends(database.get_db),
@@ -591,19 +741,20 @@ async def update_package(
     package.price_per_head = price_per_head
     package.min_contract_amount = min_contract_amount
     package.service_duration = service_duration
+    # Not on the edit form yet; keep the stored rates unless they are sent
+    if additional_guest_price is not None:
+        package.additional_guest_price = additional_guest_price
+    if overtime_fee is not None:
+        package.overtime_fee = overtime_fee
 
     # Structure inclusions as JSON
     package.inclusions = {item: True for item in inclusions}
 
     # Handle image update (only replace if a new image is uploaded)
     if image and image.filename:
-        file_ext = os.path.splitext(image.filename)[1]
-        file_name = f"pkg_{pkg_id}_{uuid.uuid4().hex[:8]}{file_ext}"
-        file_path = os.path.join(UPLOAD_DIR, file_name)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(image.file, buffer)
-        package.image_url = f"/static/uploads/caterer/{file_name}"
+        package.image_url = await image_pipeline.save(image)
 
+    pricing_engine.bump_version(db, package.id)
     db.commit()
     return RedirectResponse(url="/caterer/packages", status_code=303)
 
@@ -669,12 +820,7 @@ async def add_menu_item(
 
     image_url = None
     if image and image.filename:
-        file_ext = os.path.splitext(image.filename)[1]
-        file_name = f"dish_{uuid.uuid4().hex[:8]}{file_ext}"
-        file_path = os.path.join(UPLOAD_DIR, file_name)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(image.file, buffer)
-        image_url = f"/static/uploads/caterer/{file_name}"
+        image_url = await image_pipeline.save(image)
 
     new_item = models.MenuItem(
         package_id=package_id,
@@ -689,6 +835,8 @@ async def add_menu_item(
         image_url=image_url
     )
     db.add(new_item)
+    if is_addon:
+        pricing_engine.bump_version(db, package_id)
     db.commit()
     return RedirectResponse(url="/caterer/packages", status_code=303)
 
@@ -702,6 +850,8 @@ async def delete_menu_item(
     if not item or item.package.caterer_id != user.caterer_profile.id:
         raise HTTPException(status_code=403, detail="Forbidden")
     
+    if item.is_addon:
+        pricing_engine.bump_version(db, item.package_id)
     db.delete(item)
     db.commit()
     return {"status": "success"}
@@ -712,22 +862,7 @@ async def accept_booking(
     db: Session = Depends(database.get_db),
     user: models.User = Depends(caterer_only)
 ):
-    
-    booking = db.query(models.Booking).get(booking_id)
-    if not booking or booking.caterer_id != user.caterer_profile.id:
-        raise HTTPException(status_code=404, detail="Booking not found")
-    
-    booking.status = "confirmed"
-    
-    history = models.BookingHistory(
-        booking_id=booking.id,
-        status="confirmed",
-        notes="Booking accepted by caterer"
-    )
-    db.add(history)
-    db.commit()
-    
-    return RedirectResponse(url="/caterer/bookings", status_code=303)
+    return caterer_transition(db, user, booking_id, "accept", "Booking accepted by caterer")
 
 @router.post("/bookings/{booking_id}/reject")
 async def reject_booking(
@@ -736,21 +871,7 @@ async def reject_booking(
     db: Session = Depends(database.get_db),
     user: models.User = Depends(caterer_only)
 ):
-    booking = db.query(models.Booking).get(booking_id)
-    if not booking or booking.caterer_id != user.caterer_profile.id:
-        raise HTTPException(status_code=404, detail="Booking not found")
-    
-    booking.status = "cancelled"
-    
-    history = models.BookingHistory(
-        booking_id=booking.id,
-        status="cancelled",
-        notes="Booking rejected by caterer"
-    )
-    db.add(history)
-    db.commit()
-    
-    return RedirectResponse(url="/caterer/bookings", status_code=303)
+    return caterer_transition(db, user, booking_id, "reject", "Booking rejected by caterer")
 
 @router.post("/bookings/{booking_id}/complete")
 async def complete_booking(
@@ -759,21 +880,7 @@ async def complete_booking(
     db: Session = Depends(database.get_db),
     user: models.User = Depends(caterer_only)
 ):
-    booking = db.query(models.Booking).get(booking_id)
-    if not booking or booking.caterer_id != user.caterer_profile.id:
-        raise HTTPException(status_code=404, detail="Booking not found")
-    
-    booking.status = "completed"
-    
-    history = models.BookingHistory(
-        booking_id=booking.id,
-        status="completed",
-        notes="Booking marked as completed by caterer"
-    )
-    db.add(history)
-    db.commit()
-    
-    return RedirectResponse(url="/caterer/bookings", status_code=303)
+    return caterer_transition(db, user, booking_id, "complete", "Booking marked as completed by caterer")
 
 @router.post("/bookings/{booking_id}/cancel")
 async def cancel_booking(
@@ -783,18 +890,4 @@ async def cancel_booking(
     db: Session = Depends(database.get_db),
     user: models.User = Depends(caterer_only)
 ):
-    booking = db.query(models.Booking).get(booking_id)
-    if not booking or booking.caterer_id != user.caterer_profile.id:
-        raise HTTPException(status_code=404, detail="Booking not found")
-    
-    booking.status = "cancelled"
-    
-    history = models.BookingHistory(
-        booking_id=booking.id,
-        status="cancelled",
-        notes=f"Booking cancelled by caterer. Reason: {reason}"
-    )
-    db.add(history)
-    db.commit()
-    
-    return RedirectResponse(url="/caterer/bookings", status_code=303)
+    return caterer_transition(db, user, booking_id, "cancel", f"Booking cancelled by caterer. Reason: {reason}")
@@ -5,13 +5,20 @@ from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 from datetime import date
 import os
-import shutil
+import asyncio
 import uuid
 import time
 from ..db import database, models
 from ..core import security as auth
 from ..services.verification import verification_service
+from ..services.document_hashes import document_hash_index
 from ..services.realtime import manager
+from ..services.availability import availability_service
+from ..services.slots import slot_service
+from ..services.booking_state import booking_state, TransitionError
+from ..services.contracts import contract_renderer
+from ..services.images import image_pipeline
+from ..services.storage import upload_storage
 
 router = APIRouter(prefix="/customer", tags=["customer"])
 templates = Jinja2Templates(directory="templates")
@@ -153,9 +160,25 @@ async def manage_booking(
         "booking": booking,
         "status_steps": status_steps,
         "current_step_idx": current_step_idx,
+        "idempotency_key": uuid.uuid4().hex,
         "active_page": "bookings"
     })
 
+@router.get("/bookings/{booking_id}/contract.pdf")
+async def download_contract(
+    booking_id: int,
+    request: Request,
+    db: Session = Depends(database.get_db),
+    user: models.User = Depends(customer_only)
+):
+    booking = db.query(models.Booking).get(booking_id)
+    if not booking or booking.user_id != user.id:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    if not booking.quotation:
+        raise HTTPException(status_code=404, detail="Quotation not found for this booking")
+
+    return await contract_renderer.response(request, booking, booking.quotation)
+
 @router.post("/bookings/manage/{booking_id}/cancel")
 async def cancel_booking(
     booking_id: int,
@@ -168,19 +191,24 @@ async def cancel_booking(
         raise HTTPException(status_code=404, detail="Booking not found")
     
     # Only allow cancelling drafts or unpaid pending bookings
-    if booking.status in ['draft', 'pending', 'pending_payment'] and booking.payment_status not in ['paid', 'deposit_paid']:
-        if booking.status == 'draft':
-            # Physical delete for drafts to prevent database bloat
-            db.delete(booking)
-            db.commit()
-            return RedirectResponse(url="/customer/bookings?msg=draft_deleted", status_code=303)
-        else:
-            # Soft cancel for submitted but unpaid bookings
-            booking.status = 'cancelled'
-            db.commit()
-            return RedirectResponse(url=f"/customer/bookings/manage/{booking_id}?msg=cancelled", status_code=303)
-    else:
+    if booking.status == 'draft' and booking.payment_status not in ['paid', 'deposit_paid']:
+        if slot_service.release(db, booking.id):
+            availability_service.bump_version(db, booking.caterer_id)
+        # Physical delete for drafts to prevent database bloat
+        db.delete(booking)
+        db.commit()
+        return RedirectResponse(url="/customer/bookings?msg=draft_deleted", status_code=303)
+
+    # Soft cancel for submitted but unpaid bookings
+    try:
+        booking_state.transition(
+            db, booking.id, "customer_cancel", "Booking cancelled by customer",
+            scope={"user_id": user.id}
+        )
+    except TransitionError:
         return RedirectResponse(url=f"/customer/bookings/manage/{booking_id}?error=cannot_cancel", status_code=303)
+    db.commit()
+    return RedirectResponse(url=f"/customer/bookings/manage/{booking_id}?msg=cancelled", status_code=303)
 
 @router.get("/payments", response_class=HTMLResponse)
 async def customer_payments(
@@ -244,6 +272,7 @@ async def customer_marketplace(
     max_price: Optional[float] = None,
     rating: Optional[float] = None,
     city: Optional[str] = None,
+    event_date: Optional[date] = None,
     sort: Optional[str] = "newest",
     db: Session = Depends(database.get_db),
     user: models.User = Depends(customer_only)
@@ -286,6 +315,10 @@ async def customer_marketplace(
     if city:
         query = query.filter(models.CatererProfile.city == city)
 
+    # Date filter: drop caterers with a blocked date or confirmed event that day
+    if event_date:
+        query = availability_service.filter_available_on(query, event_date)
+
     # Price range filter (on the calculated min_price)
     if min_price is not None:
         query = query.filter(stats_subquery.c.min_price >= min_price)
@@ -337,6 +370,7 @@ async def customer_marketplace(
             "max_price": max_price,
             "rating": rating or 0,
             "city": city or "",
+            "event_date": event_date.isoformat() if event_date else "",
             "sort": sort
         }
     })
@@ -384,17 +418,7 @@ async def update_profile_photo(
     db: Session = Depends(database.get_db),
     user: models.User = Depends(customer_only)
 ):
-    UPLOAD_DIR = "app/static/uploads/profiles"
-    os.makedirs(UPLOAD_DIR, exist_ok=True)
-    
-    file_extension = os.path.splitext(file.filename)[1]
-    filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = os.path.join(UPLOAD_DIR, filename)
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    user.profile_image_url = f"/static/uploads/profiles/{filename}"
+    user.profile_image_url = await image_pipeline.save(file)
     db.commit()
     
     return RedirectResponse(url="/customer/profile?success=photo_updated", status_code=303)
@@ -419,23 +443,17 @@ async def process_verification(
     db: Session = Depends(database.get_db),
     user: models.User = Depends(customer_only)
 ):
-    # Setup upload directory
-    UPLOAD_DIR = "app/static/uploads/verification"
-    os.makedirs(UPLOAD_DIR, exist_ok=True)
-    
     # Save ID Document
     id_ext = os.path.splitext(id_document.filename)[1]
-    id_filename = f"user_{user.id}_id_{uuid.uuid4()}{id_ext}"
-    id_path = os.path.join(UPLOAD_DIR, id_filename)
-    with open(id_path, "wb") as buffer:
-        shutil.copyfileobj(id_document.file, buffer)
+    id_key = f"verification/user_{user.id}_id_{uuid.uuid4()}{id_ext}"
+    await asyncio.to_thread(upload_storage.put, id_key, id_document.file, id_document.content_type)
         
     # Save Selfie
     selfie_ext = os.path.splitext(selfie.filename)[1]
-    selfie_filename = f"user_{user.id}_selfie_{uuid.uuid4()}{selfie_ext}"
-    selfie_path = os.path.join(UPLOAD_DIR, selfie_filename)
-    with open(selfie_path, "wb") as buffer:
-        shutil.copyfileobj(selfie.file, buffer)
+    selfie_key = f"verification/user_{user.id}_selfie_{uuid.uuid4()}{selfie_ext}"
+    await asyncio.to_thread(upload_storage.put, selfie_key, selfie.file, selfie.content_type)
+    id_url = upload_storage.public_url(id_key)
+    selfie_url = upload_storage.public_url(selfie_key)
         
     # Create Verification Record
     kyc_record = db.query(models.IdentityVerification).filter(models.IdentityVerification.user_id == user.id).first()
@@ -443,8 +461,8 @@ async def process_verification(
         kyc_record = models.IdentityVerification(user_id=user.id)
         db.add(kyc_record)
     
-    kyc_record.document_url = f"/static/uploads/verification/{id_filename}"
-    kyc_record.selfie_url = f"/static/uploads/verification/{selfie_filename}"
+    kyc_record.document_url = id_url
+    kyc_record.selfie_url = selfie_url
     kyc_record.verification_status = "processing"
     db.commit()
     
@@ -453,8 +471,8 @@ async def process_verification(
         run_customer_verification_bg,
         user.id,
         client_id,
-        id_path,
-        [selfie_path]
+        id_url,
+        [selfie_url]
     )
     
     return RedirectResponse(url="/customer/dashboard?info=verification_started", status_code=303)
@@ -489,6 +507,11 @@ async def run_customer_verification_bg(user_id: int, client_id: str, id_path: st
             "MOCK-ID-123", 
             "Passport"
         )
+
+        if result.get("document_hashes"):
+            matches = document_hash_index.record(db, user_id, id_path, result["document_hashes"])
+            if matches and result["status"] == "approved":
+                result["status"] = "manual_review"
         
         # 3. Update DB
         kyc_record = db.query(models.IdentityVerification).filter(models.IdentityVerification.user_id == user_id).first()
@@ -499,6 +522,8 @@ async def run_customer_verification_bg(user_id: int, client_id: str, id_path: st
             user.is_verified = True
             user.is_kyc_complete = True
             msg = "Verification Successful! Redirecting..."
+        elif result["status"] == "manual_review":
+            msg = "Your verification is being held for manual review by our team."
         else:
             msg = "Verification Failed: Low clarity or fraud detected."
             
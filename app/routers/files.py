@@ -0,0 +1,40 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import RedirectResponse
+from ..core.config import settings
+from ..services.storage import LocalStorage, object_response, private_storage, upload_storage
+
+router = APIRouter(tags=["files"])
+
+@router.get("/files/{key:path}")
+async def public_file(key: str, request: Request):
+    """
+    Public uploads by storage key. With the S3 backend and no public bucket URL this is
+    what stored upload URLs point at: a short-lived redirect to a presigned GET, so the
+    bytes never pass through the app. Locally the file is streamed with range support.
+    """
+    try:
+        upload_storage.check_key(key)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    if not isinstance(upload_storage, LocalStorage):
+        return RedirectResponse(
+            upload_storage.presigned_url(key),
+            status_code=307,
+            # Cached for less than the signature lives, so a cached redirect never points at an expired URL
+            headers={"Cache-Control": f"public, max-age={settings.STORAGE_PRESIGN_SECONDS // 2}"}
+        )
+    return await object_response(upload_storage, key, request, {"Cache-Control": "public, max-age=3600"})
+
+@router.get("/signed/{key:path}")
+async def signed_file(key: str, request: Request, expires: int, signature: str):
+    """Presigned URLs of the local private store; S3 presigned URLs go straight to the bucket."""
+    if not isinstance(private_storage, LocalStorage):
+        raise HTTPException(status_code=404, detail="File not found")
+    try:
+        private_storage.check_key(key)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="File not found")
+    if not private_storage.verify(key, expires, signature):
+        raise HTTPException(status_code=403, detail="Link expired or invalid.")
+    return await object_response(private_storage, key, request, {"Cache-Control": "private, no-store"})
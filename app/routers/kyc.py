@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, BackgroundTasks, Request
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, BackgroundTasks, Request
 from sqlalchemy.orm import Session
 from ..db import database, models
 from ..core import security as auth
 from ..services.verification import verification_service
-from ..core.encryption import encrypt_data, decrypt_data
-from fastapi.responses import Response
-import os
+from ..services.kyc_documents import kyc_documents
+from ..services.kyc_thumbnails import kyc_thumbnails
+from ..services.document_hashes import document_hash_index
+from ..core.encryption import DecryptionError
+from fastapi.responses import RedirectResponse, Response
 import uuid
 import shutil
 import io
@@ -15,12 +17,11 @@ import time
 # Security Constants
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
 ALLOWED_MIME_TYPES = ["image/jpeg", "image/png"]
+# Shown to the customer; what triggered the review stays in fraud flags and the admin audit trail
+MANUAL_REVIEW_REASON = "Your verification is being held for manual review by our team."
 
 router = APIRouter(prefix="/api/bookings", tags=["kyc"])
 
-UPLOAD_DIR = "app/static/uploads/verification"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
 @router.post("/{booking_id}/upload-id")
 async def upload_id(
     booking_id: int,
@@ -62,21 +63,9 @@ async def upload_id(
     if id_document.content_type not in ALLOWED_MIME_TYPES:
         raise HTTPException(status_code=400, detail="Invalid file type. Only JPEG and PNG are allowed.")
     
-    # Check file size (FastAPI doesn't do this by default, we read a bit)
-    content = await id_document.read()
-    if len(content) > MAX_FILE_SIZE:
-        raise HTTPException(status_code=400, detail="File too large. Max size is 5MB.")
-    
-    # Encrypt data
-    encrypted_content = encrypt_data(content)
-
-    # Save Encrypted File
+    # Encrypted while it streams in; rejected as soon as it passes the size limit
     filename = f"user_{current_user.id}_id_{uuid.uuid4()}.enc"
-    path = os.path.join(UPLOAD_DIR, filename)
-    with open(path, "wb") as f:
-        f.write(encrypted_content)
-    
-    id_url = f"/api/bookings/kyc/view/{filename}"
+    id_url = await kyc_documents.save(id_document, filename, MAX_FILE_SIZE)
 
     # Create/Update Verification Record
     kyc_record = db.query(models.IdentityVerification).filter(models.IdentityVerification.user_id == current_user.id).first()
@@ -111,16 +100,11 @@ async def verify_full(
         if file.content_type not in ALLOWED_MIME_TYPES:
              continue # Skip invalid ones or raise error
              
-        content = await file.read()
-        if len(content) > MAX_FILE_SIZE:
-            continue
-
-        encrypted_content = encrypt_data(content)
         filename = f"user_{current_user.id}_selfie_{i+1}_{uuid.uuid4()}.enc"
-        path = os.path.join(UPLOAD_DIR, filename)
-        with open(path, "wb") as f:
-            f.write(encrypted_content)
-        selfie_urls.append(f"/api/bookings/kyc/view/{filename}")
+        try:
+            selfie_urls.append(await kyc_documents.save(file, filename, MAX_FILE_SIZE))
+        except HTTPException:
+            continue # Too large
     
     kyc_record.selfie_url = selfie_urls[0]
     if len(selfie_urls) > 1: kyc_record.selfie_2_url = selfie_urls[1]
@@ -155,6 +139,15 @@ def process_kyc_background(user_id, booking_id, id_path, selfie_paths, full_name
         time.sleep(1.5)
         
         result = verification_service.verify_identity_v2(id_path, selfie_paths, full_name, id_number, id_type)
+
+        # Same ID image already used by another account: flag it and hold for a human
+        review_note = ""
+        if result.get("document_hashes"):
+            matches = document_hash_index.record(db, user_id, id_path, result["document_hashes"], booking_id=booking_id)
+            if matches and result["status"] == "approved":
+                result["status"] = "manual_review"
+                result["failure_reason"] = MANUAL_REVIEW_REASON
+                review_note = ", ID document matches user #" + ", #".join(str(m["user_id"]) for m in matches)
         
         kyc_record.verification_status = result["status"]
         kyc_record.fraud_score = result["fraud_score"]
@@ -174,7 +167,7 @@ def process_kyc_background(user_id, booking_id, id_path, selfie_paths, full_name
             action="kyc_verification",
             old_status="processing",
             new_status=result["status"],
-            notes=f"Fraud Score: {result['fraud_score']}, OCR: {result['ocr_match']}"
+            notes=f"Fraud Score: {result['fraud_score']}, OCR: {result['ocr_match']}{review_note}"
         )
         db.add(audit)
         db.commit()
@@ -201,6 +194,7 @@ async def get_kyc_status(
 @router.get("/kyc/view/{filename}")
 async def view_kyc_document(
     filename: str,
+    request: Request,
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
@@ -209,29 +203,31 @@ async def view_kyc_document(
     is_admin = current_user.role == "admin"
     
     # Safety Check: Filename must be in the upload dir and look like a kyc file
-    if not (filename.startswith(f"user_{current_user.id}") or is_admin):
+    if not (filename.startswith(f"user_{current_user.id}_") or is_admin):
         raise HTTPException(status_code=403, detail="Unauthorized access to this document.")
 
-    path = os.path.join(UPLOAD_DIR, filename)
-    if not os.path.exists(path):
-        raise HTTPException(status_code=404, detail="Document not found.")
+    # Decrypted segment by segment while streaming; supports Range for large documents.
+    # A 422 means KYC_ENCRYPTION_KEY changed since the file was uploaded.
+    return await kyc_documents.response(filename, request)
 
-    with open(path, "rb") as f:
-        encrypted_data = f.read()
-    
-    try:
-        from cryptography.fernet import InvalidToken
-        decrypted_data = decrypt_data(encrypted_data)
-    except InvalidToken:
-        # This happens if the KYC_ENCRYPTION_KEY in .env was changed
-        raise HTTPException(
-            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, 
-            detail="Document decryption failed. The encryption key has changed since this file was uploaded. Please ask the user to re-upload."
-        )
-    except Exception as e:
-        print(f"Decryption error: {e}")
-        raise HTTPException(status_code=500, detail="Failed to decrypt document.")
+@router.get("/kyc/thumb/{filename}")
+async def view_kyc_thumbnail(
+    filename: str,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """Downscaled review copy of a KYC document, rendered once and cached encrypted."""
+    is_admin = current_user.role == "admin"
+    if not (filename.startswith(f"user_{current_user.id}_") or is_admin):
+        raise HTTPException(status_code=403, detail="Unauthorized access to this document.")
 
-    # Infer MIME type from filename or just use image/jpeg as default
-    # Real app would store MIME in DB
-    return Response(content=decrypted_data, media_type="image/jpeg")
+    try:
+        thumbnail = await kyc_thumbnails.get(filename)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Document not found.")
+    except DecryptionError:
+        raise HTTPException(status_code=422, detail=kyc_documents.DECRYPTION_FAILED)
+    if thumbnail is None:
+        # Not an image (e.g. a PDF): nothing smaller to show than the document itself
+        return RedirectResponse(url=f"/api/bookings/kyc/view/{filename}", status_code=307)
+    return Response(content=thumbnail, media_type=kyc_thumbnails.MEDIA_TYPE, headers={"Cache-Control": "private, no-store"})
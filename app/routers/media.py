@@ -0,0 +1,44 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, Response
+from typing import Optional
+import asyncio
+from ..services.media import media_cache
+
+router = APIRouter(tags=["media"])
+
+@router.get("/media/{path:path}")
+async def resized_media(
+    path: str,
+    request: Request,
+    w: Optional[int] = None,
+    h: Optional[int] = None,
+    fmt: Optional[str] = None
+):
+    """
+    Resized copy of a public upload, e.g. /media/caterer/logo.jpg?w=320 for
+    /static/uploads/caterer/logo.jpg. Rendered on first request, then served from the disk cache.
+    """
+    source = await asyncio.to_thread(media_cache.source_path, path)
+    if source is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    negotiated = fmt is None
+    if negotiated:
+        fmt = "webp" if "image/webp" in request.headers.get("accept", "") else "jpeg"
+    try:
+        w, h, fmt = media_cache.normalize(w, h, fmt.lower())
+        cached_path, key = await media_cache.get(source, w, h, fmt)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    headers = {
+        "ETag": f'"{key}"',
+        # Uploads are write-once (fresh name per upload), so a URL never changes meaning
+        "Cache-Control": "public, max-age=31536000, immutable"
+    }
+    if negotiated:
+        headers["Vary"] = "Accept"
+    if headers["ETag"] in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    return FileResponse(cached_path, media_type=f"image/{fmt}", headers=headers)
@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, Form
+from fastapi import APIRouter, Depends, HTTPException, Request, Form, Query
 from sqlalchemy.orm import Session
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, Response, JSONResponse
 from ..db import database, models
 from ..core import security as auth
-from typing import Optional
+from ..services.availability import availability_service
+from ..services.pricing import pricing_engine
+from typing import List, Optional
+from datetime import date, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
 
 router = APIRouter(prefix="/packages", tags=["packages"])
 templates = Jinja2Templates(directory="templates")
@@ -72,7 +76,104 @@ async def check_availability(
     
     if blocked:
         return {"available": False, "reason": blocked.reason or "Fully Booked"}
-    
-    # Optional: check if number of bookings on that day exceeds caterer capacity
-    # For now, let's keep it simple: if not blocked, it's available.
+
+    # Same occupancy the search and slot reservation use: confirmed events and held slots
+    free = availability_service.filter_available_on(
+        db.query(models.CatererProfile.id).filter(models.CatererProfile.id == caterer_id),
+        target_date
+    ).first()
+    if not free:
+        return {"available": False, "reason": "Fully Booked"}
     return {"available": True}
+
+@router.get("/api/{package_id}/quote")
+async def package_quote_table(
+    package_id: int,
+    guests_from: int,
+    guests_to: int,
+    guests_step: int = 1,
+    downpayment_percents: List[int] = Query([30, 40, 50]),
+    addon_ids: List[int] = Query([]),
+    overtime_hours: int = 0,
+    db: Session = Depends(database.get_db)
+):
+    """
+    Price table for a guest-count range x downpayment percentages with the chosen add-ons
+    and overtime, computed in one pass from the package's compiled pricing rules.
+    """
+    if guests_step < 1 or guests_from < 1 or guests_to < guests_from:
+        raise HTTPException(status_code=400, detail="Invalid guest range")
+
+    pricing = pricing_engine.load(db, package_id)
+    if pricing is None:
+        raise HTTPException(status_code=404, detail="Package not found")
+
+    try:
+        addon_cents = pricing_engine.addon_total_cents(pricing, dict.fromkeys(addon_ids))
+        rules = pricing_engine.rules(db, pricing)
+        table = pricing_engine.quote_table(
+            rules,
+            addon_cents,
+            range(guests_from, guests_to + 1, guests_step),
+            downpayment_percents,
+            overtime_hours
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {
+        "package_id": package_id,
+        "pricing_version": pricing.version,
+        **pricing_engine.table_response(table, rules, addon_cents)
+    }
+
+@router.get("/api/availability-range")
+async def availability_range(
+    request: Request,
+    caterer_id: int,
+    start: date,
+    end: Optional[date] = None,
+    db: Session = Depends(database.get_db)
+):
+    """Blocked/booked/free status for every day in a window, e.g. a month picker."""
+    if end is None:
+        end = start + timedelta(days=30)
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    if (end - start).days >= availability_service.MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range cannot exceed {availability_service.MAX_RANGE_DAYS} days")
+
+    version = availability_service.get_version(db, caterer_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Caterer not found")
+    version_no, updated_at = version
+    if updated_at:
+        # psycopg2 hands back the session's time zone; HTTP dates must be GMT
+        updated_at = updated_at.astimezone(timezone.utc)
+
+    # Validators are derived from the caterer's availability version, so the
+    # range query is skipped entirely when the calendar has not changed.
+    etag = f'W/"avail-{caterer_id}-{version_no}-{start.isoformat()}-{end.isoformat()}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if updated_at:
+        headers["Last-Modified"] = format_datetime(updated_at, usegmt=True)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        if etag in [tag.strip() for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+    elif updated_at and request.headers.get("if-modified-since"):
+        try:
+            since = parsedate_to_datetime(request.headers["if-modified-since"])
+            if updated_at.replace(microsecond=0) <= since:
+                return Response(status_code=304, headers=headers)
+        except (TypeError, ValueError):
+            pass
+
+    days = availability_service.get_range(db, caterer_id, start, end)
+    return JSONResponse(content={
+        "caterer_id": caterer_id,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "days": days
+    }, headers=headers)
@@ -1,10 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Form, Request
 from sqlalchemy.orm import Session
-from ..db import database, models
+from ..db import database, models, schemas
 from ..core import security as auth
 from ..services.quotation import quotation_service
+from ..services.slots import slot_service
+from ..services.availability import availability_service
+from ..services.contracts import contract_renderer
+from ..services.pricing import pricing_engine, PricingRules, to_cents, from_cents
 from typing import Optional
-from datetime import datetime
+from datetime import datetime, timezone
 from sqlalchemy import func
 
 router = APIRouter(prefix="/api/bookings", tags=["quotations"])
@@ -34,6 +38,14 @@ async def create_quote_request(
     if not package:
          raise HTTPException(status_code=404, detail="Package not found")
 
+    # Drafts hold no capacity; the slot is taken once the booking leaves draft
+    has_room = availability_service.filter_available_on(
+        db.query(models.CatererProfile.id).filter(models.CatererProfile.id == caterer_id),
+        date_obj
+    ).first()
+    if not has_room:
+        raise HTTPException(status_code=409, detail="Date is fully booked")
+
     # Create draft booking
     booking = models.Booking(
         user_id=current_user.id,
@@ -63,14 +75,7 @@ async def get_booking(
     
     return booking
 
-@router.post("/{booking_id}/calculate")
-async def calculate_quotation(
-    booking_id: int,
-    request: Request,
-    guest_count: int = Form(...),
-    downpayment_percent: int = Form(...),
-    db: Session = Depends(database.get_db),
-):
+def get_session_user(request: Request, db: Session) -> models.User:
     # Session-based auth (same as booking wizard pages)
     token = request.cookies.get("access_token")
     if not token:
@@ -88,43 +93,97 @@ async def calculate_quotation(
             raise HTTPException(status_code=401, detail="Not authenticated")
     except Exception:
         raise HTTPException(status_code=401, detail="Not authenticated")
+    return current_user
+
+def booking_price_inputs(db: Session, booking: models.Booking):
+    """
+    (rules, addon_total_cents, overtime_hours) for what-if pricing of a booking. The
+    quotation snapshot is used once it exists so previews match what signing will charge.
+    """
+    quotation = db.query(models.Quotation.package_details, models.Quotation.addons).filter(
+        models.Quotation.booking_id == booking.id
+    ).first()
+    if quotation and quotation.package_details:
+        rules = PricingRules.from_snapshot(quotation.package_details)
+        addon_cents = sum(to_cents(a.get("price", 0)) for a in (quotation.addons or []))
+        return rules, addon_cents, quotation.package_details.get("overtime_hours") or 0
+
+    if not booking.package_id:
+        raise HTTPException(status_code=400, detail="Booking has no package to price")
+    rules = pricing_engine.rules(db, pricing_engine.load(db, booking.package_id))
+    addon_total = db.query(func.sum(models.BookingMenuItem.price)).filter(
+        models.BookingMenuItem.booking_id == booking.id,
+        models.BookingMenuItem.is_add_on == True
+    ).scalar()
+    return rules, to_cents(addon_total), 0
+
+@router.post("/{booking_id}/calculate")
+async def calculate_quotation(
+    booking_id: int,
+    request: Request,
+    guest_count: int = Form(...),
+    downpayment_percent: int = Form(...),
+    overtime_hours: Optional[int] = Form(None),
+    db: Session = Depends(database.get_db),
+):
+    current_user = get_session_user(request, db)
 
     booking = db.query(models.Booking).get(booking_id)
-    if not booking:
+    if not booking or booking.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Booking not found")
     
-    package = booking.package
-    from decimal import Decimal
-    
-    # Calculate base amount
-    actual_unit_price = package.price_per_head if hasattr(package, 'price_per_head') and package.price_per_head else package.price
-    unit_price = Decimal(str(actual_unit_price))
-    base_amount = unit_price * Decimal(str(guest_count))
-    
-    # Calculate addon total
-    from ..db.models import BookingMenuItem
-    addon_total = db.query(func.sum(BookingMenuItem.price)).filter(
-        BookingMenuItem.booking_id == booking_id,
-        BookingMenuItem.is_add_on == True
-    ).scalar() or 0.0
-    
-    total_amount = base_amount + Decimal(str(addon_total))
-    deposit_amount = total_amount * (Decimal(str(downpayment_percent)) / Decimal("100"))
+    rules, addon_cents, quoted_overtime = booking_price_inputs(db, booking)
+    if overtime_hours is None:
+        overtime_hours = quoted_overtime
+    try:
+        amounts = pricing_engine.quote(rules, addon_cents, guest_count, downpayment_percent, overtime_hours)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     return {
         "success": True,
-        "base_amount": float(base_amount),
-        "total_amount": float(total_amount),
-        "deposit_amount": float(deposit_amount),
+        "base_amount": float(amounts["base_amount"]),
+        "overtime_amount": float(amounts["overtime_amount"]),
+        "discount_amount": float(amounts["discount_amount"]),
+        "total_amount": float(amounts["total_amount"]),
+        "deposit_amount": float(amounts["deposit_amount"]),
         "guest_count": guest_count,
         "downpayment_percent": downpayment_percent,
-        "unit_price": float(unit_price)
+        "overtime_hours": overtime_hours,
+        "unit_price": from_cents(rules.unit_price_cents)
     }
 
+@router.post("/{booking_id}/calculate/batch")
+async def calculate_quotation_batch(
+    booking_id: int,
+    request: Request,
+    data: schemas.QuoteBatchRequest,
+    db: Session = Depends(database.get_db),
+):
+    """
+    What-if pricing for many guest counts and downpayment percentages in one call,
+    so the quotation slider can be driven from a single response.
+    """
+    current_user = get_session_user(request, db)
+
+    booking = db.query(models.Booking).get(booking_id)
+    if not booking or booking.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Booking not found")
+
+    rules, addon_cents, overtime_hours = booking_price_inputs(db, booking)
+    if data.overtime_hours is not None:
+        overtime_hours = data.overtime_hours
+    try:
+        table = pricing_engine.quote_table(rules, addon_cents, data.guest_counts, data.downpayment_percents, overtime_hours)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"success": True, **pricing_engine.table_response(table, rules, addon_cents)}
+
 @router.post("/{booking_id}/quotation")
 async def generate_quotation(
     booking_id: int,
     downpayment_percent: int = Form(30),
+    overtime_hours: int = Form(0),
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
@@ -133,7 +192,7 @@ async def generate_quotation(
         raise HTTPException(status_code=404, detail="Booking not found")
     
     try:
-        quotation = quotation_service.create_quotation(db, booking, downpayment_percent)
+        quotation = quotation_service.create_quotation(db, booking, downpayment_percent, overtime_hours)
         return quotation
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -150,40 +209,46 @@ async def sign_contract(
     quotation = db.query(models.Quotation).filter(models.Quotation.booking_id == booking_id).first()
     booking = db.query(models.Booking).get(booking_id)
     
-    if not quotation or not booking:
+    if not quotation or not booking or booking.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Quotation or Booking not found")
 
     # Update Downpayment Percentage
     if downpayment_percent:
         quotation.downpayment_percent = int(downpayment_percent)
         
-    from decimal import Decimal
-    dp_factor = Decimal(str(quotation.downpayment_percent / 100))
+    dp_percent = pricing_engine.clamp_downpayment(quotation.downpayment_percent)
+    quotation.downpayment_percent = dp_percent
     
     # Sync guest count if adjusted
     if guest_count and guest_count != quotation.package_details.get("guest_count"):
-        unit_price = Decimal(str(quotation.package_details.get("unit_price", 0)))
+        if not slot_service.resize(db, booking, int(guest_count)):
+            db.rollback()
+            raise HTTPException(status_code=409, detail="Not enough capacity left on this date for that many guests")
+
         new_guest_count = int(guest_count)
-        new_base_amount = unit_price * new_guest_count
-        
-        addon_total = sum(Decimal(str(a.get("price", 0))) for a in quotation.addons)
-        new_total = new_base_amount + addon_total
+        rules, addon_cents, overtime_hours = booking_price_inputs(db, booking)
+        amounts = pricing_engine.quote(rules, addon_cents, new_guest_count, dp_percent, overtime_hours)
         
         details = quotation.package_details.copy()
         details["guest_count"] = new_guest_count
-        details["base_amount"] = float(new_base_amount)
+        details["base_amount"] = float(amounts["base_amount"])
+        if "pricing_rules" in details:
+            details["discount_amount"] = float(amounts["discount_amount"])
         quotation.package_details = details
-        quotation.total_amount = float(new_total)
+        quotation.total_amount = float(amounts["total_amount"])
         
         booking.guest_count = new_guest_count
-        booking.total_amount = float(new_total)
-        booking.reservation_fee = new_total * dp_factor
+        booking.total_amount = float(amounts["total_amount"])
+        booking.reservation_fee = amounts["deposit_amount"]
     else:
-        new_total = Decimal(str(quotation.total_amount))
-        booking.reservation_fee = new_total * dp_factor
+        booking.reservation_fee = pricing_engine.deposit(to_cents(quotation.total_amount), dp_percent)
 
     quotation.status = "signed"
-    # signature_data can be stored in a signature field if added to model later
+    quotation.signed_name = signature_data.strip()[:255]
+    quotation.signed_at = datetime.now(timezone.utc)
+    quotation.contract_url = f"/customer/bookings/{booking.id}/contract.pdf"
     
     db.commit()
+    # Render the signed PDF off the request so the first download is already on disk
+    contract_renderer.prerender(booking, quotation)
     return {"success": True}
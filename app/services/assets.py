@@ -0,0 +1,188 @@
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.types import Scope
+from typing import Dict, Optional
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import stat
+import threading
+import anyio
+
+try:
+    import brotli
+except ImportError: # optional: without it only .gz copies are built
+    brotli = None
+
+class AssetManifest:
+    """
+    Fingerprinted, precompressed copies of the CSS and JS under app/static.
+
+    `build()` (scripts/utils/build_assets.py, run on deploy) copies every asset to
+    dist/<dir>/<name>.<content hash><ext>, writes .gz and .br siblings when they are
+    smaller, and records source -> fingerprinted path in dist/manifest.json. Because a
+    new version gets a new name, those URLs can be cached forever. Templates resolve
+    them with the `asset_url` helper, which falls back to the plain /static URL for
+    anything not in the manifest (e.g. in development before a build).
+    """
+    STATIC_DIR = "app/static"
+    DIST = "dist"
+    SOURCE_DIRS = ("css", "js")
+    EXTENSIONS = (".css", ".js")
+    HASH_LENGTH = 12
+    # Below this compression rarely pays for the extra request-path work
+    MIN_COMPRESS_BYTES = 256
+
+    def __init__(self, static_dir: str = STATIC_DIR):
+        self.static_dir = static_dir
+        self._entries: Optional[Dict[str, str]] = None
+        self._mtime: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def dist_dir(self) -> str:
+        return os.path.join(self.static_dir, self.DIST)
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.dist_dir, "manifest.json")
+
+    # --- Build ---
+
+    def _sources(self):
+        for folder in self.SOURCE_DIRS:
+            for dirpath, _, filenames in os.walk(os.path.join(self.static_dir, folder)):
+                for filename in sorted(filenames):
+                    if filename.endswith(self.EXTENSIONS):
+                        path = os.path.join(dirpath, filename)
+                        yield os.path.relpath(path, self.static_dir).replace(os.sep, "/"), path
+
+    @staticmethod
+    def _write(path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def build(self, prune: bool = True) -> Dict[str, int]:
+        """Writes the fingerprinted copies and the manifest. Returns counts and sizes."""
+        report = {"assets": 0, "written": 0, "bytes": 0, "gzip_bytes": 0, "brotli_bytes": 0, "pruned": 0}
+        entries: Dict[str, str] = {}
+        keep = {self.manifest_path}
+
+        for relative, path in self._sources():
+            with open(path, "rb") as f:
+                data = f.read()
+            stem, ext = os.path.splitext(relative)
+            fingerprinted = f"{self.DIST}/{stem}.{hashlib.sha256(data).hexdigest()[:self.HASH_LENGTH]}{ext}"
+            entries[relative] = fingerprinted
+            target = os.path.join(self.static_dir, *fingerprinted.split("/"))
+            report["assets"] += 1
+            report["bytes"] += len(data)
+
+            variants = [(target, data)]
+            if len(data) >= self.MIN_COMPRESS_BYTES:
+                # mtime=0 keeps the .gz byte-identical across builds
+                variants.append((f"{target}.gz", gzip.compress(data, compresslevel=9, mtime=0)))
+                if brotli is not None:
+                    variants.append((f"{target}.br", brotli.compress(data, quality=11)))
+            for variant_path, variant in variants:
+                if variant_path != target and len(variant) >= len(data):
+                    continue
+                keep.add(variant_path)
+                if variant_path.endswith(".gz"):
+                    report["gzip_bytes"] += len(variant)
+                elif variant_path.endswith(".br"):
+                    report["brotli_bytes"] += len(variant)
+                # Same name means same content, so existing files are left alone
+                if not os.path.exists(variant_path):
+                    self._write(variant_path, variant)
+                    report["written"] += 1
+
+        self._write(self.manifest_path, json.dumps(entries, indent=2, sort_keys=True).encode())
+        if prune:
+            for dirpath, _, filenames in os.walk(self.dist_dir):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    if path not in keep:
+                        os.remove(path)
+                        report["pruned"] += 1
+        with self._lock:
+            self._entries = None
+        return report
+
+    # --- Lookup ---
+
+    def _load(self) -> Dict[str, str]:
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime
+        except FileNotFoundError:
+            mtime = None
+        with self._lock:
+            if self._entries is None or mtime != self._mtime:
+                entries = {}
+                if mtime is not None:
+                    with open(self.manifest_path, encoding="utf-8") as f:
+                        entries = json.load(f)
+                self._entries, self._mtime = entries, mtime
+            return self._entries
+
+    def url(self, path: str) -> str:
+        """Jinja helper: asset_url('css/styles.css') -> /static/dist/css/styles.<hash>.css."""
+        relative = path.lstrip("/")
+        return f"/static/{self._load().get(relative, relative)}"
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles that serves the build's .br/.gz siblings to clients that accept them and
+    marks fingerprinted files immutable. Everything outside dist/ is served as before.
+    """
+    IMMUTABLE = "public, max-age=31536000, immutable"
+    ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+    @staticmethod
+    def _accepted(header: str) -> set:
+        accepted = set()
+        for part in header.split(","):
+            coding, _, params = part.strip().partition(";")
+            q = params.strip()
+            if q.startswith("q="):
+                try:
+                    if float(q[2:]) <= 0:
+                        continue
+                except ValueError:
+                    continue
+            accepted.add(coding.strip().lower())
+        return accepted
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if path.split(os.sep, 1)[0] != AssetManifest.DIST:
+            return await super().get_response(path, scope)
+
+        response = None
+        accepted = self._accepted(Headers(scope=scope).get("accept-encoding", ""))
+        for encoding, suffix in self.ENCODINGS:
+            if encoding not in accepted and "*" not in accepted:
+                continue
+            full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + suffix)
+            if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+                continue
+            response = self.file_response(full_path, stat_result, scope)
+            media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            if media_type.startswith("text/"):
+                media_type += "; charset=utf-8"
+            response.headers["Content-Encoding"] = encoding
+            response.headers["Content-Type"] = media_type
+            break
+        if response is None:
+            response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            response.headers["Cache-Control"] = self.IMMUTABLE
+            response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+asset_manifest = AssetManifest()
@@ -0,0 +1,204 @@
+from sqlalchemy import and_, exists, func, literal, null, select, union_all, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, Query
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Dict, List, Any, Optional, Tuple
+import threading
+from ..db import models
+from .slots import slot_service
+
+class CalendarCache:
+    """
+    Small in-process LRU of rendered public calendar feeds.
+    Entries are keyed by (caterer_id, start, end) and tagged with the caterer's
+    availability_version, so any bump makes every cached window for that caterer stale.
+    """
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[int, date, date], Tuple[int, List[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, caterer_id: int, start: date, end: date, version: int) -> Optional[List[Dict[str, Any]]]:
+        key = (caterer_id, start, end)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] != version:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, caterer_id: int, start: date, end: date, version: int, events: List[Dict[str, Any]]):
+        key = (caterer_id, start, end)
+        with self._lock:
+            self._entries[key] = (version, events)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, caterer_id: int):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == caterer_id]:
+                del self._entries[key]
+
+class AvailabilityService:
+    # Booking statuses that occupy a caterer's date
+    OCCUPYING_STATUSES = ["confirmed"]
+
+    # Longest window served by the range API and the calendar feed (about three months)
+    MAX_RANGE_DAYS = 93
+
+    # Upper bound on dates touched by a single bulk edit (two years)
+    MAX_BULK_DATES = 731
+
+    def __init__(self):
+        self.calendar_cache = CalendarCache()
+
+    def blocked_clause(self, caterer_id_column, target_date: date):
+        """EXISTS clause matching caterers that blocked the given date."""
+        return exists().where(and_(
+            models.Availability.caterer_id == caterer_id_column,
+            models.Availability.date == target_date,
+            models.Availability.is_available == False
+        ))
+
+    def booked_clause(self, caterer_id_column, target_date: date):
+        """EXISTS clause matching caterers that already have a confirmed event on the given date."""
+        return exists().where(and_(
+            models.Booking.caterer_id == caterer_id_column,
+            models.Booking.event_date == target_date,
+            models.Booking.status.in_(self.OCCUPYING_STATUSES)
+        ))
+
+    def filter_available_on(self, query: Query, target_date: date) -> Query:
+        """
+        Restricts a CatererProfile query to caterers free on target_date.
+        All checks are correlated NOT EXISTS sub-selects so Postgres plans them as anti-joins.
+        """
+        caterer_id = models.CatererProfile.id
+        return query.filter(
+            ~self.blocked_clause(caterer_id, target_date),
+            ~self.booked_clause(caterer_id, target_date),
+            ~slot_service.full_clause(caterer_id, target_date)
+        )
+
+    def bump_version(self, db: Session, caterer_id: int):
+        """
+        Marks a caterer's calendar as changed so cached range/calendar responses are invalidated.
+        Runs as a single UPDATE inside the caller's transaction.
+        """
+        db.execute(
+            update(models.CatererProfile)
+            .where(models.CatererProfile.id == caterer_id)
+            .values(
+                availability_version=func.coalesce(models.CatererProfile.availability_version, 0) + 1,
+                availability_updated_at=func.now()
+            )
+        )
+        # Versions already guard stale reads; dropping the entries just frees memory early
+        self.calendar_cache.invalidate(caterer_id)
+
+    def get_version(self, db: Session, caterer_id: int):
+        """Returns (version, updated_at) for a caterer, or None if the caterer does not exist."""
+        row = db.query(
+            models.CatererProfile.availability_version,
+            models.CatererProfile.availability_updated_at
+        ).filter(models.CatererProfile.id == caterer_id).first()
+        if row is None:
+            return None
+        return (row[0] or 0, row[1])
+
+    def get_range(self, db: Session, caterer_id: int, start: date, end: date) -> List[Dict[str, Any]]:
+        """
+        Day-by-day status ('free', 'blocked' or 'booked') for start..end inclusive.
+        Blocked dates, confirmed bookings and days whose slots are all reserved are
+        fetched together in one UNION ALL query.
+        """
+        blocked = select(
+            models.Availability.date.label("day"),
+            literal("blocked").label("kind"),
+            models.Availability.reason.label("reason")
+        ).where(
+            models.Availability.caterer_id == caterer_id,
+            models.Availability.date.between(start, end),
+            models.Availability.is_available == False
+        )
+        booked = select(
+            models.Booking.event_date.label("day"),
+            literal("booked").label("kind"),
+            null().label("reason")
+        ).where(
+            models.Booking.caterer_id == caterer_id,
+            models.Booking.event_date.between(start, end),
+            models.Booking.status.in_(self.OCCUPYING_STATUSES)
+        )
+        full = slot_service.full_days(caterer_id, start, end).add_columns(
+            literal("booked").label("kind"),
+            null().label("reason")
+        )
+
+        marks: Dict[date, Dict[str, Any]] = {}
+        for day, kind, reason in db.execute(union_all(blocked, booked, full)):
+            # A caterer's own block wins over a booking on the same day
+            if day in marks and marks[day]["status"] == "blocked":
+                continue
+            marks[day] = {"status": kind, "reason": reason or ("Fully Booked" if kind == "booked" else None)}
+
+        days = []
+        current = start
+        while current <= end:
+            mark = marks.get(current)
+            days.append({
+                "date": current.isoformat(),
+                "status": mark["status"] if mark else "free",
+                "reason": mark["reason"] if mark else None
+            })
+            current += timedelta(days=1)
+        return days
+
+    def expand_rules(self, ranges, dates) -> List[date]:
+        """
+        Expands explicit dates plus (start, end, weekdays) ranges into a sorted, de-duplicated list.
+        Raises ValueError for inverted ranges, bad weekdays or edits larger than MAX_BULK_DATES.
+        """
+        result = set(dates or [])
+        for r in ranges or []:
+            if r.end < r.start:
+                raise ValueError(f"Range {r.start} - {r.end} ends before it starts")
+            weekdays = set(r.weekdays) if r.weekdays else None
+            if weekdays and not weekdays.issubset(range(7)):
+                raise ValueError("Weekdays must be between 0 (Monday) and 6 (Sunday)")
+            if (r.end - r.start).days >= self.MAX_BULK_DATES:
+                raise ValueError(f"A single edit cannot span more than {self.MAX_BULK_DATES} days")
+            current = r.start
+            while current <= r.end:
+                if weekdays is None or current.weekday() in weekdays:
+                    result.add(current)
+                current += timedelta(days=1)
+        if len(result) > self.MAX_BULK_DATES:
+            raise ValueError(f"A single edit cannot touch more than {self.MAX_BULK_DATES} dates")
+        return sorted(result)
+
+    def set_dates(self, db: Session, caterer_id: int, dates: List[date], is_available: bool, reason: Optional[str] = None) -> int:
+        """
+        Blocks or unblocks every date in one INSERT ... ON CONFLICT (caterer_id, date) DO UPDATE,
+        then bumps the caterer's availability version. Caller commits.
+        """
+        if not dates:
+            return 0
+        stmt = insert(models.Availability).values([
+            {"caterer_id": caterer_id, "date": d, "is_available": is_available, "reason": reason}
+            for d in dates
+        ])
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_availability_caterer_date",
+            set_={"is_available": stmt.excluded.is_available, "reason": stmt.excluded.reason}
+        )
+        db.execute(stmt)
+        self.bump_version(db, caterer_id)
+        return len(dates)
+
+availability_service = AvailabilityService()
@@ -0,0 +1,208 @@
+from sqlalchemy import select, union_all, update
+from sqlalchemy.orm import Session
+from collections import Counter
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+import hashlib
+import os
+import re
+import time
+import uuid
+from ..db import models
+from .storage import ObjectInfo, upload_storage
+
+class BlobStore:
+    """
+    Content-addressed storage for public uploads.
+
+    Files live under blobs/<aa>/<sha256 of the uploaded bytes><suffix> in the uploads
+    store, so the same logo or photo uploaded twice is stored (and resized) once. Blobs
+    carry no owner; their reference count is the number of rows in REFERENCE_COLUMNS
+    that point at them, and `collect_garbage` deletes the ones nothing points at any more.
+    """
+    KEY_PREFIX = "blobs/"
+    # Raw uploads wait here (local, outside static, EXIF intact) until they are re-encoded
+    TMP_DIR = "storage/upload_tmp"
+    # Uploads are written before the row that references them is committed
+    GRACE_PERIOD = timedelta(hours=24)
+    REFERENCE_COLUMNS = (
+        models.User.profile_image_url,
+        models.CatererProfile.logo_url,
+        models.CatererProfile.cover_image_url,
+        models.CatererGallery.media_url,
+        models.CateringPackage.image_url,
+        models.MenuItem.image_url,
+    )
+    LEGACY_PREFIXES = ("caterer/", "profiles/")
+    # Matched anywhere in the URL, so rows written under another storage base still count
+    _URL_RE = re.compile(r"/blobs/[0-9a-f]{2}/(?P<digest>[0-9a-f]{64})")
+
+    # --- Keys ---
+
+    def stem(self, digest: str) -> str:
+        """Key prefix of every object stored for `digest`; callers append their suffix."""
+        return f"{self.KEY_PREFIX}{digest[:2]}/{digest}"
+
+    def url_for(self, key: str) -> str:
+        return upload_storage.public_url(key)
+
+    def digest_from_url(self, url: Optional[str]) -> Optional[str]:
+        match = self._URL_RE.search(url or "")
+        return match.group("digest") if match else None
+
+    def temp_path(self) -> str:
+        os.makedirs(self.TMP_DIR, exist_ok=True)
+        return os.path.join(self.TMP_DIR, f"{uuid.uuid4().hex}.upload")
+
+    def reuse(self, key: str) -> bool:
+        """
+        True if `key` is already stored. Its blob's objects get a fresh modification time,
+        so a garbage collection that saw them unreferenced a moment ago will not delete them now.
+        """
+        if not upload_storage.exists(key):
+            return False
+        digest = key[len(self.KEY_PREFIX) + 3:][:64]
+        for info in upload_storage.list(self.stem(digest)):
+            if not upload_storage.touch(info.key):
+                return False
+        return True
+
+    # --- Reference counting ---
+
+    def ref_counts(self, db: Session) -> Counter:
+        """digest -> number of rows pointing at it, across every reference column."""
+        referenced = union_all(*[
+            select(column.label("url")).where(column.like(f"%/{self.KEY_PREFIX}%"))
+            for column in self.REFERENCE_COLUMNS
+        ]).subquery()
+        counts: Counter = Counter()
+        for (url,) in db.execute(select(referenced.c.url)):
+            digest = self.digest_from_url(url)
+            if digest:
+                counts[digest] += 1
+        return counts
+
+    def is_referenced(self, db: Session, digest: str) -> bool:
+        """Fresh check of one blob against every reference column."""
+        pattern = f"%/{self.stem(digest)}%"
+        return any(
+            db.query(column).filter(column.like(pattern)).first() is not None
+            for column in self.REFERENCE_COLUMNS
+        )
+
+    def _unchanged(self, objects: List[ObjectInfo], cutoff: float) -> bool:
+        # reuse() touches every object of a blob before its row is written
+        for info in objects:
+            current = upload_storage.stat(info.key)
+            if current is not None and current.modified >= cutoff:
+                return False
+        return True
+
+    def collect_garbage(self, db: Session, grace: Optional[timedelta] = None, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Deletes blobs with no references whose objects are all older than the grace period,
+        plus abandoned temp uploads. Returns counts and bytes freed.
+
+        The reference scan can take a while on a big store, so each blob is checked again
+        (references, then modification times) right before its objects are deleted; a blob
+        reused during the run is counted as `reused` and kept.
+        """
+        cutoff = time.time() - (grace if grace is not None else self.GRACE_PERIOD).total_seconds()
+        counts = self.ref_counts(db)
+        report = {"blobs": 0, "referenced": 0, "references": sum(counts.values()), "deleted": 0, "reused": 0, "freed_bytes": 0, "temp_files": 0}
+
+        # Left behind by crashed or interrupted uploads
+        for dirpath, _, filenames in os.walk(self.TMP_DIR):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if stat.st_mtime < cutoff:
+                    report["temp_files"] += 1
+                    report["freed_bytes"] += stat.st_size
+                    if not dry_run:
+                        os.remove(path)
+
+        groups: Dict[str, List[ObjectInfo]] = {}
+        for info in upload_storage.list(self.KEY_PREFIX):
+            if info.key.endswith(".tmp"):
+                # Partial writes of the local driver
+                if info.modified < cutoff:
+                    report["temp_files"] += 1
+                    report["freed_bytes"] += info.size
+                    if not dry_run:
+                        upload_storage.delete(info.key)
+                continue
+            groups.setdefault(info.key.rsplit("/", 1)[-1][:64], []).append(info)
+
+        for digest, objects in groups.items():
+            report["blobs"] += 1
+            if counts.get(digest):
+                report["referenced"] += 1
+                continue
+            if any(info.modified >= cutoff for info in objects):
+                continue
+            if not dry_run:
+                if self.is_referenced(db, digest) or not self._unchanged(objects, cutoff):
+                    report["reused"] += 1
+                    continue
+                for info in objects:
+                    upload_storage.delete(info.key)
+            report["deleted"] += 1
+            report["freed_bytes"] += sum(info.size for info in objects)
+        return report
+
+    # --- Legacy uploads ---
+
+    def _hash_object(self, key: str) -> str:
+        h = hashlib.sha256()
+        for chunk in upload_storage.open_range(key):
+            h.update(chunk)
+        return h.hexdigest()
+
+    def adopt_legacy(self, db: Session, dry_run: bool = False) -> Dict[str, int]:
+        """
+        Moves uuid-named uploads that rows still point at into the blob store (identical
+        files collapse into one blob) and repoints every reference column. Commits.
+        """
+        report = {"files": 0, "duplicates": 0, "missing": 0, "rows": 0, "saved_bytes": 0}
+        urls = set()
+        for column in self.REFERENCE_COLUMNS:
+            for prefix in self.LEGACY_PREFIXES:
+                urls.update(url for (url,) in db.query(column).filter(column.like(f"%/{prefix}%")).distinct())
+
+        moved = []
+        for url in sorted(urls):
+            source = upload_storage.key_for_url(url)
+            info = upload_storage.stat(source) if source and source.startswith(self.LEGACY_PREFIXES) else None
+            if info is None:
+                report["missing"] += 1
+                continue
+            digest = self._hash_object(source)
+            target = self.stem(digest) + os.path.splitext(source)[1].lower()
+            report["files"] += 1
+            if upload_storage.exists(target):
+                report["duplicates"] += 1
+                report["saved_bytes"] += info.size
+            elif not dry_run:
+                upload_storage.put(target, upload_storage.open_range(source))
+
+            new_url = self.url_for(target)
+            for column in self.REFERENCE_COLUMNS:
+                if dry_run:
+                    continue
+                result = db.execute(update(column.class_).where(column == url).values({column.key: new_url}))
+                report["rows"] += result.rowcount
+            moved.append(source)
+
+        if dry_run:
+            return report
+        db.commit()
+        # Only after the rows point at the blobs
+        for source in moved:
+            upload_storage.delete(source)
+        return report
+
+blob_store = BlobStore()
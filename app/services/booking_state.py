@@ -0,0 +1,206 @@
+from sqlalchemy import insert, literal, or_, select, update
+from sqlalchemy.orm import Session
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from ..db import models
+from .availability import availability_service
+from .slots import slot_service
+
+class TransitionError(Exception):
+    """Raised when a booking is not in a state the requested transition can start from."""
+    def __init__(self, booking_id: int, action: str, current_status: Optional[str]):
+        super().__init__(f"Cannot {action} booking #{booking_id} while it is '{current_status}'")
+        self.booking_id = booking_id
+        self.action = action
+        self.current_status = current_status
+
+PAID_STATUSES = ("paid", "deposit_paid")
+
+@dataclass(frozen=True)
+class Transition:
+    from_statuses: Tuple[str, ...]
+    to_status: Optional[str] # None keeps the current status (payment-only transitions)
+    history_status: str
+    values: Dict[str, Any] = field(default_factory=dict)
+    releases_slot: bool = False
+    # Whether the caterer's public calendar changes (drives availability_version)
+    affects_calendar: bool = False
+    # Only allowed while the booking's payment_status is not one of paid_statuses
+    require_unpaid: bool = False
+    paid_statuses: Tuple[str, ...] = PAID_STATUSES
+
+class BookingStateMachine:
+    """
+    Single place that decides which booking status changes are allowed.
+
+    Each transition runs as one statement: a data-modifying CTE that does
+    UPDATE bookings ... WHERE id = :id AND status IN (:allowed) RETURNING, and inserts
+    the booking_history row from what the UPDATE returned. If another request moved the
+    booking first, the UPDATE matches nothing, no history is written and TransitionError
+    is raised - there is no read-modify-write window to lose an update in.
+    Slot release and calendar version bumps follow in the same transaction.
+    """
+    TRANSITIONS: Dict[str, Transition] = {
+        "accept": Transition(("pending", "verified"), "confirmed", "confirmed", affects_calendar=True),
+        "reject": Transition(("pending", "verified", "pending_payment"), "cancelled", "cancelled", releases_slot=True, affects_calendar=True),
+        "complete": Transition(("confirmed",), "completed", "completed", affects_calendar=True),
+        "cancel": Transition(("pending", "verified", "pending_payment", "confirmed"), "cancelled", "cancelled", releases_slot=True, affects_calendar=True),
+        "customer_cancel": Transition(("pending", "pending_payment"), "cancelled", "cancelled", releases_slot=True, affects_calendar=True, require_unpaid=True),
+        "confirm_payment": Transition(("draft", "pending", "pending_payment"), "confirmed", "confirmed", values={"payment_status": "paid"}, affects_calendar=True),
+        "manual_confirm": Transition(("pending", "pending_payment"), "confirmed", "confirmed", values={"payment_status": "paid", "payment_reference": "MANUAL_ADMIN_OVERRIDE"}, affects_calendar=True),
+        # A deposit_paid booking can still be settled in full
+        "mark_paid": Transition(("pending", "verified", "pending_payment", "confirmed", "completed"), None, "payment_received", values={"payment_status": "paid"}, require_unpaid=True, paid_statuses=("paid",)),
+        # Gateway payments that land after the booking expired: take the date back if it is still free...
+        "recover_payment": Transition(("expired",), "confirmed", "confirmed", values={"payment_status": "paid", "slot_reserved": True}, affects_calendar=True),
+        # ...otherwise keep the money on record for a refund (a draft whose day filled up lands here too)
+        "record_late_payment": Transition(("draft", "expired", "cancelled"), None, "refund_required", values={"payment_status": "paid"}, require_unpaid=True),
+        "expire": Transition(("draft", "pending", "pending_payment"), "expired", "expired", releases_slot=True, affects_calendar=True, require_unpaid=True),
+    }
+
+    def can(self, action: str, status: Optional[str]) -> bool:
+        return status in self.TRANSITIONS[action].from_statuses
+
+    def _statement(self, action: str, booking_ids: Sequence[int], notes: str, scope: Dict[str, Any], extra_values: Dict[str, Any]):
+        t = self.TRANSITIONS[action]
+        booking = models.Booking
+
+        conditions = [booking.id.in_(booking_ids), booking.status.in_(t.from_statuses)]
+        for column, value in scope.items():
+            conditions.append(getattr(booking, column) == value)
+        if t.require_unpaid:
+            conditions.append(or_(booking.payment_status == None, booking.payment_status.notin_(t.paid_statuses)))
+
+        values = dict(t.values, **extra_values)
+        if t.to_status:
+            values["status"] = t.to_status
+
+        moved = (
+            update(booking)
+            .where(*conditions)
+            .values(**values)
+            .returning(booking.id, booking.caterer_id, booking.status)
+            .cte("moved")
+        )
+        logged = (
+            insert(models.BookingHistory)
+            .from_select(
+                ["booking_id", "status", "notes"],
+                select(moved.c.id, literal(t.history_status), literal(notes))
+            )
+            .cte("logged")
+        )
+        return select(moved.c.id, moved.c.caterer_id, moved.c.status).add_cte(logged)
+
+    def _after(self, db: Session, action: str, rows) -> None:
+        t = self.TRANSITIONS[action]
+        if t.releases_slot:
+            slot_service.release_many(db, [r.id for r in rows])
+        if t.affects_calendar:
+            for caterer_id in {r.caterer_id for r in rows if r.caterer_id}:
+                availability_service.bump_version(db, caterer_id)
+        # Keep any Booking objects already loaded in the session in step with the rows we changed
+        for row in rows:
+            loaded = db.identity_map.get(db.identity_key(models.Booking, row.id))
+            if loaded is not None:
+                db.expire(loaded)
+
+    def transition(
+        self,
+        db: Session,
+        booking_id: int,
+        action: str,
+        notes: str,
+        scope: Optional[Dict[str, Any]] = None,
+        **extra_values
+    ) -> str:
+        """
+        Moves one booking and returns its new status. `scope` adds ownership filters
+        (e.g. caterer_id or user_id) to the same UPDATE. Raises TransitionError if the
+        booking is missing, out of scope or not in an allowed state. Caller commits.
+        """
+        scope = scope or {}
+        rows = db.execute(self._statement(action, [booking_id], notes, scope, extra_values)).all()
+        if not rows:
+            # Only reached on failure; a booking outside the caller's scope reports as missing
+            current = db.query(models.Booking.status).filter(
+                models.Booking.id == booking_id,
+                *[getattr(models.Booking, column) == value for column, value in scope.items()]
+            ).scalar()
+            raise TransitionError(booking_id, action, current)
+        self._after(db, action, rows)
+        return rows[0].status
+
+    def transition_many(
+        self,
+        db: Session,
+        booking_ids: List[int],
+        action: str,
+        notes: str,
+        scope: Optional[Dict[str, Any]] = None,
+        **extra_values
+    ) -> List[int]:
+        """Set-based variant: moves every eligible booking in one statement and returns the ids that moved."""
+        if not booking_ids:
+            return []
+        rows = db.execute(self._statement(action, booking_ids, notes, scope or {}, extra_values)).all()
+        self._after(db, action, rows)
+        return [r.id for r in rows]
+
+    def apply_payment(self, db: Session, booking_id: int, notes: str) -> str:
+        """
+        Applies a payment the gateway reported and says what happened to the booking:
+        'confirmed', 'already_confirmed', 'recovered' (had expired, date was still free
+        and is held again) or 'refund_required' (expired, cancelled or a draft whose day
+        is full; the payment is recorded and a late_payment flag raised for review).
+        Raises TransitionError if the booking doesn't exist. Caller commits.
+        """
+        savepoint = db.begin_nested()
+        # Drafts hold no slot yet, so a payment for one has to take the date first
+        if not slot_service.hold(db, booking_id):
+            savepoint.rollback()
+            previous = "draft"
+        else:
+            try:
+                self.transition(db, booking_id, "confirm_payment", notes)
+                savepoint.commit()
+                return "confirmed"
+            except TransitionError as e:
+                savepoint.rollback()
+                if e.current_status in ("confirmed", "completed"):
+                    return "already_confirmed"
+                if e.current_status not in ("expired", "cancelled"):
+                    raise
+                previous = e.current_status
+
+        booking = db.query(
+            models.Booking.caterer_id, models.Booking.event_date, models.Booking.guest_count
+        ).filter(models.Booking.id == booking_id).first()
+        if previous == "expired" and booking is not None:
+            savepoint = db.begin_nested()
+            if slot_service.reserve(db, booking.caterer_id, booking.event_date, booking.guest_count):
+                try:
+                    self.transition(db, booking_id, "recover_payment", f"{notes} (after expiry; date still free)")
+                    savepoint.commit()
+                    return "recovered"
+                except TransitionError:
+                    pass
+            # Day is full now, or another worker moved the booking first
+            savepoint.rollback()
+
+        try:
+            self.transition(db, booking_id, "record_late_payment", f"{notes} (booking was {previous}; refund or rebook)")
+        except TransitionError as late:
+            if late.current_status == "confirmed":
+                return "already_confirmed"
+            if late.current_status in ("draft", "expired", "cancelled"):
+                # Already recorded as paid by an earlier event
+                return "refund_required"
+            raise
+        db.add(models.FraudFlag(
+            booking_id=booking_id,
+            flag_type="late_payment",
+            description=f"Payment received for booking #{booking_id} while it was {previous}; the date could not be held. Refund or rebook."
+        ))
+        return "refund_required"
+
+booking_state = BookingStateMachine()
@@ -0,0 +1,218 @@
+"""
+Contract PDF rendering.
+
+Kept free of app and database imports: it runs inside the contract worker processes,
+which only receive the plain `content` dict built by ContractRenderer.
+"""
+from typing import Any, Dict, List, Tuple
+import os
+import tempfile
+
+PAGE_WIDTH = 595 # A4 in points
+PAGE_HEIGHT = 842
+MARGIN = 56
+
+FONTS = {"regular": "F1", "bold": "F2"}
+
+def _escape(text: str) -> str:
+    # Standard fonts use WinAnsiEncoding; anything outside Latin-1 is replaced
+    text = text.encode("latin-1", "replace").decode("latin-1")
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def _money(amount) -> str:
+    return f"PHP {float(amount or 0):,.2f}"
+
+class _Layout:
+    """Top-down text layout onto A4 pages with simple word wrapping."""
+    def __init__(self):
+        self.pages: List[List[str]] = []
+        self._new_page()
+
+    def _new_page(self):
+        self.ops: List[str] = []
+        self.pages.append(self.ops)
+        self.y = PAGE_HEIGHT - MARGIN
+
+    def _ensure(self, height: float):
+        if self.y - height < MARGIN:
+            self._new_page()
+
+    def _text(self, x: float, text: str, size: float, font: str = "regular"):
+        self.ops.append(f"BT /{FONTS[font]} {size} Tf {x:.1f} {self.y:.1f} Td ({_escape(text)}) Tj ET")
+
+    def _wrap(self, text: str, size: float, width: float) -> List[str]:
+        # Helvetica averages roughly half an em per character
+        max_chars = max(1, int(width / (size * 0.5)))
+        lines: List[str] = []
+        for paragraph in str(text).splitlines() or [""]:
+            line = ""
+            for word in paragraph.split():
+                candidate = f"{line} {word}" if line else word
+                if len(candidate) > max_chars and line:
+                    lines.append(line)
+                    line = word
+                else:
+                    line = candidate
+            lines.append(line)
+        return lines
+
+    def space(self, height: float):
+        self.y -= height
+
+    def title(self, text: str):
+        self._ensure(28)
+        self.y -= 20
+        size = 18
+        x = (PAGE_WIDTH - len(text) * size * 0.55) / 2
+        self._text(max(MARGIN, x), text, size, "bold")
+        self.y -= 8
+
+    def heading(self, text: str):
+        self._ensure(30)
+        self.y -= 22
+        self._text(MARGIN, text, 12, "bold")
+        self.y -= 4
+        self.ops.append(f"0.6 G {MARGIN} {self.y:.1f} m {PAGE_WIDTH - MARGIN} {self.y:.1f} l S 0 G")
+        self.y -= 4
+
+    def paragraph(self, text: str, size: float = 10, font: str = "regular"):
+        for line in self._wrap(text, size, PAGE_WIDTH - 2 * MARGIN):
+            self._ensure(size + 4)
+            self.y -= size + 4
+            self._text(MARGIN, line, size, font)
+
+    def row(self, label: str, value: str, size: float = 10, font: str = "regular"):
+        """Two columns: a label on the left and a right-aligned value."""
+        value_width = len(value) * size * 0.5
+        label_lines = self._wrap(label, size, PAGE_WIDTH - 2 * MARGIN - value_width - 12)
+        for i, line in enumerate(label_lines):
+            self._ensure(size + 4)
+            self.y -= size + 4
+            self._text(MARGIN, line, size, font)
+            if i == 0:
+                self._text(PAGE_WIDTH - MARGIN - value_width, value, size, font)
+
+def _layout_contract(content: Dict[str, Any]) -> List[List[str]]:
+    booking = content["booking"]
+    caterer = content["caterer"]
+    client = content["client"]
+    quote = content["quotation"]
+    layout = _Layout()
+
+    layout.title("Catering Service Agreement")
+    layout.paragraph(f"Booking Reference No. {booking['id']}", 9)
+    layout.space(8)
+    layout.paragraph(
+        f"This Catering Service Agreement (the \"Agreement\") is entered into on {content['agreement_date']}, "
+        "by and between:"
+    )
+    layout.space(6)
+    layout.paragraph("THE SERVICE PROVIDER:", 10, "bold")
+    layout.paragraph(caterer["business_name"] or "")
+    layout.paragraph(caterer["city"] or "")
+    layout.paragraph(f"Contact: {caterer['contact_phone'] or '-'} | {caterer['email'] or '-'}")
+    layout.space(6)
+    layout.paragraph("AND THE CLIENT:", 10, "bold")
+    layout.paragraph(client["name"])
+    layout.paragraph(f"Contact: {client['email'] or '-'}")
+
+    layout.heading("1. Event Specifications")
+    layout.row("Date of Event:", booking["event_date"] or "TBA")
+    layout.row("Type of Event:", booking["event_type"] or "-")
+    layout.row("Time:", booking["event_time"] or "TBA")
+    layout.row("Venue:", booking["venue_address"] or "-")
+    layout.row("Expected Guests:", f"{quote['guest_count']} persons")
+
+    layout.heading("2. Financial Terms & Compensation")
+    layout.paragraph(
+        "In consideration of the catering services provided, the Client agrees to pay the Service Provider "
+        "the Total Contract Value as detailed below. This total includes the base package and any "
+        "agreed-upon add-ons."
+    )
+    layout.space(6)
+    layout.row(
+        f"Base Package: {quote['package_name']} ({quote['guest_count']} guests at {_money(quote['unit_price'])}/head)",
+        _money(quote["base_amount"])
+    )
+    for name, price in quote["addons"]:
+        layout.row(f"Additional: {name}", _money(price))
+    if quote["overtime_amount"]:
+        layout.row(f"Overtime: {quote['overtime_hours']} hour(s)", _money(quote["overtime_amount"]))
+    if quote["discount_amount"]:
+        layout.row("Promotion Discount", "- " + _money(quote["discount_amount"]))
+    layout.space(4)
+    layout.row("Total Contract Value:", _money(quote["total_amount"]), 11, "bold")
+    layout.row(f"Required Security Deposit ({quote['downpayment_percent']}%):", _money(quote["deposit_amount"]))
+
+    layout.heading("3. Agreement Status")
+    layout.paragraph(
+        "This contract has been reviewed and accepted through the OccaShare platform. Current status of "
+        f"this agreement is marked as {str(quote['status'] or '').upper()}."
+    )
+
+    layout.heading("Signatures")
+    layout.row("The Service Provider (system generated):", caterer["business_name"] or "")
+    if content["signature"]["name"]:
+        layout.row(
+            f"The Client (digitally signed {content['signature']['signed_at']}):",
+            content["signature"]["name"]
+        )
+    else:
+        layout.row("The Client:", "Not yet signed")
+    return layout.pages
+
+def build_pdf(pages: List[List[str]]) -> bytes:
+    """Assembles a PDF 1.4 document from per-page content stream operators."""
+    objects: List[bytes] = []
+
+    def add(body: str) -> int:
+        objects.append(body.encode("latin-1"))
+        return len(objects)
+
+    catalog = add("") # filled in once the page tree exists
+    pages_id = add("")
+    regular = add("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    bold = add("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>")
+    resources = f"<< /Font << /{FONTS['regular']} {regular} 0 R /{FONTS['bold']} {bold} 0 R >> >>"
+
+    page_ids = []
+    for ops in pages:
+        stream = "\n".join(ops)
+        content_id = add(f"<< /Length {len(stream.encode('latin-1'))} >>\nstream\n{stream}\nendstream")
+        page_ids.append(add(
+            f"<< /Type /Page /Parent {pages_id} 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources {resources} /Contents {content_id} 0 R >>"
+        ))
+    kids = " ".join(f"{i} 0 R" for i in page_ids)
+    objects[pages_id - 1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode("latin-1")
+    objects[catalog - 1] = f"<< /Type /Catalog /Pages {pages_id} 0 R >>".encode("latin-1")
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root {catalog} 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+def render_contract(content: Dict[str, Any]) -> bytes:
+    return build_pdf(_layout_contract(content))
+
+def write_contract(content: Dict[str, Any], path: str) -> Tuple[str, int]:
+    """Worker entry point: renders and atomically moves the PDF into place."""
+    data = render_contract(content)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+    return path, len(data)
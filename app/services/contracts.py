@@ -0,0 +1,195 @@
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy.orm import Session
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+from ..core.config import settings
+from ..db import models
+from .contract_pdf import write_contract
+from .pricing import pricing_engine, to_cents
+
+class ContractRenderer:
+    """
+    Renders contract PDFs in a process pool and keeps them on disk addressed by content.
+
+    The file name is the SHA-256 of everything printed on the contract (booking,
+    parties, quotation amounts, signature state) plus RENDER_VERSION, so an unchanged
+    contract is never rendered twice and a changed one never serves a stale file. The
+    same digest is the response's strong ETag: a revalidating browser gets a 304 from a
+    couple of column reads, without the file being opened.
+
+    Files live in one directory per booking, so every version rendered for a booking
+    (e.g. before and after signing) can be removed together when the booking is purged.
+    """
+    # Bump when the layout changes so existing files are re-rendered
+    RENDER_VERSION = 1
+
+    def __init__(self, directory: str = settings.CONTRACT_DIR, workers: int = settings.CONTRACT_RENDER_WORKERS):
+        self.directory = directory
+        self.workers = max(1, workers)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._background: Set[asyncio.Task] = set()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        # Layout is CPU-bound Python; separate processes keep it off the request workers' GIL.
+        # Spawned (not forked) so children never inherit open DB connections or the event loop.
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def content(self, booking: models.Booking, quotation: models.Quotation) -> Dict[str, Any]:
+        """Everything the PDF shows, as plain JSON-able values."""
+        details = quotation.package_details or {}
+        caterer = booking.caterer
+        client = booking.user
+        dp_percent = pricing_engine.clamp_downpayment(quotation.downpayment_percent)
+        agreed_on = quotation.signed_at or quotation.created_at
+        return {
+            "booking": {
+                "id": booking.id,
+                "event_date": booking.event_date.strftime("%B %d, %Y") if booking.event_date else None,
+                "event_type": booking.event_type,
+                "event_time": booking.event_time.strftime("%I:%M %p") if booking.event_time else None,
+                "venue_address": booking.venue_address
+            },
+            "caterer": {
+                "business_name": caterer.business_name if caterer else None,
+                "city": caterer.city if caterer else None,
+                "contact_phone": caterer.contact_phone if caterer else None,
+                "email": caterer.user.email if caterer and caterer.user else None
+            },
+            "client": {
+                "name": f"{client.first_name or ''} {client.last_name or ''}".strip() if client else "",
+                "email": client.email if client else None
+            },
+            "quotation": {
+                "package_name": booking.package.name if booking.package else "Custom",
+                "guest_count": details.get("guest_count"),
+                "unit_price": details.get("unit_price") or 0,
+                "base_amount": details.get("base_amount") or booking.total_amount or 0,
+                "overtime_hours": details.get("overtime_hours") or 0,
+                "overtime_amount": details.get("overtime_amount") or 0,
+                "discount_amount": details.get("discount_amount") or 0,
+                "addons": [[a.get("name"), a.get("price") or 0] for a in (quotation.addons or [])],
+                "total_amount": float(quotation.total_amount or 0),
+                "downpayment_percent": dp_percent,
+                "deposit_amount": float(pricing_engine.deposit(to_cents(quotation.total_amount), dp_percent)),
+                "status": quotation.status
+            },
+            "signature": {
+                "name": quotation.signed_name,
+                "signed_at": quotation.signed_at.strftime("%B %d, %Y %I:%M %p") if quotation.signed_at else None
+            },
+            "agreement_date": agreed_on.strftime("%d day of %B, %Y") if agreed_on else None
+        }
+
+    def digest(self, content: Dict[str, Any]) -> str:
+        canonical = json.dumps(
+            {"version": self.RENDER_VERSION, "content": content},
+            sort_keys=True, separators=(",", ":"), default=str
+        )
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def booking_dir(self, booking_id: int) -> str:
+        return os.path.join(self.directory, str(booking_id))
+
+    def path_for(self, booking_id: int, digest: str) -> str:
+        return os.path.join(self.booking_dir(booking_id), f"{digest}.pdf")
+
+    def remove(self, booking_ids: Iterable[int]) -> int:
+        """Deletes every contract rendered for these bookings (they hold customer PII). Returns directories removed."""
+        removed = 0
+        for booking_id in booking_ids:
+            directory = self.booking_dir(booking_id)
+            if os.path.isdir(directory):
+                shutil.rmtree(directory, ignore_errors=True)
+                removed += 1
+        return removed
+
+    def collect_garbage(self, db: Session, dry_run: bool = False) -> Dict[str, int]:
+        """
+        Removes contract directories no booking row stands behind: bookings deleted outside
+        the sweeper, a purge that died between commit and cleanup, and the digest-prefix
+        directories of the previous layout.
+        """
+        report = {"directories": 0, "deleted": 0}
+        if not os.path.isdir(self.directory):
+            return report
+        names = [n for n in os.listdir(self.directory) if os.path.isdir(os.path.join(self.directory, n))]
+        candidates = {int(n) for n in names if n.isdigit()}
+        live = set()
+        if candidates:
+            live = {r[0] for r in db.query(models.Booking.id).filter(models.Booking.id.in_(candidates))}
+        for name in names:
+            report["directories"] += 1
+            if name.isdigit() and int(name) in live:
+                continue
+            report["deleted"] += 1
+            if not dry_run:
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+        return report
+
+    async def ensure(self, content: Dict[str, Any], digest: Optional[str] = None) -> Tuple[str, str]:
+        """Returns (path, digest), rendering in the pool only if that content has no file yet."""
+        digest = digest or self.digest(content)
+        path = self.path_for(content["booking"]["id"], digest)
+        if os.path.exists(path):
+            return path, digest
+
+        # Concurrent requests for the same contract share one render
+        future = self._inflight.get(digest)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._executor(), write_contract, content, path)
+            self._inflight[digest] = future
+            future.add_done_callback(lambda _: self._inflight.pop(digest, None))
+        await asyncio.shield(future)
+        return path, digest
+
+    def prerender(self, booking: models.Booking, quotation: models.Quotation):
+        """Starts rendering in the background (e.g. right after signing) so the first view is a disk hit."""
+        task = asyncio.create_task(self.ensure(self.content(booking, quotation)))
+        self._background.add(task)
+        task.add_done_callback(self._prerendered)
+
+    def _prerendered(self, task: asyncio.Task):
+        self._background.discard(task)
+        if not task.cancelled() and task.exception():
+            print(f"[CONTRACT RENDER ERROR] {task.exception()}")
+
+    async def response(self, request: Request, booking: models.Booking, quotation: models.Quotation) -> Response:
+        content = self.content(booking, quotation)
+        digest = self.digest(content)
+        etag = f'"{digest}"'
+        headers = {
+            "ETag": etag,
+            # Same URL, changing content: let browsers keep it but always revalidate
+            "Cache-Control": "private, no-cache"
+        }
+
+        if_none_match = request.headers.get("if-none-match", "")
+        if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+            return Response(status_code=304, headers=headers)
+
+        path, _ = await self.ensure(content, digest)
+        return FileResponse(
+            path,
+            media_type="application/pdf",
+            filename=f"contract-{booking.id}.pdf",
+            content_disposition_type="inline",
+            headers=headers
+        )
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+contract_renderer = ContractRenderer()
@@ -0,0 +1,143 @@
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from typing import Any, Dict, List, Optional
+import itertools
+import cv2
+import numpy as np
+from ..db import models
+
+class DocumentHashIndex:
+    """
+    Finds ID images that were already submitted by someone else, without decrypting or
+    comparing any stored document.
+
+    Every ID image gets a 64-bit pHash (low frequencies of a 32x32 DCT, robust to
+    re-compression, resizing and brightness) and a 64-bit dHash (horizontal gradients),
+    stored in id_document_hashes. Lookups use multi-index hashing: the pHash is split
+    into four 16-bit bands, each with its own index. Two hashes within Hamming distance
+    PHASH_RADIUS (< 12) must agree within 2 bits on at least one band (pigeonhole), so
+    one indexed query over each band's 137 neighbours returns every candidate. The
+    candidates are then checked against both full hashes.
+    """
+    BANDS = 4
+    BAND_BITS = 16
+    PHASH_RADIUS = 10
+    # dHash is more sensitive to crops and lighting, so it only confirms pHash matches
+    DHASH_RADIUS = 14
+    MAX_MATCHES = 5
+
+    def __init__(self):
+        band_radius = self.PHASH_RADIUS // self.BANDS
+        self._flips = [
+            sum(1 << bit for bit in bits)
+            for r in range(band_radius + 1)
+            for bits in itertools.combinations(range(self.BAND_BITS), r)
+        ]
+
+    # --- Hashing ---
+
+    @staticmethod
+    def _to_int(bits: np.ndarray) -> int:
+        value = 0
+        for bit in bits.flatten():
+            value = (value << 1) | int(bit)
+        return value
+
+    def phash(self, gray: np.ndarray) -> int:
+        small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+        low = cv2.dct(small)[:8, :8]
+        # The DC term is overall brightness; leave it out of the median
+        median = np.median(low.flatten()[1:])
+        return self._to_int(low > median)
+
+    def dhash(self, gray: np.ndarray) -> int:
+        small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+        return self._to_int(small[:, 1:] > small[:, :-1])
+
+    def compute(self, img: np.ndarray) -> Dict[str, int]:
+        """pHash and dHash of a BGR image, as unsigned 64-bit ints."""
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+        return {"phash": self.phash(gray), "dhash": self.dhash(gray)}
+
+    # --- Storage ---
+
+    @staticmethod
+    def _signed(value: int) -> int:
+        # BIGINT is signed; store the same 64 bits
+        return value - (1 << 64) if value >= 1 << 63 else value
+
+    @staticmethod
+    def _unsigned(value: int) -> int:
+        return value + (1 << 64) if value < 0 else value
+
+    def _bands(self, phash: int) -> List[int]:
+        mask = (1 << self.BAND_BITS) - 1
+        return [(phash >> (self.BAND_BITS * i)) & mask for i in range(self.BANDS)]
+
+    @staticmethod
+    def distance(a: int, b: int) -> int:
+        return (a ^ b).bit_count()
+
+    def find_matches(self, db: Session, hashes: Dict[str, int], exclude_user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Earlier uploads within PHASH_RADIUS/DHASH_RADIUS of `hashes`, closest first."""
+        phash, dhash = hashes["phash"], hashes["dhash"]
+        Hash = models.IdDocumentHash
+        columns = [Hash.phash_band_0, Hash.phash_band_1, Hash.phash_band_2, Hash.phash_band_3]
+        query = db.query(Hash.id, Hash.user_id, Hash.document_url, Hash.phash, Hash.dhash).filter(or_(*[
+            column.in_([band ^ flip for flip in self._flips]) for column, band in zip(columns, self._bands(phash))
+        ]))
+        if exclude_user_id is not None:
+            query = query.filter(Hash.user_id != exclude_user_id)
+
+        matches = []
+        for row in query:
+            p_distance = self.distance(phash, self._unsigned(row.phash))
+            d_distance = self.distance(dhash, self._unsigned(row.dhash))
+            if p_distance <= self.PHASH_RADIUS and d_distance <= self.DHASH_RADIUS:
+                matches.append({
+                    "hash_id": row.id,
+                    "user_id": row.user_id,
+                    "document_url": row.document_url,
+                    "phash_distance": p_distance,
+                    "dhash_distance": d_distance
+                })
+        matches.sort(key=lambda match: (match["phash_distance"], match["dhash_distance"]))
+        return matches[:self.MAX_MATCHES]
+
+    def record(
+        self,
+        db: Session,
+        user_id: int,
+        document_url: str,
+        hashes: Dict[str, int],
+        booking_id: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Matches a new ID upload against every earlier one from other users, indexes it,
+        and adds a `multiple_ids` FraudFlag per match. Returns the matches; the caller
+        commits.
+        """
+        matches = self.find_matches(db, hashes, exclude_user_id=user_id)
+        bands = self._bands(hashes["phash"])
+        db.add(models.IdDocumentHash(
+            user_id=user_id,
+            document_url=document_url,
+            phash=self._signed(hashes["phash"]),
+            dhash=self._signed(hashes["dhash"]),
+            phash_band_0=bands[0],
+            phash_band_1=bands[1],
+            phash_band_2=bands[2],
+            phash_band_3=bands[3]
+        ))
+        for match in matches:
+            db.add(models.FraudFlag(
+                booking_id=booking_id,
+                flag_type="multiple_ids",
+                description=(
+                    f"ID document of user #{user_id} matches one submitted by user #{match['user_id']} "
+                    f"(pHash distance {match['phash_distance']}, dHash distance {match['dhash_distance']})."
+                )
+            ))
+        return matches
+
+document_hash_index = DocumentHashIndex()
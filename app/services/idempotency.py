@@ -0,0 +1,169 @@
+from sqlalchemy import delete, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from fastapi import Request
+from fastapi.responses import JSONResponse, RedirectResponse, Response
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+import asyncio
+import hashlib
+import json
+from ..db import models
+
+class IdempotencyService:
+    """
+    Idempotency keys for payment endpoints.
+
+    The first request with a given (booking, action, key) claims the row with an
+    INSERT ... ON CONFLICT DO NOTHING and commits it before any gateway call is made.
+    Its response is stored when it finishes; repeats (double clicks, retries after a
+    timeout) get that stored response replayed instead of doing the work again.
+    """
+    HEADER = "Idempotency-Key"
+    FORM_FIELD = "idempotency_key"
+    MAX_KEY_LENGTH = 255
+
+    # A claim older than this is assumed to belong to a crashed request and can be taken over
+    LOCK_TIMEOUT = timedelta(seconds=60)
+    # How long a duplicate waits for the first request to finish before giving up
+    WAIT_SECONDS = 5.0
+    POLL_INTERVAL = 0.25
+    # Completed keys are purged by the booking sweeper after this
+    KEY_TTL = timedelta(hours=24)
+
+    def key_from_request(self, request: Request, form_data=None) -> Optional[str]:
+        key = request.headers.get(self.HEADER)
+        if not key and form_data is not None:
+            key = form_data.get(self.FORM_FIELD)
+        key = (key or "").strip()
+        if not key or len(key) > self.MAX_KEY_LENGTH:
+            return None
+        return key
+
+    def fingerprint(self, **params) -> str:
+        return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _claim(self, db: Session, booking_id: int, action: str, key: str, fingerprint: str) -> Optional[int]:
+        record_id = db.execute(
+            insert(models.IdempotencyKey)
+            .values(booking_id=booking_id, action=action, key=key, fingerprint=fingerprint, status="in_progress")
+            .on_conflict_do_nothing(constraint="uq_idempotency_booking_action_key")
+            .returning(models.IdempotencyKey.id)
+        ).scalar()
+        if record_id is None:
+            # Take over a claim abandoned by a request that died mid-way
+            record_id = db.execute(
+                update(models.IdempotencyKey)
+                .where(
+                    models.IdempotencyKey.booking_id == booking_id,
+                    models.IdempotencyKey.action == action,
+                    models.IdempotencyKey.key == key,
+                    models.IdempotencyKey.status == "in_progress",
+                    models.IdempotencyKey.created_at < datetime.now(timezone.utc) - self.LOCK_TIMEOUT
+                )
+                .values(created_at=datetime.now(timezone.utc), fingerprint=fingerprint)
+                .returning(models.IdempotencyKey.id)
+            ).scalar()
+        db.commit()
+        return record_id
+
+    def _lookup(self, db: Session, booking_id: int, action: str, key: str) -> Optional[models.IdempotencyKey]:
+        db.expire_all()
+        return db.query(models.IdempotencyKey).filter(
+            models.IdempotencyKey.booking_id == booking_id,
+            models.IdempotencyKey.action == action,
+            models.IdempotencyKey.key == key
+        ).first()
+
+    async def begin(self, db: Session, booking_id: int, action: str, key: str, fingerprint: str) -> Tuple[Optional[int], Optional[Response]]:
+        """
+        Returns (record_id, None) when this request owns the key and should do the work,
+        or (None, response) with the stored (or a conflict) response for a repeat.
+        """
+        record_id = self._claim(db, booking_id, action, key, fingerprint)
+        if record_id is not None:
+            return record_id, None
+
+        waited = 0.0
+        while True:
+            record = self._lookup(db, booking_id, action, key)
+            if record is None:
+                # The first request failed and released its claim; try again as the owner
+                record_id = self._claim(db, booking_id, action, key, fingerprint)
+                if record_id is not None:
+                    return record_id, None
+                continue
+            if record.fingerprint and record.fingerprint != fingerprint:
+                return None, JSONResponse(
+                    {"detail": "Idempotency-Key was already used with different parameters"}, status_code=422
+                )
+            if record.status == "completed":
+                return None, self.replay(record)
+            if waited >= self.WAIT_SECONDS:
+                return None, JSONResponse(
+                    {"detail": "A request with this Idempotency-Key is still being processed"},
+                    status_code=409, headers={"Retry-After": "1"}
+                )
+            await asyncio.sleep(self.POLL_INTERVAL)
+            waited += self.POLL_INTERVAL
+
+    def complete(self, db: Session, record_id: int, response: Response):
+        """Stores the response of the owning request so repeats can replay it."""
+        location = response.headers.get("location")
+        body = None if location else response.body.decode()
+        db.execute(
+            update(models.IdempotencyKey)
+            .where(models.IdempotencyKey.id == record_id)
+            .values(
+                status="completed",
+                response_status=response.status_code,
+                response_location=location,
+                response_body=body,
+                completed_at=datetime.now(timezone.utc)
+            )
+        )
+        db.commit()
+
+    def release(self, db: Session, record_id: int):
+        """Drops the claim after a failed attempt so the same key can be retried."""
+        db.rollback()
+        db.execute(delete(models.IdempotencyKey).where(models.IdempotencyKey.id == record_id))
+        db.commit()
+
+    def replay(self, record: models.IdempotencyKey) -> Response:
+        headers = {"Idempotent-Replayed": "true"}
+        if record.response_location:
+            return RedirectResponse(url=record.response_location, status_code=record.response_status or 303, headers=headers)
+        return JSONResponse(json.loads(record.response_body or "null"), status_code=record.response_status or 200, headers=headers)
+
+    async def run(self, db: Session, key: Optional[str], booking_id: int, action: str, fingerprint: str, handler) -> Response:
+        """
+        Runs `handler()` (an async callable returning a Response) at most once per key.
+        Requests without a key are executed as before.
+        """
+        if not key:
+            return await handler()
+
+        record_id, replayed = await self.begin(db, booking_id, action, key, fingerprint)
+        if replayed is not None:
+            return replayed
+
+        try:
+            response = await handler()
+        except Exception:
+            self.release(db, record_id)
+            raise
+        self.complete(db, record_id, response)
+        return response
+
+    def purge_expired(self, db: Session, now: Optional[datetime] = None) -> int:
+        now = now or datetime.now(timezone.utc)
+        result = db.execute(
+            delete(models.IdempotencyKey)
+            .where(models.IdempotencyKey.created_at < now - self.KEY_TTL)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return result.rowcount or 0
+
+idempotency_service = IdempotencyService()
@@ -0,0 +1,178 @@
+from fastapi import HTTPException, UploadFile
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+import asyncio
+import hashlib
+import os
+import re
+import uuid
+import aiofiles
+from PIL import Image, ImageOps, UnidentifiedImageError
+from ..core.config import settings
+from .blobs import blob_store
+from .storage import upload_storage
+
+# Pillow releases the GIL while decoding, resizing and encoding, so threads are enough
+# to keep image work off the event loop without shipping pixels between processes.
+image_executor = ThreadPoolExecutor(max_workers=settings.IMAGE_WORKERS, thread_name_prefix="images")
+
+def _render_variants(source_path: str, target_stem: str, widths: List[int], quality: int) -> List[str]:
+    """
+    Runs in the worker pool: decodes the upload, applies and drops its EXIF orientation,
+    and writes one local WebP per width. Metadata (EXIF, GPS, ICC comments) is not carried
+    over. Images are never upscaled; widths above the original reuse its size so every
+    variant named in a srcset exists. Each file is written atomically and the widest
+    last, so once it exists the whole set does.
+    """
+    try:
+        with Image.open(source_path) as img:
+            img = ImageOps.exif_transpose(img)
+            img = img.convert("RGBA" if img.mode in ("RGBA", "LA", "P") else "RGB")
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise ValueError("Invalid image file.") from e
+
+    written = []
+    for width in widths:
+        variant = img
+        if img.width > width:
+            height = max(1, round(img.height * width / img.width))
+            variant = img.resize((width, height), Image.LANCZOS)
+        path = f"{target_stem}_{width}w.webp"
+        tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        variant.save(tmp_path, "WEBP", quality=quality, method=4)
+        os.replace(tmp_path, path)
+        written.append(path)
+    return written
+
+SAVE_FORMATS = {"webp": "WEBP", "jpeg": "JPEG", "png": "PNG"}
+
+def render_resized(source_path: str, target_path: str, width: Optional[int], height: Optional[int], fmt: str, quality: int) -> int:
+    """
+    Runs in the worker pool: one resized copy of `source_path`. With only a width or a
+    height the other side follows the aspect ratio; with both the image is cropped to
+    fill the box. Never upscales. Written atomically; returns the file size.
+    """
+    try:
+        with Image.open(source_path) as img:
+            img = ImageOps.exif_transpose(img)
+            if width and height:
+                scale = min(1.0, max(width / img.width, height / img.height))
+                box = (max(1, min(width, round(img.width * scale))), max(1, min(height, round(img.height * scale))))
+                img = ImageOps.fit(img, box, Image.LANCZOS)
+            elif width or height:
+                scale = min(1.0, (width / img.width) if width else (height / img.height))
+                if scale < 1.0:
+                    img = img.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))), Image.LANCZOS)
+            keep_alpha = fmt != "jpeg" and img.mode in ("RGBA", "LA", "P")
+            img = img.convert("RGBA" if keep_alpha else "RGB")
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise ValueError("Invalid image file.") from e
+
+    tmp_path = f"{target_path}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        img.save(tmp_path, SAVE_FORMATS[fmt], quality=quality, optimize=True)
+        os.replace(tmp_path, target_path)
+    except BaseException:
+        ImagePipeline._remove(tmp_path)
+        raise
+    return os.path.getsize(target_path)
+
+class ImagePipeline:
+    """
+    Upload path for public images (logos, covers, gallery, package and dish photos,
+    avatars).
+
+    The request body is streamed to disk in chunks with aiofiles (hashed on the way) and
+    rejected as soon as it passes the size limit, then resized to a fixed set of widths
+    and re-encoded as WebP in the worker pool. Variants are stored in the blob store
+    under the upload's SHA-256, so re-uploading the same bytes reuses them without any
+    image work. Variants are rendered next to the raw upload and then moved into the
+    uploads store (local disk or S3), widest last. The stored URL is the largest variant;
+    `srcset()` derives the rest from its name, so templates can offer small files to
+    small slots.
+    """
+    WIDTHS = (320, 640, 1280)
+    CHUNK_SIZE = 64 * 1024
+    QUALITY = 80
+    ALLOWED_MIME_TYPES = ("image/jpeg", "image/png", "image/webp", "image/gif")
+    _VARIANT_RE = re.compile(r"^(?P<stem>.+)_(?P<width>\d+)w\.webp$")
+
+    def __init__(self, max_bytes: int = settings.IMAGE_MAX_UPLOAD_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+
+    async def _stream_to_disk(self, upload: UploadFile, path: str) -> str:
+        """Writes the body to `path` and returns its SHA-256."""
+        size = 0
+        digest = hashlib.sha256()
+        try:
+            async with aiofiles.open(path, "wb") as buffer:
+                while True:
+                    chunk = await upload.read(self.CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise HTTPException(
+                            status_code=400,
+                            detail=f"File too large. Max size is {self.max_bytes // (1024 * 1024)}MB."
+                        )
+                    digest.update(chunk)
+                    await buffer.write(chunk)
+        except BaseException:
+            await asyncio.to_thread(self._remove, path)
+            raise
+        if size == 0:
+            await asyncio.to_thread(self._remove, path)
+            raise HTTPException(status_code=400, detail="Uploaded file is empty.")
+        return digest.hexdigest()
+
+    @staticmethod
+    def _remove(*paths: str):
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _store_variants(self, stem: str, raw_path: str):
+        # Ascending widths, so the largest (the one `reuse` checks for) lands last
+        for width in sorted(self.WIDTHS):
+            upload_storage.put_file(f"{stem}_{width}w.webp", f"{raw_path}_{width}w.webp", "image/webp", move=True)
+
+    async def save(self, upload: UploadFile) -> str:
+        """
+        Stores `upload` and returns the public URL of its largest variant. Raises
+        HTTPException(400) for oversized, empty or non-image uploads.
+        """
+        if upload.content_type and upload.content_type not in self.ALLOWED_MIME_TYPES:
+            raise HTTPException(status_code=400, detail="Invalid file type. Only JPEG, PNG, WebP and GIF are allowed.")
+
+        raw_path = await asyncio.to_thread(blob_store.temp_path)
+        digest = await self._stream_to_disk(upload, raw_path)
+        stem = blob_store.stem(digest)
+        largest = f"{stem}_{max(self.WIDTHS)}w.webp"
+
+        try:
+            if not await asyncio.to_thread(blob_store.reuse, largest):
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(
+                    image_executor, _render_variants, raw_path, raw_path, sorted(self.WIDTHS), self.QUALITY
+                )
+                await asyncio.to_thread(self._store_variants, stem, raw_path)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        finally:
+            # The raw upload still carries its EXIF block; only the re-encoded variants are kept
+            await asyncio.to_thread(self._remove, raw_path, *[f"{raw_path}_{width}w.webp" for width in self.WIDTHS])
+
+        return blob_store.url_for(largest)
+
+    def srcset(self, url: Optional[str]) -> str:
+        """Jinja helper: srcset for a pipeline image URL, or "" for anything else (legacy or external)."""
+        match = self._VARIANT_RE.match(url or "")
+        if not match or not (url.startswith("/static/uploads/") or upload_storage.key_for_url(url)):
+            return ""
+        stem = match.group("stem")
+        return ", ".join(f"{stem}_{width}w.webp {width}w" for width in self.WIDTHS)
+
+image_pipeline = ImagePipeline()
@@ -0,0 +1,195 @@
+from fastapi import HTTPException, Request, UploadFile
+from fastapi.responses import Response, StreamingResponse
+from cryptography.fernet import InvalidToken
+from typing import BinaryIO, Iterator, Optional, Tuple
+import asyncio
+from ..core.encryption import (
+    HEADER_SIZE, KEYRING, DecryptionError, StreamHeader, decrypt_data, decrypt_range, encrypt_stream, is_stream
+)
+from .storage import ObjectInfo, StorageBackend, parse_range, private_storage, upload_storage
+
+class KycDocumentStore:
+    """
+    Encrypted identity documents and selfies.
+
+    Uploads are encrypted while they stream in (segmented AES-GCM, see
+    core.encryption) and written to the private store under kyc/, so a request never
+    holds more than a segment of the document. Reads decrypt segment by segment and
+    serve byte ranges by decrypting only the segments they cover. Documents written
+    before this format (whole-file Fernet, possibly still in the public
+    uploads/verification folder) stay readable.
+
+    Files name their key in the header, so KYC_PREVIOUS_KEYS keeps old documents
+    readable after KYC_ENCRYPTION_KEY changes; `rotate()` (driven by
+    scripts/utils/rotate_kyc_keys.py) then re-encrypts them under the current key.
+    """
+    KEY_PREFIX = "kyc/"
+    LEGACY_PREFIX = "verification/"
+    CHUNK_SIZE = 64 * 1024
+    MAX_BYTES = 5 * 1024 * 1024
+    DECRYPTION_FAILED = (
+        "Document decryption failed. It was encrypted under a key that is no longer configured "
+        "(see KYC_PREVIOUS_KEYS). Please ask the user to re-upload."
+    )
+
+    def filename(self, url: str) -> str:
+        # Stored URLs look like /api/bookings/kyc/view/<filename>
+        return url.split("/")[-1]
+
+    def locate(self, url: str) -> Tuple[StorageBackend, str, int]:
+        """(store, key, ciphertext size) of a document. Raises FileNotFoundError."""
+        filename = self.filename(url)
+        for store, key in ((private_storage, f"{self.KEY_PREFIX}{filename}"), (upload_storage, f"{self.LEGACY_PREFIX}{filename}")):
+            try:
+                info = store.stat(key)
+            except ValueError:
+                continue
+            if info is not None:
+                return store, key, info.size
+        raise FileNotFoundError(f"KYC document not found: {filename}")
+
+    # --- Writing ---
+
+    def _limited(self, file: BinaryIO, max_bytes: int) -> Iterator[bytes]:
+        size = 0
+        for chunk in iter(lambda: file.read(self.CHUNK_SIZE), b""):
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(status_code=400, detail=f"File too large. Max size is {max_bytes // (1024 * 1024)}MB.")
+            yield chunk
+
+    def _save(self, file: BinaryIO, filename: str, max_bytes: int):
+        private_storage.put(f"{self.KEY_PREFIX}{filename}", encrypt_stream(self._limited(file, max_bytes)))
+
+    async def save(self, upload: UploadFile, filename: str, max_bytes: int = MAX_BYTES) -> str:
+        """
+        Encrypts `upload` into the private store and returns its viewer URL. Raises
+        HTTPException(400) once the body passes `max_bytes`; nothing is kept in that case.
+        """
+        await asyncio.to_thread(self._save, upload.file, filename, max_bytes)
+        return f"/api/bookings/kyc/view/{filename}"
+
+    # --- Rotation ---
+
+    def documents(self) -> Iterator[Tuple[StorageBackend, ObjectInfo]]:
+        """Every stored document: the private kyc/ folder, then legacy uploads."""
+        for store, prefix in ((private_storage, self.KEY_PREFIX), (upload_storage, self.LEGACY_PREFIX)):
+            for info in store.list(prefix):
+                # Skips in-progress .tmp writes, and the plain registration files in verification/
+                if info.key.endswith(".enc"):
+                    yield store, info
+
+    def rotate(self, store: StorageBackend, key: str, size: int, dry_run: bool = False) -> str:
+        """
+        Re-encrypts one document under the current key. Returns "current" (nothing to
+        do), "rotated", or "migrated" (a legacy file, now in kyc/ and removed from
+        uploads). Blocking; raises DecryptionError if no configured key opens it. The
+        old copy is only replaced once the new one is completely written. A dry run
+        decrypts the document without writing, so it fails the same way a real run would.
+        """
+        header = self._header(store, key)
+        if header is not None and header.is_current and store is private_storage:
+            return "current"
+        if header is not None and header.key_id not in KEYRING:
+            raise DecryptionError(f"Encrypted under key {header.key_id.hex()}, which is not configured")
+        if header is None:
+            plaintext = iter([self._legacy(store, key)])
+        else:
+            plaintext = decrypt_range(header, lambda first, last: store.open_range(key, first, last), size)
+        if dry_run:
+            for _ in plaintext:
+                pass
+            return "rotated" if store is private_storage else "migrated"
+        target = f"{self.KEY_PREFIX}{self.filename(key)}"
+        private_storage.put(target, encrypt_stream(plaintext))
+        if store is not private_storage:
+            store.delete(key)
+            return "migrated"
+        return "rotated"
+
+    # --- Reading ---
+
+    def _header(self, store: StorageBackend, key: str) -> Optional[StreamHeader]:
+        prefix = b"".join(store.open_range(key, 0, HEADER_SIZE - 1))
+        return StreamHeader.parse(prefix) if is_stream(prefix) else None
+
+    def _legacy(self, store: StorageBackend, key: str) -> bytes:
+        # Whole-file Fernet token; these predate the size-bounded format and are small
+        try:
+            return decrypt_data(store.read_bytes(key))
+        except InvalidToken as e:
+            raise DecryptionError("Legacy document could not be decrypted") from e
+
+    def open(self, url: str) -> Tuple[int, Iterator[bytes], str]:
+        """
+        (plaintext size, plaintext chunks, media type) for a whole document. Blocking;
+        raises FileNotFoundError or DecryptionError.
+        """
+        store, key, size = self.locate(url)
+        header = self._header(store, key)
+        if header is None:
+            data = self._legacy(store, key)
+            return len(data), iter([data]), self.media_type(data)
+        chunks = decrypt_range(header, lambda first, last: store.open_range(key, first, last), size)
+        first = next(chunks, b"")
+        plain_size = header.plaintext_size(size)
+        return plain_size, self._prepend(first, chunks), self.media_type(first)
+
+    @staticmethod
+    def _prepend(first: bytes, rest: Iterator[bytes]) -> Iterator[bytes]:
+        if first:
+            yield first
+        yield from rest
+
+    def read(self, url: str) -> bytes:
+        """Whole plaintext, for callers that need it in memory (image decoding)."""
+        _, chunks, _ = self.open(url)
+        return b"".join(chunks)
+
+    @staticmethod
+    def media_type(head: bytes) -> str:
+        if head.startswith(b"\x89PNG"):
+            return "image/png"
+        if head.startswith(b"%PDF"):
+            return "application/pdf"
+        return "image/jpeg"
+
+    def _ranged(self, url: str, range_header: Optional[str]):
+        """Blocking part of `response`: returns (status, headers, chunks, media type)."""
+        store, key, size = self.locate(url)
+        header = self._header(store, key)
+        if header is None:
+            data = self._legacy(store, key)
+            plain_size, media_type = len(data), self.media_type(data)
+            fetch_range = lambda start, end: iter([data[start:end + 1]])
+        else:
+            plain_size = header.plaintext_size(size)
+            fetch = lambda first, last: store.open_range(key, first, last)
+            # The first segment tells PNG from JPEG; ranged reads pay for it once more
+            media_type = self.media_type(b"".join(decrypt_range(header, fetch, size, 0, 15)))
+            fetch_range = lambda start, end: decrypt_range(header, fetch, size, start, end)
+
+        try:
+            byte_range = parse_range(range_header, plain_size) if plain_size else None
+        except ValueError:
+            return 416, {"Content-Range": f"bytes */{plain_size}"}, iter([]), media_type
+        start, end = byte_range or (0, plain_size - 1)
+        headers = {"Accept-Ranges": "bytes", "Content-Length": str(max(0, end - start + 1))}
+        if byte_range:
+            headers["Content-Range"] = f"bytes {start}-{end}/{plain_size}"
+        chunks = fetch_range(start, end) if plain_size else iter([])
+        return (206 if byte_range else 200), headers, chunks, media_type
+
+    async def response(self, url: str, request: Request) -> Response:
+        """Streams the decrypted document, honouring a single byte range."""
+        try:
+            status, headers, chunks, media_type = await asyncio.to_thread(self._ranged, url, request.headers.get("range"))
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Document not found.")
+        except DecryptionError:
+            raise HTTPException(status_code=422, detail=self.DECRYPTION_FAILED)
+        # Identity documents must never land in shared or disk caches
+        headers["Cache-Control"] = "private, no-store"
+        return StreamingResponse(chunks, status_code=status, media_type=media_type, headers=headers)
+
+kyc_documents = KycDocumentStore()
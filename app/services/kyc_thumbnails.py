@@ -0,0 +1,192 @@
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+import asyncio
+import hashlib
+import hmac
+import io
+import os
+import threading
+import time
+import uuid
+from PIL import Image, ImageOps, UnidentifiedImageError
+from ..core.config import settings
+from ..core.encryption import HEADER_SIZE, DecryptionError, StreamHeader, decrypt_range, encrypt_stream
+from .images import image_executor
+from .kyc_documents import kyc_documents
+
+class KycThumbnailCache:
+    """
+    Downscaled copies of KYC documents for the admin review screens, so a review page
+    doesn't decrypt and transfer every full-size document and selfie.
+
+    Documents never change after upload, so each thumbnail is rendered once and kept on
+    local disk, encrypted in the same format as the documents. Entry names are an HMAC
+    of the document name, so the cache directory doesn't reveal whose documents it
+    holds. Retention: entries expire KYC_THUMB_TTL_HOURS after they were rendered, are
+    dropped when the verification is decided or the customer deleted, and are never
+    served once the document itself is gone. The directory is capped at
+    KYC_THUMB_CACHE_MAX_MB, evicting the oldest entries first. Documents that aren't
+    images (PDFs) get an empty entry so they aren't decrypted again on every view.
+    """
+    VIEW_PREFIX = "/api/bookings/kyc/view/"
+    THUMB_PREFIX = "/api/bookings/kyc/thumb/"
+    MAX_SIDE = 480
+    QUALITY = 70
+    MEDIA_TYPE = "image/webp"
+
+    def __init__(
+        self,
+        directory: str = settings.KYC_THUMB_CACHE_DIR,
+        max_bytes: int = settings.KYC_THUMB_CACHE_MAX_MB * 1024 * 1024,
+        ttl_seconds: float = settings.KYC_THUMB_TTL_HOURS * 3600
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: Optional["OrderedDict[str, Tuple[int, float]]"] = None # path -> (size, rendered at), oldest first
+        self._total = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+    def cache_path(self, url: str) -> str:
+        name = hmac.new(
+            settings.SECRET_KEY.encode(), f"{kyc_documents.filename(url)}:{self.MAX_SIDE}".encode(), hashlib.sha256
+        ).hexdigest()
+        return os.path.join(self.directory, name[:2], f"{name}.thumb")
+
+    # --- Bookkeeping ---
+
+    def _load_index(self):
+        entries = []
+        for dirpath, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                if filename.endswith(".tmp"):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, path, stat.st_size))
+        entries.sort()
+        self._entries = OrderedDict((path, (size, mtime)) for mtime, path, size in entries)
+        self._total = sum(size for _, _, size in entries)
+
+    def _expired(self, rendered_at: float) -> bool:
+        return time.time() - rendered_at > self.ttl_seconds
+
+    def _add(self, path: str, size: int, rendered_at: float):
+        with self._lock:
+            if self._entries is None:
+                self._load_index()
+            self._total += size - self._entries.pop(path, (0, 0))[0]
+            self._entries[path] = (size, rendered_at)
+            # Oldest first, so expired entries are always at the front
+            while self._entries:
+                old_path, (old_size, old_rendered_at) = next(iter(self._entries.items()))
+                if old_path == path or (self._total <= self.max_bytes and not self._expired(old_rendered_at)):
+                    break
+                self._entries.popitem(last=False)
+                self._total -= old_size
+                self._remove(old_path)
+
+    def _drop(self, path: str):
+        with self._lock:
+            if self._entries is not None and path in self._entries:
+                self._total -= self._entries.pop(path)[0]
+        self._remove(path)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    # --- Entries ---
+
+    def _read(self, path: str) -> Optional[bytes]:
+        try:
+            with open(path, "rb") as f:
+                rendered_at = os.fstat(f.fileno()).st_mtime
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        if self._expired(rendered_at):
+            self._drop(path)
+            return None
+        try:
+            header = StreamHeader.parse(data[:HEADER_SIZE])
+            return b"".join(decrypt_range(header, lambda first, last: [data[first:last + 1]], len(data)))
+        except DecryptionError:
+            # Encrypted under a key that has since been retired: render it again
+            self._drop(path)
+            return None
+
+    def _render(self, data: bytes) -> bytes:
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                img = ImageOps.exif_transpose(img)
+                img.thumbnail((self.MAX_SIDE, self.MAX_SIDE), Image.LANCZOS)
+                img = img.convert("RGB")
+        except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+            return b""
+        out = io.BytesIO()
+        img.save(out, "WEBP", quality=self.QUALITY)
+        return out.getvalue()
+
+    def _build(self, url: str, path: str) -> bytes:
+        """Runs in the image pool on a miss: decrypt, downscale, encrypt, store."""
+        thumbnail = self._render(kyc_documents.read(url))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                for chunk in encrypt_stream([thumbnail]):
+                    f.write(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+        stat = os.stat(path)
+        self._add(path, stat.st_size, stat.st_mtime)
+        return thumbnail
+
+    def _lookup(self, url: str) -> Optional[bytes]:
+        # Raises FileNotFoundError: a thumbnail never outlives its document
+        kyc_documents.locate(url)
+        return self._read(self.cache_path(url))
+
+    # --- Public ---
+
+    async def get(self, url: str) -> Optional[bytes]:
+        """
+        WebP thumbnail of a document, rendered on first request; None if the document
+        isn't an image. Raises FileNotFoundError or DecryptionError like the viewer.
+        """
+        thumbnail = await asyncio.to_thread(self._lookup, url)
+        if thumbnail is None:
+            path = self.cache_path(url)
+            # Concurrent misses for the same document share one render
+            future = self._inflight.get(path)
+            if future is None:
+                loop = asyncio.get_running_loop()
+                future = loop.run_in_executor(image_executor, self._build, url, path)
+                self._inflight[path] = future
+                future.add_done_callback(lambda _: self._inflight.pop(path, None))
+            thumbnail = await asyncio.shield(future)
+        return thumbnail or None
+
+    def discard(self, urls: Iterable[Optional[str]]):
+        """Drops the thumbnails of these documents, e.g. once a review is decided. Blocking."""
+        for url in urls:
+            if url and url.startswith(self.VIEW_PREFIX):
+                self._drop(self.cache_path(url))
+
+    def url(self, url: Optional[str]) -> Optional[str]:
+        """Jinja helper: thumbnail URL for an encrypted KYC document; other URLs are returned unchanged."""
+        if url and url.startswith(self.VIEW_PREFIX):
+            return f"{self.THUMB_PREFIX}{url[len(self.VIEW_PREFIX):]}"
+        return url
+
+kyc_thumbnails = KycThumbnailCache()
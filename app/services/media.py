@@ -0,0 +1,186 @@
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlencode
+import asyncio
+import hashlib
+import os
+import threading
+from ..core.config import settings
+from .images import SAVE_FORMATS, image_executor, image_pipeline, render_resized
+from .storage import upload_storage
+
+class MediaCache:
+    """
+    Bounded disk cache of resized upload images, evicted least-recently-used.
+
+    Entries are named by SHA-256 of (source content hash, width, height, format), so a
+    cached file can never be served for different source bytes. The LRU order lives in
+    memory and is rebuilt from file mtimes at startup; hits refresh the mtime so the
+    order survives restarts. Each app process enforces the size bound on its own view.
+    With a remote uploads store, sources are mirrored into the cache directory on first
+    use and share the same bound.
+    """
+    # Only public image folders; identity documents are never resized or cached here
+    PUBLIC_DIRS = ("blobs", "caterer", "profiles")
+    MAX_DIMENSION = 2560
+    QUALITY = 80
+
+    def __init__(self, directory: str = settings.MEDIA_CACHE_DIR, max_bytes: int = settings.MEDIA_CACHE_MAX_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries: Optional["OrderedDict[str, int]"] = None # path -> size, oldest first
+        self._total = 0
+        # (path, mtime_ns, size) -> content hash, so sources are hashed once
+        self._source_hashes: Dict[Tuple[str, int, int], str] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+    # --- Paths ---
+
+    def source_path(self, relative: str) -> Optional[str]:
+        """Local file for an uploads key, refusing anything outside the public folders. Blocking."""
+        try:
+            key = upload_storage.check_key(relative)
+        except ValueError:
+            return None
+        if key.split("/", 1)[0] not in self.PUBLIC_DIRS:
+            return None
+        path = upload_storage.local_path(key)
+        if path is None:
+            return self._mirror(key)
+        root = os.path.realpath(upload_storage.local_path(key.split("/", 1)[0]))
+        path = os.path.realpath(path)
+        return path if path.startswith(root + os.sep) and os.path.isfile(path) else None
+
+    def _mirror(self, key: str) -> Optional[str]:
+        path = os.path.join(self.directory, "sources", *key.split("/"))
+        if self._touch(path):
+            return path
+        if not upload_storage.download(key, path):
+            return None
+        self._add(path, os.path.getsize(path))
+        return path
+
+    def _source_hash(self, path: str) -> str:
+        stat = os.stat(path)
+        # Not keyed on mtime: LRU hits touch mirrored sources. Replacing a file changes its inode.
+        key = (path, stat.st_ino, stat.st_size)
+        digest = self._source_hashes.get(key)
+        if digest is None:
+            h = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    h.update(chunk)
+            digest = self._source_hashes[key] = h.hexdigest()
+        return digest
+
+    def cache_key(self, source: str, width: Optional[int], height: Optional[int], fmt: str) -> str:
+        params = f"{self._source_hash(source)}:{width or 0}x{height or 0}:{fmt}"
+        return hashlib.sha256(params.encode()).hexdigest()
+
+    def cache_path(self, key: str, fmt: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.{fmt}")
+
+    # --- LRU bookkeeping ---
+
+    def _load_index(self):
+        entries = []
+        for dirpath, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                if filename.endswith(".tmp"):
+                    continue
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, path, stat.st_size))
+        entries.sort()
+        self._entries = OrderedDict((path, size) for _, path, size in entries)
+        self._total = sum(size for _, _, size in entries)
+
+    def _touch(self, path: str) -> bool:
+        with self._lock:
+            if self._entries is None:
+                self._load_index()
+            if path not in self._entries:
+                if not os.path.exists(path):
+                    return False
+                # Written by another process
+                self._entries[path] = os.path.getsize(path)
+                self._total += self._entries[path]
+            self._entries.move_to_end(path)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _add(self, path: str, size: int):
+        with self._lock:
+            if self._entries is None:
+                self._load_index()
+            self._total += size - self._entries.pop(path, 0)
+            self._entries[path] = size
+            while self._total > self.max_bytes and len(self._entries) > 1:
+                old_path, old_size = self._entries.popitem(last=False)
+                self._total -= old_size
+                try:
+                    os.remove(old_path)
+                except FileNotFoundError:
+                    pass
+
+    # --- Public ---
+
+    def normalize(self, width: Optional[int], height: Optional[int], fmt: Optional[str]) -> Tuple[Optional[int], Optional[int], str]:
+        """Validates query parameters; raises ValueError with a user-facing message."""
+        for value in (width, height):
+            if value is not None and not (1 <= value <= self.MAX_DIMENSION):
+                raise ValueError(f"Width and height must be between 1 and {self.MAX_DIMENSION}")
+        if fmt not in SAVE_FORMATS:
+            raise ValueError(f"Format must be one of: {', '.join(SAVE_FORMATS)}")
+        return width, height, fmt
+
+    async def get(self, source: str, width: Optional[int], height: Optional[int], fmt: str) -> Tuple[str, str]:
+        """Returns (cached file path, cache key), resizing in the image worker pool on a miss."""
+        key = await asyncio.to_thread(self.cache_key, source, width, height, fmt)
+        path = self.cache_path(key, fmt)
+        if await asyncio.to_thread(self._touch, path):
+            return path, key
+
+        # Concurrent misses for the same variant share one resize
+        future = self._inflight.get(key)
+        if future is None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(image_executor, render_resized, source, path, width, height, fmt, self.QUALITY)
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        size = await asyncio.shield(future)
+        await asyncio.to_thread(self._add, path, size)
+        return path, key
+
+    def url(self, url: Optional[str], w: Optional[int] = None, h: Optional[int] = None, fmt: Optional[str] = None) -> Optional[str]:
+        """
+        Jinja helper: the /media URL for an existing uploads URL, so templates can opt old
+        uploads into resizing without re-uploading. Other URLs are returned unchanged.
+        """
+        prefix = "/static/uploads/"
+        key = upload_storage.key_for_url(url) or (url[len(prefix):] if url and url.startswith(prefix) else None)
+        if not key or key.split("/", 1)[0] not in self.PUBLIC_DIRS:
+            return url
+        params = {k: v for k, v in (("w", w), ("h", h), ("fmt", fmt)) if v}
+        query = f"?{urlencode(params)}" if params else ""
+        return f"/media/{key}{query}"
+
+    def srcset(self, url: Optional[str]) -> str:
+        """
+        Jinja helper: pipeline uploads list their pre-rendered variants; older uploads get
+        /media URLs at the same widths; anything else (external, static assets) gets "".
+        """
+        variants = image_pipeline.srcset(url)
+        if variants or self.url(url) == url:
+            return variants
+        return ", ".join(f"{self.url(url, w=width)} {width}w" for width in image_pipeline.WIDTHS)
+
+media_cache = MediaCache()
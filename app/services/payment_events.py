@@ -0,0 +1,236 @@
+from sqlalchemy import and_, exists, or_, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, aliased
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import json
+from ..db import models, database
+from .booking_state import booking_state, TransitionError
+
+class PaymentEventService:
+    """
+    Durable, de-duplicated payment webhook ingestion.
+
+    The webhook only stores the raw event (unique on event_id, so gateway retries are
+    dropped by ON CONFLICT DO NOTHING) and acknowledges. A background worker applies
+    stored events later, strictly in arrival order per booking: an event is only picked
+    up when no earlier unprocessed event exists for the same booking, and claims use
+    FOR UPDATE SKIP LOCKED so several workers can drain the queue side by side.
+    An event that raises is retried with exponential backoff (next_attempt_at) and
+    marked failed after MAX_ATTEMPTS.
+    """
+    MAX_ATTEMPTS = 5
+    BATCH_SIZE = 100
+    RETRY_BASE = timedelta(seconds=30)
+    RETRY_MAX = timedelta(hours=1)
+
+    def __init__(self):
+        self._wakeup: Optional[asyncio.Event] = None
+
+    # --- Ingestion (request path) ---
+
+    @staticmethod
+    def _object(value: Any, name: str) -> Dict[str, Any]:
+        if value is None:
+            return {}
+        if not isinstance(value, dict):
+            raise ValueError(f"'{name}' must be an object")
+        return value
+
+    def parse(self, raw_body: bytes) -> Tuple[str, Optional[str], Optional[int], Any]:
+        """
+        Returns (event_id, event_type, booking_id, payload) without touching the database.
+        Raises ValueError for bodies that aren't JSON or whose gateway envelope is malformed.
+        """
+        payload = json.loads(raw_body)
+        event_type = None
+        event_id = None
+        booking_id = None
+
+        # Determine if it's Paymongo format
+        if isinstance(payload, dict) and "data" in payload:
+            data = self._object(payload["data"], "data")
+            event_id = data.get("id")
+            pm_attrs = self._object(data.get("attributes"), "data.attributes")
+            event_type = pm_attrs.get("type")
+            resource = self._object(pm_attrs.get("data"), "data.attributes.data")
+            remarks = self._object(resource.get("attributes"), "data.attributes.data.attributes").get("remarks")
+            if event_type is not None and not isinstance(event_type, str):
+                raise ValueError("'data.attributes.type' must be a string")
+            # Extract booking ID from remarks e.g. "booking_id:15"
+            if isinstance(remarks, str) and remarks.startswith("booking_id:"):
+                try:
+                    booking_id = int(remarks.split(":", 1)[1])
+                except ValueError:
+                    booking_id = None
+        elif isinstance(payload, dict):
+            # Mock Fallback
+            event_type = "mock"
+            event_id = payload.get("event_id")
+            try:
+                booking_id = int(payload.get("booking_id"))
+            except (TypeError, ValueError):
+                booking_id = None
+
+        if not event_id:
+            # No gateway id: identical retries still share the same body
+            event_id = "sha256:" + hashlib.sha256(raw_body).hexdigest()
+        return str(event_id)[:255], event_type, booking_id, payload
+
+    def store(self, db: Session, raw_body: bytes) -> bool:
+        """
+        Persists the event once. Returns False if it was already received. An event naming
+        a booking that doesn't exist is still stored, with booking_id NULL and the id it
+        named kept in booking_reference.
+        """
+        event_id, event_type, booking_id, payload = self.parse(raw_body)
+        existing_booking = select(models.Booking.id).where(models.Booking.id == booking_id).scalar_subquery()
+        inserted = db.execute(
+            insert(models.PaymentEvent)
+            .values(
+                event_id=event_id,
+                event_type=event_type[:100] if event_type else None,
+                booking_id=existing_booking if booking_id is not None else None,
+                booking_reference=str(booking_id) if booking_id is not None else None,
+                payload=payload,
+                status="received",
+                attempts=0
+            )
+            .on_conflict_do_nothing(index_elements=["event_id"])
+            .returning(models.PaymentEvent.id)
+        ).scalar()
+        db.commit()
+        if inserted is not None:
+            self.notify()
+        return inserted is not None
+
+    def notify(self):
+        """Wakes the worker so fresh events are applied without waiting for the next poll."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    # --- Processing (worker) ---
+
+    def _claim(self, db: Session, batch_size: int, now: datetime) -> List[models.PaymentEvent]:
+        event = models.PaymentEvent
+        earlier = aliased(models.PaymentEvent)
+        head_of_line = ~exists().where(and_(
+            earlier.booking_id == event.booking_id,
+            earlier.status == "received",
+            earlier.id < event.id
+        ))
+        return db.query(event).filter(
+            event.status == "received",
+            or_(event.next_attempt_at == None, event.next_attempt_at <= now),
+            head_of_line
+        ).order_by(event.id).limit(batch_size).with_for_update(skip_locked=True, of=event).all()
+
+    def apply(self, db: Session, event: models.PaymentEvent) -> str:
+        """Applies one event to its booking and returns the resulting event status."""
+        payload = event.payload or {}
+        if event.event_type == "mock":
+            status = payload.get("status") # 'success', 'failed'
+        elif event.event_type == "link.payment.paid":
+            # Shape was validated by parse() when the event was stored
+            resource = payload["data"]["attributes"].get("data") or {}
+            status = (resource.get("attributes") or {}).get("status")
+        else:
+            return "ignored"
+
+        if status not in ["success", "paid"]:
+            return "ignored"
+
+        if not event.booking_id:
+            event.last_error = f"Booking #{event.booking_reference} not found" if event.booking_reference else "Booking not found"
+            return "ignored"
+
+        try:
+            outcome = booking_state.apply_payment(
+                db, event.booking_id,
+                f"Payment received via {payload.get('method')}"
+            )
+        except TransitionError as e:
+            # Missing booking, or a status no payment applies to
+            event.last_error = "Booking not found" if e.current_status is None else str(e)
+            return "ignored"
+
+        if outcome == "refund_required":
+            # Money was taken for a booking that no longer holds a date; the flag asks for review
+            event.last_error = "Paid after the booking lapsed; flagged for refund"
+
+        # TODO: Send email confirmation
+        return "processed"
+
+    def process_batch(self, db: Session, batch_size: Optional[int] = None) -> Dict[str, int]:
+        report = {"processed": 0, "ignored": 0, "failed": 0, "retrying": 0}
+        now = datetime.now(timezone.utc)
+        events = self._claim(db, batch_size or self.BATCH_SIZE, now)
+
+        for event in events:
+            savepoint = db.begin_nested()
+            try:
+                outcome = self.apply(db, event)
+                savepoint.commit()
+            except Exception as e:
+                savepoint.rollback()
+                event.attempts = (event.attempts or 0) + 1
+                event.last_error = str(e)[:2000]
+                if event.attempts >= self.MAX_ATTEMPTS:
+                    event.status = "failed"
+                    event.processed_at = now
+                    report["failed"] += 1
+                else:
+                    # Stays at the head of its booking's queue so later events wait for it
+                    event.next_attempt_at = now + min(self.RETRY_BASE * 2 ** (event.attempts - 1), self.RETRY_MAX)
+                    report["retrying"] += 1
+                continue
+
+            event.status = outcome
+            event.attempts = (event.attempts or 0) + 1
+            event.next_attempt_at = None
+            event.processed_at = now
+            report[outcome] += 1
+
+        db.commit()
+        return report
+
+    def drain(self, db: Session, max_batches: int = 50) -> Dict[str, int]:
+        """Applies pending events batch by batch until the queue is empty or only retries remain."""
+        total = {"processed": 0, "ignored": 0, "failed": 0, "retrying": 0}
+        for _ in range(max_batches):
+            report = self.process_batch(db)
+            for k, v in report.items():
+                total[k] += v
+            if not (report["processed"] or report["ignored"] or report["failed"]):
+                break
+        return total
+
+    def _drain_once(self) -> Dict[str, int]:
+        db = database.SessionLocal()
+        try:
+            return self.drain(db)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def run_forever(self, poll_seconds: float):
+        """Worker loop started with the app; wakes on new events or every poll_seconds."""
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                report = await asyncio.to_thread(self._drain_once)
+                if report["failed"] or report["retrying"]:
+                    print(f"[PAYMENT EVENTS] {report}")
+            except Exception as e:
+                print(f"[PAYMENT EVENTS ERROR] {e}")
+
+payment_event_service = PaymentEventService()
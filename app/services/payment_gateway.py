@@ -0,0 +1,140 @@
+import asyncio
+import importlib.util
+from typing import Any, Dict, Optional
+import httpx
+from ..core.config import settings
+
+class PaymentGatewayError(Exception):
+    """Raised when the gateway is unreachable or answers with an error."""
+    def __init__(self, message: str, status_code: Optional[int] = None, body: Optional[str] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.body = body
+
+class PaymongoClient:
+    """
+    App-lifetime Paymongo client.
+
+    A single httpx.AsyncClient is shared across requests so TCP/TLS connections are
+    kept alive and reused (HTTP/2 when the `h2` package is installed). Every call has
+    explicit timeouts; idempotent calls (GETs) are retried with backoff on transport
+    errors, 429 and 5xx responses. Point PAYMONGO_API_BASE at a local stub, or pass a
+    custom httpx transport, to exercise it without the real gateway.
+    """
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(
+        self,
+        base_url: str,
+        secret_key: str,
+        timeout: float = 10.0,
+        connect_timeout: float = 5.0,
+        max_retries: int = 2,
+        backoff_seconds: float = 0.5,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.secret_key = secret_key
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def is_configured(self) -> bool:
+        return bool(self.secret_key)
+
+    def _build_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            auth=(self.secret_key, ""),
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=30.0),
+            http2=self.transport is None and importlib.util.find_spec("h2") is not None,
+            transport=self.transport,
+            headers={"Accept": "application/json"}
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created lazily so scripts and tests can use the client without app startup
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+        return self._client
+
+    async def start(self):
+        _ = self.client
+
+    async def close(self):
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+    async def _request(self, method: str, path: str, retry: bool, **kwargs) -> Dict[str, Any]:
+        attempts = self.max_retries + 1 if retry else 1
+        last_error: Optional[PaymentGatewayError] = None
+
+        for attempt in range(attempts):
+            if attempt:
+                await asyncio.sleep(self.backoff_seconds * (2 ** (attempt - 1)))
+            try:
+                response = await self.client.request(method, path, **kwargs)
+            except httpx.TransportError as e:
+                last_error = PaymentGatewayError(f"Paymongo request failed: {e!r}")
+                continue
+
+            if response.status_code in self.RETRY_STATUSES:
+                last_error = PaymentGatewayError(
+                    f"Paymongo returned {response.status_code}", response.status_code, response.text
+                )
+                continue
+            if response.status_code >= 400:
+                raise PaymentGatewayError(
+                    f"Paymongo returned {response.status_code}", response.status_code, response.text
+                )
+            try:
+                return response.json()
+            except ValueError:
+                raise PaymentGatewayError("Paymongo returned a non-JSON body", response.status_code, response.text)
+
+        raise last_error
+
+    def _attributes(self, data: Dict[str, Any], *required: str) -> Dict[str, Any]:
+        try:
+            attributes = {"id": data["data"].get("id"), **data["data"]["attributes"]}
+        except (KeyError, TypeError, AttributeError):
+            raise PaymentGatewayError("Unexpected Paymongo response shape", body=str(data))
+        missing = [key for key in required if key not in attributes]
+        if missing:
+            raise PaymentGatewayError(f"Paymongo response missing {', '.join(missing)}", body=str(data))
+        return attributes
+
+    async def create_link(self, amount_cents: int, description: str, remarks: str, success_url: str, failed_url: str) -> Dict[str, Any]:
+        """Creates a checkout link and returns its attributes (checkout_url, reference_number, ...)."""
+        payload = {
+            "data": {
+                "attributes": {
+                    "amount": amount_cents,
+                    "description": description,
+                    "remarks": remarks,
+                    "redirect": {
+                        "success": success_url,
+                        "failed": failed_url
+                    }
+                }
+            }
+        }
+        # POST creates a new link on every call, so it is never retried automatically
+        data = await self._request("POST", "/links", retry=False, json=payload)
+        return self._attributes(data, "checkout_url", "reference_number")
+
+    async def get_link(self, link_id: str) -> Dict[str, Any]:
+        data = await self._request("GET", f"/links/{link_id}", retry=True)
+        return self._attributes(data, "status")
+
+paymongo_client = PaymongoClient(
+    base_url=settings.PAYMONGO_API_BASE,
+    secret_key=settings.PAYMONGO_SECRET_KEY,
+    timeout=settings.PAYMONGO_TIMEOUT_SECONDS
+)
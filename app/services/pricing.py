@@ -0,0 +1,382 @@
+from sqlalchemy import func, or_, update
+from sqlalchemy.orm import Session
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from datetime import date
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence, Tuple
+import threading
+import time
+import numpy as np
+from ..db import models
+
+def to_cents(amount) -> int:
+    return int((Decimal(str(amount or 0)) * 100).quantize(Decimal("1")))
+
+def from_cents(cents) -> float:
+    return float(Decimal(int(cents)) / 100)
+
+@dataclass(frozen=True)
+class PromotionRule:
+    """One active caterer promotion, reduced to integers."""
+    promotion_id: int
+    percent_bp: int = 0 # percentage discounts, in basis points (10% -> 1000)
+    fixed_cents: int = 0 # fixed discounts
+
+    def discount(self, subtotal, minimum: Callable):
+        if self.percent_bp:
+            return (subtotal * self.percent_bp + 5000) // 10000
+        return minimum(subtotal, self.fixed_cents)
+
+@dataclass(frozen=True)
+class PricingRules:
+    """
+    A package's price rules compiled to integer centavos.
+
+    Guests up to `included_guests` are billed at the unit price and every guest beyond
+    that at `extra_guest_cents` (tiered pricing; no tier when it is None). The guest
+    charge is floored at the minimum contract amount, overtime hours beyond the package's
+    service duration add `overtime_cents` each, and the best active promotion is taken
+    off the subtotal. The same arithmetic runs on Python ints (single quotes) and on
+    NumPy arrays (quote tables), so both paths always agree to the centavo.
+    """
+    unit_price_cents: int
+    included_guests: int = 0
+    extra_guest_cents: Optional[int] = None
+    min_contract_cents: int = 0
+    service_hours: int = 0
+    overtime_cents: int = 0 # per hour beyond service_hours
+    promotions: Tuple[PromotionRule, ...] = ()
+
+    def with_promotions(self, promotions: Sequence[PromotionRule]) -> "PricingRules":
+        return replace(self, promotions=tuple(promotions))
+
+    def evaluate(self, guests, addon_total_cents: int, overtime_hours: int, minimum: Callable = min, maximum: Callable = max):
+        """Returns (base, overtime, discount, total) for `guests`, an int or an int64 array."""
+        if self.extra_guest_cents is None:
+            base = guests * self.unit_price_cents
+        else:
+            included = minimum(guests, self.included_guests)
+            base = included * self.unit_price_cents + (guests - included) * self.extra_guest_cents
+        base = maximum(base, self.min_contract_cents)
+        overtime = overtime_hours * self.overtime_cents
+        subtotal = base + addon_total_cents + overtime
+
+        discount = subtotal * 0
+        for promotion in self.promotions:
+            discount = maximum(discount, promotion.discount(subtotal, minimum))
+        return base, overtime, discount, subtotal - discount
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON form stored on quotations, so signing re-prices with the rules that were quoted."""
+        return {
+            "unit_price": from_cents(self.unit_price_cents),
+            "included_guests": self.included_guests,
+            "additional_guest_price": None if self.extra_guest_cents is None else from_cents(self.extra_guest_cents),
+            "min_contract_amount": from_cents(self.min_contract_cents),
+            "service_hours": self.service_hours,
+            "overtime_fee": from_cents(self.overtime_cents),
+            "promotions": [
+                {"id": p.promotion_id, "percent_bp": p.percent_bp, "fixed": from_cents(p.fixed_cents)}
+                for p in self.promotions
+            ]
+        }
+
+    @classmethod
+    def from_snapshot(cls, details: Dict[str, Any]) -> "PricingRules":
+        """Rebuilds rules from quotation package_details; older quotations only carry unit_price."""
+        rules = details.get("pricing_rules")
+        if not rules:
+            return cls(unit_price_cents=to_cents(details.get("unit_price", 0)))
+        extra = rules.get("additional_guest_price")
+        return cls(
+            unit_price_cents=to_cents(rules.get("unit_price")),
+            included_guests=int(rules.get("included_guests") or 0),
+            extra_guest_cents=None if extra is None else to_cents(extra),
+            min_contract_cents=to_cents(rules.get("min_contract_amount")),
+            service_hours=int(rules.get("service_hours") or 0),
+            overtime_cents=to_cents(rules.get("overtime_fee")),
+            promotions=tuple(
+                PromotionRule(p["id"], int(p.get("percent_bp") or 0), to_cents(p.get("fixed")))
+                for p in rules.get("promotions") or []
+            )
+        )
+
+@dataclass(frozen=True)
+class PackagePricing:
+    """Immutable price snapshot of one package at one pricing_version."""
+    package_id: int
+    version: int
+    caterer_id: Optional[int]
+    rules: PricingRules # without promotions; those are attached per quote
+    addon_cents: Dict[int, int] # menu_item_id -> add-on price
+
+    @property
+    def unit_price_cents(self) -> int:
+        return self.rules.unit_price_cents
+
+    @property
+    def unit_price(self) -> float:
+        return from_cents(self.unit_price_cents)
+
+class PricingCache:
+    """
+    Small in-process LRU of package price snapshots keyed by (package_id, pricing_version).
+    A version bump simply makes the old entry unreachable; it ages out of the LRU.
+    """
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[int, int], PackagePricing]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, package_id: int, version: int) -> Optional[PackagePricing]:
+        key = (package_id, version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, pricing: PackagePricing):
+        key = (pricing.package_id, pricing.version)
+        with self._lock:
+            self._entries[key] = pricing
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+class PromotionCache:
+    """
+    Active promotions per caterer, held for a short TTL. Promotions have no edit path
+    that could bump a version, so entries simply expire (and never outlive the day
+    they were loaded for, since promotions start and end on dates).
+    """
+    def __init__(self, ttl_seconds: float = 60.0):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[int, Tuple[float, date, Tuple[PromotionRule, ...]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, caterer_id: int, today: date) -> Optional[Tuple[PromotionRule, ...]]:
+        with self._lock:
+            entry = self._entries.get(caterer_id)
+        if entry is None or entry[0] < time.monotonic() or entry[1] != today:
+            return None
+        return entry[2]
+
+    def put(self, caterer_id: int, today: date, promotions: Tuple[PromotionRule, ...]):
+        with self._lock:
+            self._entries[caterer_id] = (time.monotonic() + self.ttl_seconds, today, promotions)
+
+class PricingEngine:
+    """
+    Quote arithmetic for packages, done in integer centavos with NumPy.
+
+    Each package's pricing columns are compiled once per pricing_version into
+    PricingRules (tiered guests, minimum contract, overtime), and the caterer's active
+    promotions are attached from a short-lived cache, so a quote is plain integer
+    arithmetic with no queries beyond the version check.
+
+    A quote table prices a whole vector of guest counts against a vector of downpayment
+    percentages in one pass, so the quotation slider can fetch every point it may show in
+    a single request instead of recalculating per change.
+    """
+    DOWNPAYMENT_MIN = 30
+    DOWNPAYMENT_MAX = 50
+    # Upper bound on guest counts x downpayment percentages in one table
+    MAX_QUOTE_POINTS = 20000
+    MAX_OVERTIME_HOURS = 24
+
+    def __init__(self):
+        self.cache = PricingCache()
+        self.promotions = PromotionCache()
+
+    def bump_version(self, db: Session, package_id: int):
+        """Invalidates cached prices for a package. Runs inside the caller's transaction."""
+        db.execute(
+            update(models.CateringPackage)
+            .where(models.CateringPackage.id == package_id)
+            .values(pricing_version=func.coalesce(models.CateringPackage.pricing_version, 0) + 1)
+        )
+
+    def compile_rules(self, row) -> PricingRules:
+        # Prioritize price_per_head over legacy price
+        unit_cents = to_cents(row.price_per_head or row.price)
+        return PricingRules(
+            unit_price_cents=unit_cents,
+            # The package rate covers its minimum headcount; extra guests use additional_guest_price
+            included_guests=row.min_guests or 0,
+            extra_guest_cents=None if row.additional_guest_price is None else to_cents(row.additional_guest_price),
+            min_contract_cents=to_cents(row.min_contract_amount),
+            service_hours=row.service_duration or 0,
+            overtime_cents=to_cents(row.overtime_fee)
+        )
+
+    def load(self, db: Session, package_id: int) -> Optional[PackagePricing]:
+        """Returns the package's price snapshot, querying add-ons only when its version is not cached."""
+        package = models.CateringPackage
+        row = db.query(
+            package.pricing_version,
+            package.caterer_id,
+            package.price_per_head,
+            package.price,
+            package.min_guests,
+            package.additional_guest_price,
+            package.min_contract_amount,
+            package.service_duration,
+            package.overtime_fee
+        ).filter(package.id == package_id).first()
+        if row is None:
+            return None
+
+        version = row.pricing_version or 0
+        cached = self.cache.get(package_id, version)
+        if cached is not None:
+            return cached
+
+        addons = db.query(models.MenuItem.id, models.MenuItem.addon_price).filter(
+            models.MenuItem.package_id == package_id,
+            models.MenuItem.is_addon == True
+        ).all()
+        pricing = PackagePricing(
+            package_id=package_id,
+            version=version,
+            caterer_id=row.caterer_id,
+            rules=self.compile_rules(row),
+            addon_cents={item_id: to_cents(price) for item_id, price in addons}
+        )
+        self.cache.put(pricing)
+        return pricing
+
+    def active_promotions(self, db: Session, caterer_id: Optional[int], today: Optional[date] = None) -> Tuple[PromotionRule, ...]:
+        if caterer_id is None:
+            return ()
+        today = today or date.today()
+        cached = self.promotions.get(caterer_id, today)
+        if cached is not None:
+            return cached
+
+        promotion = models.Promotion
+        rows = db.query(promotion.id, promotion.discount_type, promotion.discount_value).filter(
+            promotion.caterer_id == caterer_id,
+            promotion.is_active == True,
+            promotion.discount_value > 0,
+            or_(promotion.start_date == None, promotion.start_date <= today),
+            or_(promotion.end_date == None, promotion.end_date >= today)
+        ).all()
+        rules = tuple(
+            PromotionRule(promotion_id, percent_bp=min(10000, round(value * 100)))
+            if discount_type == "percentage"
+            else PromotionRule(promotion_id, fixed_cents=to_cents(value))
+            for promotion_id, discount_type, value in rows
+        )
+        self.promotions.put(caterer_id, today, rules)
+        return rules
+
+    def rules(self, db: Session, pricing: PackagePricing) -> PricingRules:
+        """The package's compiled rules with today's promotions for its caterer attached."""
+        promotions = self.active_promotions(db, pricing.caterer_id)
+        return pricing.rules.with_promotions(promotions) if promotions else pricing.rules
+
+    def addon_total_cents(self, pricing: PackagePricing, addon_ids: Iterable[int]) -> int:
+        """Sums add-on prices from the snapshot. Raises ValueError for ids that are not add-ons of the package."""
+        total = 0
+        for item_id in addon_ids:
+            if item_id not in pricing.addon_cents:
+                raise ValueError(f"Menu item {item_id} is not an add-on of this package")
+            total += pricing.addon_cents[item_id]
+        return total
+
+    def clamp_downpayment(self, percent: Optional[int]) -> int:
+        # Ensure downpayment is within 30-50%
+        if percent is None or not (self.DOWNPAYMENT_MIN <= percent <= self.DOWNPAYMENT_MAX):
+            return self.DOWNPAYMENT_MIN
+        return int(percent)
+
+    def _check_overtime(self, overtime_hours: int) -> int:
+        if not (0 <= overtime_hours <= self.MAX_OVERTIME_HOURS):
+            raise ValueError(f"Overtime must be between 0 and {self.MAX_OVERTIME_HOURS} hours")
+        return int(overtime_hours)
+
+    def quote_table(
+        self,
+        rules: PricingRules,
+        addon_total_cents: int,
+        guest_counts: Sequence[int],
+        downpayment_percents: Sequence[int],
+        overtime_hours: int = 0
+    ) -> Dict[str, np.ndarray]:
+        """
+        Prices every guest count (rows) against every downpayment percent (columns).
+        All amounts are int64 centavos; deposits round half up to the centavo.
+        """
+        guests = np.asarray(guest_counts, dtype=np.int64)
+        percents = np.asarray(downpayment_percents, dtype=np.int64)
+        if guests.ndim != 1 or percents.ndim != 1 or not guests.size or not percents.size:
+            raise ValueError("guest_counts and downpayment_percents must be non-empty lists")
+        if guests.size * percents.size > self.MAX_QUOTE_POINTS:
+            raise ValueError(f"At most {self.MAX_QUOTE_POINTS} quote points can be requested at once")
+        if (guests < 0).any():
+            raise ValueError("Guest counts cannot be negative")
+        if ((percents < self.DOWNPAYMENT_MIN) | (percents > self.DOWNPAYMENT_MAX)).any():
+            raise ValueError(f"Downpayment must be between {self.DOWNPAYMENT_MIN}% and {self.DOWNPAYMENT_MAX}%")
+        overtime_hours = self._check_overtime(overtime_hours)
+
+        base, overtime, discount, total = rules.evaluate(
+            guests, np.int64(addon_total_cents), overtime_hours, np.minimum, np.maximum
+        )
+        deposit = (total[:, None] * percents[None, :] + 50) // 100
+        return {
+            "guest_counts": guests,
+            "downpayment_percents": percents,
+            "base_cents": base,
+            "overtime_cents": np.int64(overtime),
+            "discount_cents": discount,
+            "total_cents": total,
+            "deposit_cents": deposit
+        }
+
+    def quote(
+        self,
+        rules: PricingRules,
+        addon_total_cents: int,
+        guest_count: int,
+        downpayment_percent: int,
+        overtime_hours: int = 0
+    ) -> Dict[str, Decimal]:
+        """Single-point quote as Decimals, for persisting quotations and reservation fees. Pure int math."""
+        if guest_count < 0:
+            raise ValueError("Guest counts cannot be negative")
+        if not (self.DOWNPAYMENT_MIN <= downpayment_percent <= self.DOWNPAYMENT_MAX):
+            raise ValueError(f"Downpayment must be between {self.DOWNPAYMENT_MIN}% and {self.DOWNPAYMENT_MAX}%")
+        overtime_hours = self._check_overtime(overtime_hours)
+
+        base, overtime, discount, total = rules.evaluate(int(guest_count), int(addon_total_cents), overtime_hours)
+        deposit = (total * int(downpayment_percent) + 50) // 100
+        return {
+            "base_amount": Decimal(base) / 100,
+            "overtime_amount": Decimal(overtime) / 100,
+            "discount_amount": Decimal(discount) / 100,
+            "total_amount": Decimal(total) / 100,
+            "deposit_amount": Decimal(deposit) / 100
+        }
+
+    def deposit(self, total_cents: int, downpayment_percent: int) -> Decimal:
+        """Deposit on an already-priced total, e.g. a quotation signed without changes."""
+        return self.quote(PricingRules(unit_price_cents=total_cents), 0, 1, downpayment_percent)["deposit_amount"]
+
+    def table_response(self, table: Dict[str, np.ndarray], rules: PricingRules, addon_total_cents: int) -> Dict[str, Any]:
+        """JSON-friendly view: deposit_amounts[i][j] is for guest_counts[i] at downpayment_percents[j]."""
+        return {
+            "unit_price": from_cents(rules.unit_price_cents),
+            "addon_total": from_cents(addon_total_cents),
+            "overtime_amount": from_cents(table["overtime_cents"]),
+            "rules": rules.snapshot(),
+            "guest_counts": table["guest_counts"].tolist(),
+            "downpayment_percents": table["downpayment_percents"].tolist(),
+            "base_amounts": (table["base_cents"] / 100).tolist(),
+            "discount_amounts": (table["discount_cents"] / 100).tolist(),
+            "total_amounts": (table["total_cents"] / 100).tolist(),
+            "deposit_amounts": (table["deposit_cents"] / 100).tolist()
+        }
+
+pricing_engine = PricingEngine()
@@ -1,67 +1,65 @@
 from sqlalchemy.orm import Session
 from ..db import models
-from decimal import Decimal
+from .pricing import pricing_engine, PricingRules, to_cents, from_cents
 from datetime import datetime, timedelta
 
 class QuotationService:
-    def create_quotation(self, db: Session, booking: models.Booking, downpayment_percent: int = 30) -> models.Quotation:
+    def create_quotation(self, db: Session, booking: models.Booking, downpayment_percent: int = 30, overtime_hours: int = 0) -> models.Quotation:
         """
         Calculates total cost and creates a Quotation record for a booking.
+        The compiled pricing rules are stored with it so later re-pricing matches the quote.
         """
         package = booking.package
+        guest_count = booking.guest_count or 0
         if not package:
             # Fallback for custom bookings without a unified package
-            base_amount = Decimal(str(booking.total_amount or 0.0))
-            if booking.guest_count and booking.guest_count > 0:
-                unit_price = float(base_amount / Decimal(str(booking.guest_count)))
-            else:
-                unit_price = float(base_amount)
-                
+            base_cents = to_cents(booking.total_amount)
+            unit_cents = base_cents // guest_count if guest_count > 0 else base_cents
+            # Custom totals are taken as-is rather than re-derived from a rounded unit price
+            rules = PricingRules(unit_price_cents=base_cents)
+            priced_guests = 1
             package_details = {
                 "name": "Custom Menu",
                 "description": "Customized catering menu.",
-                "unit_price": unit_price,
+                "unit_price": from_cents(unit_cents),
                 "guest_count": booking.guest_count,
-                "base_amount": float(base_amount)
+                "base_amount": from_cents(base_cents)
             }
         else:
-            # Determine actual package price (prioritize price_per_head over legacy price)
-            actual_unit_price = package.price_per_head if hasattr(package, 'price_per_head') and package.price_per_head else package.price
-            
-            # Base calculation: actual_unit_price * guest_count
-            base_amount = Decimal(str(actual_unit_price)) * Decimal(str(booking.guest_count))
+            # Rules come from the package's cached, compiled price snapshot
+            rules = pricing_engine.rules(db, pricing_engine.load(db, package.id))
+            priced_guests = guest_count
             package_details = {
                 "name": package.name,
                 "description": package.description,
-                "unit_price": float(actual_unit_price),
+                "unit_price": from_cents(rules.unit_price_cents),
                 "guest_count": booking.guest_count,
-                "base_amount": float(base_amount)
+                "overtime_hours": overtime_hours,
+                "pricing_rules": rules.snapshot()
             }
         
-        # Calculate add-ons from BookingMenuItem
-        addons = []
-        addon_total = Decimal("0.0")
-        
+        # Calculate add-ons from BookingMenuItem (prices as captured at booking time)
         from ..db.models import BookingMenuItem, MenuItem
-        booking_items = db.query(BookingMenuItem).join(MenuItem).filter(
+        booking_items = db.query(
+            BookingMenuItem.menu_item_id, MenuItem.name, BookingMenuItem.price
+        ).join(MenuItem).filter(
             BookingMenuItem.booking_id == booking.id,
             BookingMenuItem.is_add_on == True
         ).all()
 
-        for item in booking_items:
-            price = Decimal(str(item.price))
-            addons.append({
-                "id": item.menu_item_id,
-                "name": item.menu_item.name,
-                "price": float(price)
-            })
-            addon_total += price
+        addons = [
+            {"id": item_id, "name": name, "price": from_cents(to_cents(price))}
+            for item_id, name, price in booking_items
+        ]
+        addon_cents = sum(to_cents(price) for _, _, price in booking_items)
 
-        total_amount = base_amount + addon_total
-        
-        # Ensure downpayment is within 30-50%
-        if not (30 <= downpayment_percent <= 50):
-            downpayment_percent = 30
+        downpayment_percent = pricing_engine.clamp_downpayment(downpayment_percent)
+        amounts = pricing_engine.quote(rules, addon_cents, priced_guests, downpayment_percent, overtime_hours)
+        total_amount = amounts["total_amount"]
+        if package:
+            package_details["base_amount"] = float(amounts["base_amount"])
+            package_details["overtime_amount"] = float(amounts["overtime_amount"])
+            package_details["discount_amount"] = float(amounts["discount_amount"])
 
         quotation = models.Quotation(
             booking_id=booking.id,
@@ -77,8 +75,8 @@ class QuotationService:
         
         # Update booking expiration (24h)
         booking.expires_at = datetime.now() + timedelta(hours=24)
-        # Store high precision Decimal in reservation_fee
-        booking.reservation_fee = total_amount * Decimal(str(downpayment_percent / 100))
+        # Store exact centavo Decimal in reservation_fee
+        booking.reservation_fee = amounts["deposit_amount"]
         booking.total_amount = float(total_amount)
         
         db.commit()
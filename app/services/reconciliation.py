@@ -0,0 +1,125 @@
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+import asyncio
+from ..db import models
+from .booking_state import booking_state, PAID_STATUSES, TransitionError
+from .payment_gateway import paymongo_client, PaymongoClient, PaymentGatewayError
+
+class PaymentReconciler:
+    """
+    Reconciles bookings stuck in pending_payment - and unpaid bookings that expired
+    recently with a checkout link on file - with what Paymongo actually recorded.
+
+    Bookings are read page by page (keyset on id) and their checkout links are looked
+    up concurrently, bounded by a semaphore so the gateway never sees more than
+    `concurrency` requests from us at once. Paid links whose webhook never arrived go
+    through booking_state.apply_payment, the same path the webhook worker uses, so a
+    webhook landing mid-run is not applied twice and a late payment on an expired
+    booking is recovered or flagged for refund.
+    """
+    PENDING_STATUS = "pending_payment"
+    # Recently redirected customers may still be paying, or their webhook is in flight
+    GRACE_PERIOD = timedelta(minutes=15)
+    # Expired bookings are re-checked for this long after their deadline
+    EXPIRED_LOOKBACK = timedelta(days=7)
+
+    def __init__(self, client: PaymongoClient = paymongo_client):
+        self.client = client
+
+    def _page(self, db: Session, after_id: int, page_size: int, cutoff: datetime, now: datetime) -> List[models.Booking]:
+        recently_expired = and_(
+            models.Booking.status == "expired",
+            models.Booking.payment_reference.startswith("link_", autoescape=True),
+            or_(models.Booking.payment_status == None, models.Booking.payment_status.notin_(PAID_STATUSES)),
+            models.Booking.expires_at >= now - self.EXPIRED_LOOKBACK
+        )
+        return db.query(models.Booking).filter(
+            or_(models.Booking.status == self.PENDING_STATUS, recently_expired),
+            models.Booking.id > after_id,
+            func.coalesce(models.Booking.updated_at, models.Booking.created_at) < cutoff
+        ).order_by(models.Booking.id).limit(page_size).all()
+
+    async def _lookup(self, semaphore: asyncio.Semaphore, link_id: str) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                return await self.client.get_link(link_id)
+            except PaymentGatewayError as e:
+                return {"error": str(e)}
+
+    def _confirm(self, db: Session, booking_id: int, reference: str, link: Dict[str, Any]) -> str:
+        """Returns the apply_payment outcome, or 'already_updated' if the booking moved elsewhere meanwhile."""
+        try:
+            return booking_state.apply_payment(
+                db, booking_id,
+                f"Payment reconciled with Paymongo ({link.get('reference_number') or reference})"
+            )
+        except TransitionError:
+            return "already_updated"
+
+    async def reconcile(
+        self,
+        db: Session,
+        concurrency: int = 10,
+        page_size: int = 200,
+        grace: Optional[timedelta] = None,
+        dry_run: bool = False,
+        now: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """
+        Walks every pending_payment booking older than the grace period, plus bookings
+        that expired within EXPIRED_LOOKBACK with a checkout link, and returns a summary:
+        counts per outcome plus the ids of bookings that were fixed or errored.
+        """
+        now = now or datetime.now(timezone.utc)
+        cutoff = now - (grace if grace is not None else self.GRACE_PERIOD)
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        report: Dict[str, Any] = {
+            "checked": 0, "confirmed": 0, "recovered": 0, "refund_required": 0,
+            "unpaid": 0, "no_reference": 0, "already_updated": 0, "errors": 0,
+            "confirmed_ids": [], "refund_ids": [], "error_ids": []
+        }
+
+        after_id = 0
+        while True:
+            bookings = self._page(db, after_id, page_size, cutoff, now)
+            if not bookings:
+                break
+            after_id = bookings[-1].id
+
+            with_link = [
+                (b.id, b.payment_reference) for b in bookings
+                if b.payment_reference and b.payment_reference.startswith("link_")
+            ]
+            report["no_reference"] += len(bookings) - len(with_link)
+            links = await asyncio.gather(*[self._lookup(semaphore, reference) for _, reference in with_link])
+
+            for (booking_id, reference), link in zip(with_link, links):
+                report["checked"] += 1
+                if "error" in link:
+                    report["errors"] += 1
+                    report["error_ids"].append(booking_id)
+                elif link.get("status") != "paid":
+                    report["unpaid"] += 1
+                elif dry_run:
+                    report["confirmed"] += 1
+                    report["confirmed_ids"].append(booking_id)
+                else:
+                    outcome = self._confirm(db, booking_id, reference, link)
+                    if outcome in ("confirmed", "recovered"):
+                        report[outcome] += 1
+                        report["confirmed_ids"].append(booking_id)
+                    elif outcome == "refund_required":
+                        report["refund_required"] += 1
+                        report["refund_ids"].append(booking_id)
+                    else:
+                        # already_confirmed: the webhook got there first
+                        report["already_updated"] += 1
+
+            if not dry_run:
+                db.commit()
+
+        return report
+
+payment_reconciler = PaymentReconciler()
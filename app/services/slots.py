@@ -0,0 +1,198 @@
+from sqlalchemy import and_, exists, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from collections import defaultdict
+from datetime import date
+from typing import Dict, List, Tuple
+from ..db import models
+
+class SlotReservationService:
+    """
+    Per-caterer daily capacity backed by the caterer_day_slots counter table.
+
+    A reservation is a conditional UPDATE on the single (caterer_id, date) row, so
+    concurrent requests for the same hot date serialize on that row's lock only and
+    re-check the capacity predicate after the lock is released. Bookings for other
+    dates or other caterers never contend.
+    """
+    DEFAULT_MAX_EVENTS = 1
+
+    def get_capacity(self, db: Session, caterer_id: int):
+        row = db.query(
+            models.CatererProfile.max_events_per_day,
+            models.CatererProfile.max_pax_per_day
+        ).filter(models.CatererProfile.id == caterer_id).first()
+        if row is None:
+            return None
+        # 0 is a real limit (caterer closed to new events), only NULL means unset
+        return (self.DEFAULT_MAX_EVENTS if row[0] is None else row[0], row[1])
+
+    def _limit(self):
+        return func.coalesce(models.CatererProfile.max_events_per_day, self.DEFAULT_MAX_EVENTS)
+
+    def full_clause(self, caterer_id_column, target_date: date):
+        """
+        EXISTS clause matching caterers whose day slot is used up on target_date - the
+        same limit reserve() enforces, so pending and unpaid bookings holding a slot count.
+        Correlated against CatererProfile for max_events_per_day.
+        """
+        slot = models.CatererDaySlot
+        return exists().where(and_(
+            slot.caterer_id == caterer_id_column,
+            slot.date == target_date,
+            slot.events_reserved >= self._limit()
+        ))
+
+    def full_days(self, caterer_id: int, start: date, end: date):
+        """SELECT of the dates in start..end (inclusive) on which the caterer has no event slot left."""
+        slot = models.CatererDaySlot
+        return select(slot.date.label("day")).join(
+            models.CatererProfile, models.CatererProfile.id == slot.caterer_id
+        ).where(
+            slot.caterer_id == caterer_id,
+            slot.date.between(start, end),
+            slot.events_reserved >= self._limit()
+        )
+
+    def _ensure_row(self, db: Session, caterer_id: int, event_date: date):
+        db.execute(
+            insert(models.CatererDaySlot)
+            .values(caterer_id=caterer_id, date=event_date, events_reserved=0, pax_reserved=0)
+            .on_conflict_do_nothing(constraint="uq_caterer_day_slot")
+        )
+
+    def reserve(self, db: Session, caterer_id: int, event_date: date, guest_count: int) -> bool:
+        """
+        Takes one event slot (and guest_count pax) on event_date if capacity allows.
+        Returns False when the day is full. Caller commits together with the booking row.
+        """
+        capacity = self.get_capacity(db, caterer_id)
+        if capacity is None:
+            return False
+        max_events, max_pax = capacity
+        pax = guest_count or 0
+        if max_pax and pax > max_pax:
+            return False
+
+        self._ensure_row(db, caterer_id, event_date)
+
+        slot = models.CatererDaySlot
+        conditions = [
+            slot.caterer_id == caterer_id,
+            slot.date == event_date,
+            slot.events_reserved + 1 <= max_events
+        ]
+        if max_pax:
+            conditions.append(slot.pax_reserved + pax <= max_pax)
+
+        result = db.execute(
+            update(slot)
+            .where(*conditions)
+            .values(events_reserved=slot.events_reserved + 1, pax_reserved=slot.pax_reserved + pax)
+            .returning(slot.id)
+        ).first()
+        return result is not None
+
+    def hold(self, db: Session, booking_id: int, statuses: Tuple[str, ...] = ("draft",)) -> bool:
+        """
+        Takes the slot for a booking that is leaving one of `statuses` (drafts hold nothing,
+        so an abandoned wizard never blocks a date). The slot_reserved flag is set with a
+        conditional UPDATE first, so a booking that already holds its slot is left alone.
+        Returns False only when the day is full; the caller then rolls back, which also
+        undoes the flag.
+        """
+        claimed = db.execute(
+            update(models.Booking)
+            .where(
+                models.Booking.id == booking_id,
+                models.Booking.status.in_(statuses),
+                or_(models.Booking.slot_reserved == False, models.Booking.slot_reserved == None)
+            )
+            .values(slot_reserved=True)
+            .returning(models.Booking.caterer_id, models.Booking.event_date, models.Booking.guest_count)
+        ).first()
+        if claimed is None:
+            return True
+        caterer_id, event_date, guest_count = claimed
+        return self.reserve(db, caterer_id, event_date, guest_count)
+
+    def resize(self, db: Session, booking: models.Booking, new_guest_count: int) -> bool:
+        """Adjusts the pax held by a booking's reservation; returns False if the day lacks room."""
+        if not booking.slot_reserved:
+            return True
+        delta = (new_guest_count or 0) - (booking.guest_count or 0)
+        if delta == 0:
+            return True
+
+        capacity = self.get_capacity(db, booking.caterer_id)
+        max_pax = capacity[1] if capacity else None
+
+        slot = models.CatererDaySlot
+        conditions = [slot.caterer_id == booking.caterer_id, slot.date == booking.event_date]
+        if max_pax and delta > 0:
+            conditions.append(slot.pax_reserved + delta <= max_pax)
+
+        result = db.execute(
+            update(slot)
+            .where(*conditions)
+            .values(pax_reserved=slot.pax_reserved + delta)
+            .returning(slot.id)
+        ).first()
+        return result is not None
+
+    def release(self, db: Session, booking_id: int) -> bool:
+        """
+        Returns a booking's slot to the pool. The slot_reserved flag is cleared with a
+        conditional UPDATE first, so releasing the same booking twice is a no-op.
+        """
+        held = db.execute(
+            update(models.Booking)
+            .where(models.Booking.id == booking_id, models.Booking.slot_reserved == True)
+            .values(slot_reserved=False)
+            .returning(models.Booking.caterer_id, models.Booking.event_date, models.Booking.guest_count)
+        ).first()
+        if held is None:
+            return False
+
+        caterer_id, event_date, guest_count = held
+        slot = models.CatererDaySlot
+        db.execute(
+            update(slot)
+            .where(slot.caterer_id == caterer_id, slot.date == event_date, slot.events_reserved > 0)
+            .values(
+                events_reserved=slot.events_reserved - 1,
+                pax_reserved=func.greatest(slot.pax_reserved - (guest_count or 0), 0)
+            )
+        )
+        return True
+
+    def release_many(self, db: Session, booking_ids: List[int]) -> int:
+        """Set-based release for batch jobs: one flag update, then one decrement per affected day."""
+        if not booking_ids:
+            return 0
+        held = db.execute(
+            update(models.Booking)
+            .where(models.Booking.id.in_(booking_ids), models.Booking.slot_reserved == True)
+            .values(slot_reserved=False)
+            .returning(models.Booking.caterer_id, models.Booking.event_date, models.Booking.guest_count)
+            .execution_options(synchronize_session=False)
+        ).all()
+
+        per_day: Dict[Tuple[int, date], List[int]] = defaultdict(lambda: [0, 0])
+        for caterer_id, event_date, guest_count in held:
+            per_day[(caterer_id, event_date)][0] += 1
+            per_day[(caterer_id, event_date)][1] += guest_count or 0
+
+        slot = models.CatererDaySlot
+        for (caterer_id, event_date), (events, pax) in per_day.items():
+            db.execute(
+                update(slot)
+                .where(slot.caterer_id == caterer_id, slot.date == event_date)
+                .values(
+                    events_reserved=func.greatest(slot.events_reserved - events, 0),
+                    pax_reserved=func.greatest(slot.pax_reserved - pax, 0)
+                )
+            )
+        return len(held)
+
+slot_service = SlotReservationService()
@@ -0,0 +1,622 @@
+from fastapi import HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from urllib.parse import quote, unquote, urlsplit
+from xml.etree import ElementTree
+import asyncio
+import hashlib
+import hmac
+import mimetypes
+import os
+import re
+import time
+import uuid
+import httpx
+from ..core.config import settings
+
+class StorageError(Exception):
+    """Raised when the backend is unreachable or rejects a request."""
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+@dataclass
+class ObjectInfo:
+    key: str
+    size: int
+    modified: float # unix timestamp
+    etag: Optional[str] = None
+    content_type: Optional[str] = None
+
+Source = Union[bytes, BinaryIO, Iterable[bytes]]
+
+class StorageBackend(ABC):
+    """
+    Object storage for uploaded files, addressed by slash-separated keys
+    ("blobs/ab/ab12..._640w.webp", "kyc/user_3_id_....enc").
+
+    Methods are blocking, like the file calls they replace; async routes call them through
+    asyncio.to_thread. Reads are streamed as chunk iterators (with optional byte ranges)
+    so a response can be sent without holding the whole object in memory.
+    """
+    CHUNK_SIZE = 64 * 1024
+
+    @staticmethod
+    def check_key(key: str) -> str:
+        parts = key.split("/")
+        if not key or key.startswith("/") or "\\" in key or any(part in ("", ".", "..") for part in parts):
+            raise ValueError(f"Invalid storage key: {key!r}")
+        return key
+
+    @classmethod
+    def _chunks(cls, source: Source) -> Iterator[bytes]:
+        if isinstance(source, (bytes, bytearray)):
+            yield bytes(source)
+        elif hasattr(source, "read"):
+            for chunk in iter(lambda: source.read(cls.CHUNK_SIZE), b""):
+                yield chunk
+        else:
+            for chunk in source:
+                if chunk:
+                    yield chunk
+
+    # --- Driver interface ---
+
+    @abstractmethod
+    def put(self, key: str, source: Source, content_type: Optional[str] = None) -> ObjectInfo:
+        """Stores bytes, a binary file object or an iterable of chunks; replaces any existing object."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def stat(self, key: str) -> Optional[ObjectInfo]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def open_range(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Chunks of bytes start..end (inclusive, as in a Range header). Raises FileNotFoundError."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def touch(self, key: str) -> bool:
+        """Refreshes the modification time (garbage collection grace). False if missing."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def list(self, prefix: str = "") -> Iterator[ObjectInfo]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def public_url(self, key: str) -> str:
+        """Stable URL for a publicly readable object, safe to store in the database."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def presigned_url(self, key: str, expires: int = settings.STORAGE_PRESIGN_SECONDS) -> str:
+        """Short-lived GET URL that works without a session, e.g. for a redirect."""
+        raise NotImplementedError
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Filesystem path of the object when the driver keeps it on local disk, else None."""
+        return None
+
+    def close(self):
+        pass
+
+    # --- Shared helpers ---
+
+    def put_file(self, key: str, path: str, content_type: Optional[str] = None, move: bool = False) -> ObjectInfo:
+        with open(path, "rb") as f:
+            info = self.put(key, f, content_type)
+        if move:
+            os.remove(path)
+        return info
+
+    def exists(self, key: str) -> bool:
+        return self.stat(key) is not None
+
+    def read_bytes(self, key: str) -> bytes:
+        return b"".join(self.open_range(key))
+
+    def download(self, key: str, path: str) -> bool:
+        """Copies the object to a local file atomically. False if it does not exist."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                for chunk in self.open_range(key):
+                    f.write(chunk)
+            os.replace(tmp_path, path)
+        except FileNotFoundError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return True
+
+    def key_for_url(self, url: Optional[str]) -> Optional[str]:
+        """Inverse of public_url (and of the /files route) for URLs this store handed out."""
+        for prefix in self._url_prefixes():
+            if url and url.startswith(prefix):
+                key = unquote(url[len(prefix):].split("?", 1)[0])
+                try:
+                    return self.check_key(key)
+                except ValueError:
+                    return None
+        return None
+
+    def _url_prefixes(self) -> List[str]:
+        return []
+
+class LocalStorage(StorageBackend):
+    """
+    Keeps objects as files under `root`. Writes go to a temp file in the target directory
+    and are renamed into place, so readers never see a partial object. With `base_url`
+    set (the public uploads root mounted under /static) public URLs point straight at
+    the static mount. Presigned URLs go through the /files (public) or /signed (private)
+    route, signed with SECRET_KEY.
+    """
+    def __init__(self, root: str, base_url: Optional[str] = None, files_url: str = "/files/"):
+        self.root = root
+        self.base_url = base_url
+        self.files_url = files_url
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *self.check_key(key).split("/"))
+
+    def local_path(self, key: str) -> Optional[str]:
+        return self._path(key)
+
+    def put(self, key: str, source: Source, content_type: Optional[str] = None) -> ObjectInfo:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                for chunk in self._chunks(source):
+                    f.write(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return self.stat(key)
+
+    def put_file(self, key: str, path: str, content_type: Optional[str] = None, move: bool = False) -> ObjectInfo:
+        if not move:
+            return super().put_file(key, path, content_type)
+        target = self._path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            os.replace(path, target)
+        except OSError:
+            # Different filesystem: copy, then drop the source
+            return super().put_file(key, path, content_type, move=True)
+        return self.stat(key)
+
+    def stat(self, key: str) -> Optional[ObjectInfo]:
+        try:
+            st = os.stat(self._path(key))
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        return ObjectInfo(key=key, size=st.st_size, modified=st.st_mtime, etag=f"{st.st_mtime_ns:x}-{st.st_size:x}")
+
+    def open_range(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        f = open(self._path(key), "rb")
+
+        def chunks() -> Iterator[bytes]:
+            with f:
+                f.seek(start)
+                remaining = None if end is None else end - start + 1
+                while remaining is None or remaining > 0:
+                    chunk = f.read(self.CHUNK_SIZE if remaining is None else min(self.CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    if remaining is not None:
+                        remaining -= len(chunk)
+                    yield chunk
+        # Opened eagerly so a missing object raises here rather than mid-response
+        return chunks()
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def touch(self, key: str) -> bool:
+        try:
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def list(self, prefix: str = "") -> Iterator[ObjectInfo]:
+        directory = os.path.join(self.root, *[part for part in prefix.split("/")[:-1] if part])
+        for dirpath, _, filenames in os.walk(directory):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                key = os.path.relpath(path, self.root).replace(os.sep, "/")
+                if not key.startswith(prefix):
+                    continue
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield ObjectInfo(key=key, size=st.st_size, modified=st.st_mtime)
+
+    def public_url(self, key: str) -> str:
+        if self.base_url is None:
+            raise ValueError("This store is private; use presigned_url")
+        return self.base_url + quote(self.check_key(key))
+
+    def sign(self, key: str, expires_at: int) -> str:
+        message = f"{key}:{expires_at}".encode()
+        return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+    def verify(self, key: str, expires_at: int, signature: str) -> bool:
+        return expires_at >= time.time() and hmac.compare_digest(self.sign(key, expires_at), signature)
+
+    def presigned_url(self, key: str, expires: int = settings.STORAGE_PRESIGN_SECONDS) -> str:
+        expires_at = int(time.time()) + expires
+        return f"{self.files_url}{quote(self.check_key(key))}?expires={expires_at}&signature={self.sign(key, expires_at)}"
+
+    def _url_prefixes(self) -> List[str]:
+        return [p for p in (self.base_url, self.files_url) if p]
+
+class S3Storage(StorageBackend):
+    """
+    S3-compatible driver (AWS S3, MinIO, R2, ...) over httpx, with AWS Signature V4 done
+    here so no SDK is needed. Objects live under `prefix` in `bucket`. Uploads stream
+    with bounded memory: anything larger than one part goes up as a multipart upload.
+    Range reads pass the Range header through. Run scripts/debug/stub_s3.py for a local
+    stand-in.
+    """
+    PART_SIZE = 8 * 1024 * 1024 # S3 requires at least 5MB for every part but the last
+    UNSIGNED = "UNSIGNED-PAYLOAD"
+    EMPTY_SHA256 = hashlib.sha256(b"").hexdigest()
+    _NS = "{http://s3.amazonaws.com/doc/2006-03-01/}"
+
+    def __init__(
+        self,
+        endpoint_url: str,
+        bucket: str,
+        access_key: str,
+        secret_key: str,
+        region: str = "us-east-1",
+        prefix: str = "",
+        public_url: str = "",
+        virtual_host: bool = False,
+        files_url: Optional[str] = None,
+        transport: Optional[httpx.BaseTransport] = None
+    ):
+        self.endpoint = urlsplit(endpoint_url.rstrip("/"))
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.prefix = prefix
+        self.public_base = public_url.rstrip("/") + "/" if public_url else ""
+        self.virtual_host = virtual_host
+        self.files_url = files_url
+        self.transport = transport
+        self._client: Optional[httpx.Client] = None
+
+    @property
+    def client(self) -> httpx.Client:
+        # Shared across worker threads; httpx.Client pools and reuses connections
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.Client(
+                timeout=httpx.Timeout(30.0, connect=5.0),
+                limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+                transport=self.transport
+            )
+        return self._client
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    # --- Signature V4 ---
+
+    def _host(self) -> str:
+        return f"{self.bucket}.{self.endpoint.netloc}" if self.virtual_host else self.endpoint.netloc
+
+    def _path(self, key: Optional[str]) -> str:
+        path = "" if self.virtual_host else f"/{self.bucket}"
+        if key is None:
+            return path or "/"
+        return f"{path}/{quote(self.prefix + self.check_key(key), safe='/~')}"
+
+    @staticmethod
+    def _query(params: Dict[str, str]) -> str:
+        return "&".join(f"{quote(k, safe='~')}={quote(str(v), safe='~')}" for k, v in sorted(params.items()))
+
+    def _signature(self, amz_date: str, method: str, path: str, query: str, headers: Dict[str, str], payload_hash: str) -> Tuple[str, str, str]:
+        """Returns (credential scope, signed header names, signature)."""
+        names = sorted(name.lower() for name in headers)
+        lowered = {name.lower(): " ".join(str(value).split()) for name, value in headers.items()}
+        canonical = "\n".join([
+            method, path, query,
+            "".join(f"{name}:{lowered[name]}\n" for name in names),
+            ";".join(names),
+            payload_hash
+        ])
+        scope = f"{amz_date[:8]}/{self.region}/s3/aws4_request"
+        string_to_sign = "\n".join(["AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical.encode()).hexdigest()])
+        key = f"AWS4{self.secret_key}".encode()
+        for part in (amz_date[:8], self.region, "s3", "aws4_request"):
+            key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+        return scope, ";".join(names), hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+
+    def _url(self, path: str, query: str) -> str:
+        return f"{self.endpoint.scheme}://{self._host()}{path}" + (f"?{query}" if query else "")
+
+    def _request(
+        self,
+        method: str,
+        key: Optional[str],
+        params: Optional[Dict[str, str]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        content: Optional[bytes] = None,
+        stream: bool = False,
+        ok: Tuple[int, ...] = (200,)
+    ) -> httpx.Response:
+        amz_date = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        payload_hash = hashlib.sha256(content).hexdigest() if content is not None else self.EMPTY_SHA256
+        path, query = self._path(key), self._query(params or {})
+        signed = {"host": self._host(), "x-amz-date": amz_date, "x-amz-content-sha256": payload_hash}
+        signed.update({k.lower(): v for k, v in (headers or {}).items() if k.lower().startswith("x-amz-")})
+        scope, names, signature = self._signature(amz_date, method, path, query, signed, payload_hash)
+        request_headers = {**(headers or {}), **signed}
+        request_headers["Authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, SignedHeaders={names}, Signature={signature}"
+        )
+        try:
+            request = self.client.build_request(method, self._url(path, query), headers=request_headers, content=content)
+            response = self.client.send(request, stream=stream)
+        except httpx.HTTPError as e:
+            raise StorageError(f"Storage request failed: {e}") from e
+        if response.status_code not in ok:
+            body = response.read()[:500] if stream else response.content[:500]
+            response.close()
+            if response.status_code == 404:
+                raise FileNotFoundError(key)
+            raise StorageError(f"Storage {method} {key or ''} -> {response.status_code}: {body!r}", response.status_code)
+        return response
+
+    def _xml(self, response: httpx.Response) -> Tuple[ElementTree.Element, str]:
+        root = ElementTree.fromstring(response.content)
+        # Some S3-compatible servers omit the namespace
+        return root, self._NS if root.tag.startswith(self._NS) else ""
+
+    # --- Driver ---
+
+    def _put_object(self, key: str, data: bytes, content_type: Optional[str]):
+        headers = {"Content-Type": content_type} if content_type else {}
+        self._request("PUT", key, headers=headers, content=data)
+
+    def put(self, key: str, source: Source, content_type: Optional[str] = None) -> ObjectInfo:
+        # Served straight from the bucket, so the stored type is what browsers get
+        content_type = content_type or mimetypes.guess_type(key)[0]
+        buffer = bytearray()
+        upload_id = None
+        parts: List[Tuple[int, str]] = []
+        try:
+            for chunk in self._chunks(source):
+                buffer += chunk
+                if len(buffer) < self.PART_SIZE:
+                    continue
+                if upload_id is None:
+                    headers = {"Content-Type": content_type} if content_type else {}
+                    root, ns = self._xml(self._request("POST", key, params={"uploads": ""}, headers=headers, content=b""))
+                    upload_id = root.findtext(f"{ns}UploadId")
+                part, buffer = bytes(buffer[:self.PART_SIZE]), buffer[self.PART_SIZE:]
+                parts.append(self._upload_part(key, upload_id, len(parts) + 1, part))
+
+            if upload_id is None:
+                self._put_object(key, bytes(buffer), content_type)
+            else:
+                if buffer or not parts:
+                    parts.append(self._upload_part(key, upload_id, len(parts) + 1, bytes(buffer)))
+                body = "<CompleteMultipartUpload>" + "".join(
+                    f"<Part><PartNumber>{number}</PartNumber><ETag>{etag}</ETag></Part>" for number, etag in parts
+                ) + "</CompleteMultipartUpload>"
+                self._request("POST", key, params={"uploadId": upload_id}, content=body.encode())
+        except BaseException:
+            if upload_id is not None:
+                try:
+                    self._request("DELETE", key, params={"uploadId": upload_id}, ok=(200, 204, 404))
+                except (StorageError, FileNotFoundError):
+                    pass
+            raise
+        return self.stat(key)
+
+    def _upload_part(self, key: str, upload_id: str, number: int, data: bytes) -> Tuple[int, str]:
+        response = self._request("PUT", key, params={"partNumber": str(number), "uploadId": upload_id}, content=data)
+        return number, response.headers.get("etag", "")
+
+    def _info(self, key: str, headers: httpx.Headers) -> ObjectInfo:
+        modified = headers.get("last-modified")
+        return ObjectInfo(
+            key=key,
+            size=int(headers.get("content-length") or 0),
+            modified=parsedate_to_datetime(modified).timestamp() if modified else time.time(),
+            etag=(headers.get("etag") or "").strip('"') or None,
+            content_type=headers.get("content-type")
+        )
+
+    def stat(self, key: str) -> Optional[ObjectInfo]:
+        try:
+            response = self._request("HEAD", key)
+        except FileNotFoundError:
+            return None
+        return self._info(key, response.headers)
+
+    def open_range(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        headers = {}
+        if start or end is not None:
+            headers["Range"] = f"bytes={start}-{'' if end is None else end}"
+        response = self._request("GET", key, headers=headers, stream=True, ok=(200, 206))
+
+        def chunks() -> Iterator[bytes]:
+            try:
+                yield from response.iter_bytes(self.CHUNK_SIZE)
+            finally:
+                response.close()
+        return chunks()
+
+    def delete(self, key: str):
+        try:
+            self._request("DELETE", key, ok=(200, 204))
+        except FileNotFoundError:
+            pass
+
+    # Stored with the object and dropped by a REPLACE copy unless sent again
+    _KEPT_HEADERS = ("content-type", "cache-control", "content-disposition", "content-encoding", "content-language", "expires")
+
+    def touch(self, key: str) -> bool:
+        # Copying an object onto itself is how S3 bumps LastModified. S3 only allows that
+        # with REPLACE, which resets the metadata, so the current headers are sent back.
+        try:
+            current = self._request("HEAD", key).headers
+        except FileNotFoundError:
+            return False
+        headers = {name: current[name] for name in self._KEPT_HEADERS if name in current}
+        headers.update({name: value for name, value in current.items() if name.lower().startswith("x-amz-meta-")})
+        source = f"/{self.bucket}/{quote(self.prefix + self.check_key(key), safe='/~')}"
+        headers.update({"x-amz-copy-source": source, "x-amz-metadata-directive": "REPLACE"})
+        try:
+            self._request("PUT", key, headers=headers, content=b"")
+        except FileNotFoundError:
+            return False
+        return True
+
+    def list(self, prefix: str = "") -> Iterator[ObjectInfo]:
+        params = {"list-type": "2", "prefix": self.prefix + prefix}
+        while True:
+            root, ns = self._xml(self._request("GET", None, params=params))
+            for item in root.iter(f"{ns}Contents"):
+                modified = datetime.fromisoformat(item.findtext(f"{ns}LastModified").replace("Z", "+00:00"))
+                yield ObjectInfo(
+                    key=item.findtext(f"{ns}Key")[len(self.prefix):],
+                    size=int(item.findtext(f"{ns}Size") or 0),
+                    modified=modified.timestamp(),
+                    etag=(item.findtext(f"{ns}ETag") or "").strip('"') or None
+                )
+            token = root.findtext(f"{ns}NextContinuationToken")
+            if root.findtext(f"{ns}IsTruncated") != "true" or not token:
+                return
+            params["continuation-token"] = token
+
+    def presigned_url(self, key: str, expires: int = settings.STORAGE_PRESIGN_SECONDS) -> str:
+        amz_date = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        path = self._path(key)
+        params = {
+            "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+            "X-Amz-Credential": f"{self.access_key}/{amz_date[:8]}/{self.region}/s3/aws4_request",
+            "X-Amz-Date": amz_date,
+            "X-Amz-Expires": str(min(expires, 7 * 24 * 3600)),
+            "X-Amz-SignedHeaders": "host"
+        }
+        query = self._query(params)
+        _, _, signature = self._signature(amz_date, "GET", path, query, {"host": self._host()}, self.UNSIGNED)
+        return self._url(path, f"{query}&X-Amz-Signature={signature}")
+
+    def public_url(self, key: str) -> str:
+        if self.public_base:
+            return self.public_base + quote(self.check_key(key), safe="/~")
+        if self.files_url:
+            # Bucket not publicly readable: the /files route redirects to a presigned URL
+            return self.files_url + quote(self.check_key(key), safe="/~")
+        raise ValueError("This store is private; use presigned_url")
+
+    def _url_prefixes(self) -> List[str]:
+        return [p for p in (self.public_base, self.files_url) if p]
+
+_RANGE_RE = re.compile(r"^bytes=(?P<start>\d*)-(?P<end>\d*)$")
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    (start, end) inclusive for a single-range Range header, None to send the whole
+    object. Raises ValueError when the range cannot be satisfied.
+    """
+    match = _RANGE_RE.match((header or "").strip())
+    if not match or not (match.group("start") or match.group("end")):
+        # Absent, malformed or multi-range: a full 200 is always a valid answer
+        return None
+    if match.group("start"):
+        start = int(match.group("start"))
+        end = min(int(match.group("end")), size - 1) if match.group("end") else size - 1
+    else:
+        start, end = max(0, size - int(match.group("end"))), size - 1
+    if start > end or start >= size:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+async def object_response(store: StorageBackend, key: str, request: Request, headers: Optional[Dict[str, str]] = None) -> Response:
+    """Streams an object with ETag revalidation and single byte-range support (for video and PDF viewers)."""
+    info = await asyncio.to_thread(store.stat, key)
+    if info is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    headers = {"Accept-Ranges": "bytes", **(headers or {})}
+    if info.etag:
+        headers["ETag"] = f'"{info.etag}"'
+        if headers["ETag"] in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers=headers)
+
+    media_type = info.content_type or mimetypes.guess_type(key)[0] or "application/octet-stream"
+    try:
+        byte_range = parse_range(request.headers.get("range"), info.size)
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{info.size}"})
+    if byte_range and request.headers.get("if-range") not in (None, headers.get("ETag")):
+        byte_range = None # changed since the client's partial copy
+
+    start, end = byte_range or (0, info.size - 1)
+    try:
+        chunks = await asyncio.to_thread(store.open_range, key, *(byte_range or ()))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
+    headers["Content-Length"] = str(end - start + 1)
+    if byte_range is None:
+        return StreamingResponse(chunks, media_type=media_type, headers=headers)
+    headers["Content-Range"] = f"bytes {start}-{end}/{info.size}"
+    return StreamingResponse(chunks, status_code=206, media_type=media_type, headers=headers)
+
+def _build(prefix: str, local_root: str, base_url: Optional[str], files_url: Optional[str]) -> StorageBackend:
+    if settings.STORAGE_BACKEND == "s3":
+        return S3Storage(
+            settings.S3_ENDPOINT_URL,
+            settings.S3_BUCKET,
+            settings.S3_ACCESS_KEY,
+            settings.S3_SECRET_KEY,
+            region=settings.S3_REGION,
+            prefix=prefix,
+            public_url=settings.S3_PUBLIC_URL if base_url else "",
+            virtual_host=settings.S3_VIRTUAL_HOST,
+            files_url=files_url
+        )
+    if settings.STORAGE_BACKEND != "local":
+        raise ValueError(f"Unknown STORAGE_BACKEND {settings.STORAGE_BACKEND!r} (expected 'local' or 's3')")
+    # Private local objects get presigned URLs on the /signed route instead
+    return LocalStorage(local_root, base_url=base_url, files_url=files_url or "/signed/")
+
+# Public uploads (images, caterer documents). Locally these are the files behind the
+# /static/uploads mount; on S3 only the uploads/ prefix should be publicly readable.
+upload_storage = _build("uploads/", "app/static/uploads", "/static/uploads/", "/files/")
+# Never public: read through auth-checked routes or short-lived presigned URLs only
+private_storage = _build("private/", settings.PRIVATE_STORAGE_DIR, None, None)
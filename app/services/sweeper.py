@@ -0,0 +1,172 @@
+from sqlalchemy import and_, or_, exists, func, delete, update
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, List
+import asyncio
+from ..db import models, database
+from ..core.config import settings
+from .booking_state import booking_state
+from .contracts import contract_renderer
+from .idempotency import idempotency_service
+
+class BookingSweeper:
+    """
+    Expires abandoned drafts and unpaid pending bookings, then purges long-expired
+    unpaid rows together with their dependent records and rendered contract PDFs. Audit
+    records (payment events, fraud flags, verification results) are kept and only
+    detached from the booking.
+
+    Work is done in batches of ids claimed with FOR UPDATE SKIP LOCKED, so several
+    app workers (or the cron script) can sweep concurrently without double-processing,
+    and each batch is expired with one set-based state transition in its own transaction.
+    """
+    EXPIRABLE_STATUSES = list(booking_state.TRANSITIONS["expire"].from_statuses)
+    PAID_STATUSES = ["paid", "deposit_paid"]
+
+    # Drafts that never reached the quotation step have no expires_at
+    DRAFT_TTL = timedelta(hours=24)
+    # A checkout link stays payable this long after it was issued, even past expires_at
+    PAYMENT_LINK_TTL = timedelta(hours=settings.PAYMENT_LINK_TTL_HOURS)
+    # How long expired, unpaid bookings are kept before being purged
+    PURGE_AFTER = timedelta(days=30)
+
+    # Tables holding a booking_id that must go before the booking itself
+    DEPENDENT_TABLES = [
+        models.BookingMenuItem,
+        models.BookingHistory,
+        models.Quotation,
+        models.IdempotencyKey,
+    ]
+    # Audit records outlive the booking; their booking_id is cleared instead
+    DETACHED_TABLES = [
+        models.PaymentEvent,
+        models.FraudFlag,
+        models.VerificationAttempt,
+        models.OCRVerification,
+    ]
+
+    def _unpaid(self):
+        return or_(
+            models.Booking.payment_status == None,
+            models.Booking.payment_status.notin_(self.PAID_STATUSES)
+        )
+
+    def _payment_pending(self, now: datetime):
+        """Bookings a payment may still arrive for: a recent checkout link or an unapplied webhook event."""
+        booking_id = models.Booking.id
+        link_issued = exists().where(and_(
+            models.BookingHistory.booking_id == booking_id,
+            models.BookingHistory.status == "pending_payment",
+            models.BookingHistory.created_at >= now - self.PAYMENT_LINK_TTL
+        ))
+        event_waiting = exists().where(and_(
+            models.PaymentEvent.booking_id == booking_id,
+            models.PaymentEvent.status == "received"
+        ))
+        return or_(and_(models.Booking.status == "pending_payment", link_issued), event_waiting)
+
+    def _claim(self, db: Session, criteria, batch_size: int) -> List[int]:
+        rows = db.query(models.Booking.id).filter(*criteria)\
+            .order_by(models.Booking.id)\
+            .limit(batch_size)\
+            .with_for_update(skip_locked=True)\
+            .all()
+        return [r[0] for r in rows]
+
+    def expire_batch(self, db: Session, now: datetime, batch_size: int) -> int:
+        criteria = [
+            models.Booking.status.in_(self.EXPIRABLE_STATUSES),
+            self._unpaid(),
+            or_(
+                models.Booking.expires_at < now,
+                and_(
+                    models.Booking.expires_at == None,
+                    models.Booking.status == "draft",
+                    models.Booking.created_at < now - self.DRAFT_TTL
+                )
+            ),
+            ~self._payment_pending(now)
+        ]
+        ids = self._claim(db, criteria, batch_size)
+        if not ids:
+            return 0
+
+        # Drafts without a deadline get one now, so the purge pass can age them out
+        expired = booking_state.transition_many(
+            db, ids, "expire", "Expired by booking sweeper (unpaid past deadline)",
+            expires_at=func.coalesce(models.Booking.expires_at, now)
+        )
+        db.commit()
+        return len(expired)
+
+    def purge_batch(self, db: Session, now: datetime, batch_size: int) -> int:
+        criteria = [
+            models.Booking.status == "expired",
+            self._unpaid(),
+            models.Booking.expires_at < now - self.PURGE_AFTER
+        ]
+        ids = self._claim(db, criteria, batch_size)
+        if not ids:
+            return 0
+
+        for table in self.DETACHED_TABLES:
+            db.execute(
+                update(table).where(table.booking_id.in_(ids)).values(booking_id=None)
+                .execution_options(synchronize_session=False)
+            )
+        for table in self.DEPENDENT_TABLES:
+            db.execute(
+                delete(table).where(table.booking_id.in_(ids)).execution_options(synchronize_session=False)
+            )
+        db.execute(
+            delete(models.Booking).where(models.Booking.id.in_(ids)).execution_options(synchronize_session=False)
+        )
+        db.commit()
+        # Only once the rows are gone; a failed batch keeps its contracts
+        contract_renderer.remove(ids)
+        return len(ids)
+
+    def sweep(self, db: Session, batch_size: int = 500, max_batches: int = 100, now: Optional[datetime] = None) -> Dict[str, int]:
+        """Runs expire and purge passes until no work is left (or max_batches) and reports what was reclaimed."""
+        now = now or datetime.now(timezone.utc)
+        report = {"expired": 0, "purged": 0, "batches": 0, "idempotency_keys": 0}
+
+        for _ in range(max_batches):
+            count = self.expire_batch(db, now, batch_size)
+            if not count:
+                break
+            report["expired"] += count
+            report["batches"] += 1
+
+        for _ in range(max_batches):
+            count = self.purge_batch(db, now, batch_size)
+            if not count:
+                break
+            report["purged"] += count
+            report["batches"] += 1
+
+        report["idempotency_keys"] = idempotency_service.purge_expired(db, now)
+        return report
+
+    async def run_forever(self, interval_seconds: int):
+        """Periodic loop started with the app; each sweep runs in a worker thread with its own session."""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                report = await asyncio.to_thread(self._sweep_once)
+                if report["expired"] or report["purged"]:
+                    print(f"[BOOKING SWEEPER] Expired {report['expired']}, purged {report['purged']}")
+            except Exception as e:
+                print(f"[BOOKING SWEEPER ERROR] {e}")
+
+    def _sweep_once(self) -> Dict[str, int]:
+        db = database.SessionLocal()
+        try:
+            return self.sweep(db)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+booking_sweeper = BookingSweeper()
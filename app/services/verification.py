@@ -7,7 +7,8 @@ import numpy as np
 import cv2
 import pytesseract
 from typing import List, Dict, Any
-from ..core.encryption import decrypt_data
+from .kyc_documents import kyc_documents
+from .document_hashes import document_hash_index
 from PIL import Image
 import traceback
 
@@ -46,18 +47,8 @@ class VerificationService:
 
     def _prepare_image(self, encrypted_path: str) -> np.ndarray:
         """Decrypts a file and converts it to an OpenCV BGR image."""
-        # Convert virtual API path back to real file system path if needed
         # id_path in db is like "/api/bookings/kyc/view/filename.enc"
-        filename = encrypted_path.split("/")[-1]
-        real_path = os.path.join("app/static/uploads/verification", filename)
-        
-        if not os.path.exists(real_path):
-            raise FileNotFoundError(f"KYC document not found at {real_path}")
-
-        with open(real_path, "rb") as f:
-            encrypted_data = f.read()
-        
-        decrypted_data = decrypt_data(encrypted_data)
+        decrypted_data = kyc_documents.read(encrypted_path)
         
         # Convert bytes to numpy array then to OpenCV image
         nparr = np.frombuffer(decrypted_data, np.uint8)
@@ -106,6 +97,9 @@ class VerificationService:
             
             # 2. Real OCR
             id_img = self._prepare_image(id_path)
+
+            # Perceptual hashes, for matching against IDs other accounts submitted
+            document_hashes = document_hash_index.compute(id_img)
             
             # Advanced Preprocessing for OCR
             # 1. Grayscale
@@ -197,6 +191,7 @@ class VerificationService:
                 "pattern_valid": pattern_valid,
                 "failure_reason": failure_reason,
                 "extracted_text_preview": ocr_text[:200], # For debugging
+                "document_hashes": document_hashes,
                 "ocr_data": {
                     "raw_text": ocr_text,
                     "name_match": ocr_match,
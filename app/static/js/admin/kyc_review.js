@@ -0,0 +1,22 @@
+/**
+ * Admin KYC Review - Thumbnails First
+ * Review pages load cached thumbnails; the full-resolution document is only
+ * decrypted and downloaded when the reviewer asks for it.
+ */
+
+document.addEventListener('DOMContentLoaded', () => {
+    document.querySelectorAll('img[data-full-src]').forEach(img => {
+        img.addEventListener('click', () => loadFullResolution(img));
+    });
+});
+
+/**
+ * Swaps a thumbnail for its full-resolution document (once)
+ */
+function loadFullResolution(img) {
+    if (!img || !img.dataset.fullSrc || img.classList.contains('is-full-resolution')) return;
+    img.classList.add('is-full-resolution');
+    if (img.getAttribute('src') !== img.dataset.fullSrc) {
+        img.src = img.dataset.fullSrc;
+    }
+}
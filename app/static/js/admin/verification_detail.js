@@ -94,6 +94,9 @@ function initImageControls() {
             });
         }
 
+        // Zooming needs the real pixels, not the review thumbnail
+        box.addEventListener('mouseenter', () => loadFullResolution(img));
+
         box.addEventListener('mousemove', (e) => {
             if (document.body.classList.contains('compare-terminal-active')) return;
             const rect = box.getBoundingClientRect();
@@ -134,6 +137,8 @@ function initBiometricTerminal() {
     const openTerminal = () => {
         document.body.classList.add('compare-terminal-active');
         terminal.style.display = 'flex';
+        loadFullResolution(idImg);
+        loadFullResolution(selfieImg);
         // Reset to side-by-side on open
         viewport.className = 'terminal-viewport side-by-side';
         resetTerminal();
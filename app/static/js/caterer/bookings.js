@@ -5,8 +5,64 @@ document.addEventListener('DOMContentLoaded', function () {
             showBookingDetails(this);
         });
     });
+
+    // Bulk selection
+    const selectAll = document.getElementById('bulkSelectAll');
+    if (selectAll) {
+        selectAll.addEventListener('change', function () {
+            document.querySelectorAll('.bulk-select').forEach(cb => cb.checked = this.checked);
+            updateBulkBar();
+        });
+    }
+    document.querySelectorAll('.bulk-select').forEach(cb => cb.addEventListener('change', updateBulkBar));
 });
 
+function getSelectedBookingIds() {
+    return Array.from(document.querySelectorAll('.bulk-select:checked')).map(cb => parseInt(cb.value, 10));
+}
+
+function updateBulkBar() {
+    const bar = document.getElementById('bulkActionsBar');
+    if (!bar) return;
+    const count = getSelectedBookingIds().length;
+    document.getElementById('bulkSelectedCount').innerText = count;
+    bar.classList.toggle('active', count > 0);
+}
+
+async function runBulkAction(action) {
+    const ids = getSelectedBookingIds();
+    if (!ids.length) return;
+
+    const payload = { booking_ids: ids };
+    if (action === 'reject') {
+        const reason = prompt("Enter reason for rejecting the selected bookings:");
+        if (!reason) return;
+        payload.reason = reason;
+    } else if (!confirm(`Apply "${action}" to ${ids.length} booking(s)?`)) {
+        return;
+    }
+
+    try {
+        const response = await fetch(`/caterer/api/bookings/bulk/${action}`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(payload)
+        });
+        const result = await response.json();
+        if (!response.ok) {
+            alert(result.detail || 'Bulk update failed.');
+            return;
+        }
+        if (result.skipped.length) {
+            alert(`${result.updated.length} updated, ${result.skipped.length} skipped (not in a valid status for this action).`);
+        }
+        window.location.reload();
+    } catch (error) {
+        console.error('Bulk action error:', error);
+        alert('Bulk update failed. Please try again.');
+    }
+}
+
 function showBookingDetails(btn) {
     const data = btn.dataset;
     const modal = document.getElementById('bookingDetailModal');
@@ -135,6 +191,7 @@ function closeModal() {
 window.promptCancel = promptCancel;
 window.showMenuDetails = showMenuDetails;
 window.closeModal = closeModal;
+window.runBulkAction = runBulkAction;
 
 // Close when clicking outside
 window.onclick = function (event) {
@@ -84,6 +84,10 @@ async function toggleDateAvailability(isAvailable) {
 
     const date = dateInput.value;
     const reason = reasonInput ? reasonInput.value : '';
+    const endInput = document.getElementById('blockDateEnd');
+    const endDate = endInput && endInput.value ? endInput.value : date;
+    const weekdays = Array.from(document.querySelectorAll('input[name="blockWeekday"]:checked'))
+        .map(cb => parseInt(cb.value));
 
     if (!date) {
         alert('Please select a date first.');
@@ -91,16 +95,22 @@ async function toggleDateAvailability(isAvailable) {
     }
 
     try {
-        const response = await fetch('/caterer/api/availability/toggle', {
+        // One request covers a whole range and/or recurring weekdays
+        const response = await fetch('/caterer/api/availability/bulk', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ date, is_available: isAvailable, reason })
+            body: JSON.stringify({
+                ranges: [{ start: date, end: endDate, weekdays: weekdays.length ? weekdays : null }],
+                is_available: isAvailable,
+                reason
+            })
         });
 
         if (response.ok) {
             location.reload();
         } else {
-            alert('Failed to update availability.');
+            const data = await response.json().catch(() => ({}));
+            alert(data.detail || 'Failed to update availability.');
         }
     } catch (error) {
         console.error('Error:', error);
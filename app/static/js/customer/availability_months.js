@@ -0,0 +1,28 @@
+/**
+ * Month-level availability cache shared by the package page and the booking wizard:
+ * one /packages/api/availability-range request per caterer and month viewed.
+ */
+
+const availabilityMonths = {};
+
+async function fetchMonthAvailability(catererId, date) {
+    const monthKey = date.slice(0, 7);
+    const cacheKey = `${catererId}:${monthKey}`;
+    if (!availabilityMonths[cacheKey]) {
+        const [year, month] = monthKey.split('-').map(Number);
+        const lastDay = new Date(year, month, 0).getDate();
+        const start = `${monthKey}-01`;
+        const end = `${monthKey}-${String(lastDay).padStart(2, '0')}`;
+        availabilityMonths[cacheKey] = fetch(`/packages/api/availability-range?caterer_id=${catererId}&start=${start}&end=${end}`)
+            .then(response => {
+                if (!response.ok) throw new Error('Availability lookup failed');
+                return response.json();
+            })
+            .then(data => Object.fromEntries(data.days.map(day => [day.date, day])))
+            .catch(error => {
+                delete availabilityMonths[cacheKey];
+                throw error;
+            });
+    }
+    return availabilityMonths[cacheKey];
+}
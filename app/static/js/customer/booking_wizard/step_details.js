@@ -35,10 +35,10 @@ document.addEventListener('DOMContentLoaded', function () {
         chip.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Checking...';
 
         try {
-            const response = await fetch(`/packages/api/check-availability?caterer_id=${catererId}&date_str=${date}`);
-            const data = await response.json();
+            const days = await fetchMonthAvailability(catererId, date);
+            const day = days[date];
 
-            if (data.available) {
+            if (!day || day.status === 'free') {
                 chip.style.background = '#dcfce7';
                 chip.style.color = '#166534';
                 chip.innerHTML = '<i class="fas fa-check-circle"></i> Date Available';
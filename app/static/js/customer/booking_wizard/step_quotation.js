@@ -2,7 +2,57 @@ document.addEventListener('DOMContentLoaded', function () {
     const UNIT_PRICE = parseFloat(window.unitPrice || 0);
     const BOOKING_ID = window.bookingId;
     const ADDON_TOTAL = parseFloat(window.addonTotal || 0);
+    const DP_TIERS = [30, 40, 50];
+    // Guest counts priced per request; the table is refetched only when the slider leaves it
+    const TABLE_SPAN = 1000;
     let isCalculating = false;
+    let priceTable = null;
+    let priceTableRequest = null;
+
+    function loadPriceTable(pax) {
+        const input = document.getElementById('pax-input');
+        const min = parseInt(input.min) || 1;
+        const max = parseInt(input.max) || 99999;
+        const from = Math.max(min, pax - TABLE_SPAN / 2);
+        const to = Math.min(max, from + TABLE_SPAN - 1);
+
+        priceTableRequest = fetch(`/api/bookings/${BOOKING_ID}/calculate/batch`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            credentials: 'same-origin',
+            body: JSON.stringify({
+                guest_counts: Array.from({ length: to - from + 1 }, (_, i) => from + i),
+                downpayment_percents: DP_TIERS
+            })
+        })
+            .then(res => res.ok ? res.json() : null)
+            .then(data => {
+                if (data && data.success) {
+                    priceTable = { from: from, to: to, data: data };
+                    recalculate();
+                }
+            })
+            .catch(err => console.error('Price table error:', err))
+            .finally(() => { priceTableRequest = null; });
+    }
+
+    function lookupPrices(pax, dpPercent) {
+        const dpIndex = DP_TIERS.indexOf(dpPercent);
+        if (priceTable && dpIndex !== -1 && pax >= priceTable.from && pax <= priceTable.to) {
+            const i = pax - priceTable.from;
+            return {
+                baseAmount: priceTable.data.base_amounts[i],
+                totalAmount: priceTable.data.total_amounts[i],
+                depositAmount: priceTable.data.deposit_amounts[i][dpIndex]
+            };
+        }
+        if (!priceTableRequest) loadPriceTable(pax);
+
+        // Local estimate until the server table arrives
+        const baseAmount = UNIT_PRICE * pax;
+        const totalAmount = baseAmount + ADDON_TOTAL;
+        return { baseAmount: baseAmount, totalAmount: totalAmount, depositAmount: totalAmount * (dpPercent / 100) };
+    }
 
     function formatMoney(num) {
         return '₱' + num.toLocaleString(undefined, { minimumFractionDigits: 2, maximumFractionDigits: 2 });
@@ -41,9 +91,7 @@ document.addEventListener('DOMContentLoaded', function () {
         isCalculating = true;
 
         try {
-            const baseAmount = UNIT_PRICE * pax;
-            const totalAmount = baseAmount + ADDON_TOTAL;
-            const depositAmount = totalAmount * (dpPercent / 100);
+            const { baseAmount, totalAmount, depositAmount } = lookupPrices(pax, dpPercent);
 
             // Invoice row
             const baseDisplay = document.getElementById('base-total-display');
@@ -59,18 +59,18 @@ async function checkAvailability() {
     }
 
     try {
-        const response = await fetch(`/packages/api/check-availability?caterer_id=${catererId}&date_str=${date}`);
-        const data = await response.json();
+        const days = await fetchMonthAvailability(catererId, date);
+        const day = days[date];
 
         if (msg && submitBtn) {
-            if (data.available) {
+            if (!day || day.status === 'free') {
                 msg.style.color = '#10b981';
                 msg.innerHTML = '<i class="fas fa-check-circle"></i> Date is available!';
                 submitBtn.disabled = false;
                 submitBtn.style.opacity = '1';
             } else {
                 msg.style.color = '#ef4444';
-                msg.innerHTML = `<i class="fas fa-times-circle"></i> ${data.reason || 'Not available'}`;
+                msg.innerHTML = `<i class="fas fa-times-circle"></i> ${day.reason || 'Not available'}`;
                 submitBtn.disabled = true;
                 submitBtn.style.opacity = '0.5';
             }
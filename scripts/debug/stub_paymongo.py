@@ -0,0 +1,61 @@
+"""
+Minimal local stand-in for the Paymongo links API, for exercising the payment client
+and reconciler without the real gateway:
+
+    python scripts/debug/stub_paymongo.py --port 8765 --paid link_abc,link_def
+    PAYMONGO_API_BASE=http://127.0.0.1:8765/v1 PAYMONGO_SECRET_KEY=sk_test_stub python scripts/utils/reconcile_payments.py
+"""
+import argparse
+import json
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LINKS = {}
+
+class StubHandler(BaseHTTPRequestHandler):
+    def _send(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _link(self, link_id):
+        attributes = LINKS.get(link_id)
+        if attributes is None:
+            return self._send(404, {"errors": [{"code": "resource_not_found", "detail": f"No link {link_id}"}]})
+        self._send(200, {"data": {"id": link_id, "type": "link", "attributes": attributes}})
+
+    def do_GET(self):
+        if self.path.startswith("/v1/links/"):
+            return self._link(self.path.rsplit("/", 1)[1])
+        self._send(404, {"errors": [{"code": "resource_not_found"}]})
+
+    def do_POST(self):
+        if self.path != "/v1/links":
+            return self._send(404, {"errors": [{"code": "resource_not_found"}]})
+        length = int(self.headers.get("Content-Length") or 0)
+        attributes = json.loads(self.rfile.read(length) or b"{}").get("data", {}).get("attributes", {})
+        link_id = f"link_{uuid.uuid4().hex[:24]}"
+        LINKS[link_id] = {
+            **attributes,
+            "status": "unpaid",
+            "reference_number": uuid.uuid4().hex[:7].upper(),
+            "checkout_url": f"http://{self.headers.get('Host')}/checkout/{link_id}"
+        }
+        self._link(link_id)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stub of the Paymongo links API.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--paid", default="", help="Comma-separated link ids to report as paid")
+    parser.add_argument("--unpaid", default="", help="Comma-separated link ids to report as unpaid")
+    args = parser.parse_args()
+
+    for status, ids in (("paid", args.paid), ("unpaid", args.unpaid)):
+        for link_id in filter(None, ids.split(",")):
+            LINKS[link_id] = {"status": status, "reference_number": link_id[-7:].upper()}
+
+    print(f"Stub Paymongo listening on http://127.0.0.1:{args.port}/v1")
+    ThreadingHTTPServer(("127.0.0.1", args.port), StubHandler).serve_forever()
@@ -0,0 +1,240 @@
+"""
+Minimal local stand-in for an S3-compatible bucket (path-style, in memory), for
+exercising the S3 storage driver without MinIO or AWS:
+
+    python scripts/debug/stub_s3.py --port 9000 --access-key stub --secret-key stubsecret
+    STORAGE_BACKEND=s3 S3_ENDPOINT_URL=http://127.0.0.1:9000 S3_ACCESS_KEY=stub S3_SECRET_KEY=stubsecret uvicorn app.main:app
+
+Supports PUT (plain, copy and multipart parts), HEAD, GET with Range, DELETE,
+ListObjectsV2 and multipart create/complete/abort. With --secret-key set, header and
+query-string (presigned) Signature V4 are checked.
+"""
+import argparse
+import hashlib
+import hmac
+import time
+import uuid
+from datetime import datetime, timezone
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, quote, unquote, urlsplit
+from xml.sax.saxutils import escape
+
+OBJECTS = {} # (bucket, key) -> {"data", "content_type", "modified"}
+UPLOADS = {} # upload id -> {part number: bytes}
+CONFIG = {"access_key": "", "secret_key": "", "region": "us-east-1", "page_size": 1000}
+
+def _signature(secret, amz_date, region, canonical):
+    scope = f"{amz_date[:8]}/{region}/s3/aws4_request"
+    string_to_sign = "\n".join(["AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical.encode()).hexdigest()])
+    key = f"AWS4{secret}".encode()
+    for part in (amz_date[:8], region, "s3", "aws4_request"):
+        key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+    return hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+
+def _canonical_query(pairs):
+    return "&".join(f"{quote(k, safe='~')}={quote(v, safe='~')}" for k, v in sorted(pairs))
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    # --- Plumbing ---
+
+    def _parse(self):
+        url = urlsplit(self.path)
+        self.raw_path = url.path
+        self.query_pairs = parse_qsl(url.query, keep_blank_values=True)
+        self.query = dict(self.query_pairs)
+        bucket, _, key = unquote(url.path).lstrip("/").partition("/")
+        return bucket, key
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status, body=b"", headers=None, head=False):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and not head:
+            self.wfile.write(body)
+
+    def _error(self, status, code, head=False):
+        body = f"<Error><Code>{code}</Code></Error>".encode()
+        self._send(status, body, {"Content-Type": "application/xml"}, head=head)
+
+    def _authorized(self):
+        if not CONFIG["secret_key"]:
+            return True
+        if "X-Amz-Signature" in self.query:
+            # Presigned URL: only the host header is signed, payload unsigned
+            amz_date = self.query.get("X-Amz-Date", "")
+            issued = datetime.strptime(amz_date, "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc).timestamp()
+            if time.time() > issued + int(self.query.get("X-Amz-Expires", 0)):
+                return False
+            pairs = [(k, v) for k, v in self.query_pairs if k != "X-Amz-Signature"]
+            canonical = "\n".join([
+                self.command, self.raw_path, _canonical_query(pairs),
+                f"host:{self.headers.get('Host')}\n", "host", "UNSIGNED-PAYLOAD"
+            ])
+            expected = _signature(CONFIG["secret_key"], amz_date, CONFIG["region"], canonical)
+            return hmac.compare_digest(expected, self.query["X-Amz-Signature"])
+
+        auth = self.headers.get("Authorization", "")
+        if not auth.startswith("AWS4-HMAC-SHA256 "):
+            return False
+        fields = dict(part.strip().split("=", 1) for part in auth[len("AWS4-HMAC-SHA256 "):].split(","))
+        if not fields.get("Credential", "").startswith(CONFIG["access_key"] + "/"):
+            return False
+        names = fields.get("SignedHeaders", "").split(";")
+        canonical = "\n".join([
+            self.command, self.raw_path, _canonical_query(self.query_pairs),
+            "".join(f"{name}:{' '.join((self.headers.get(name) or '').split())}\n" for name in names),
+            ";".join(names),
+            self.headers.get("x-amz-content-sha256", "")
+        ])
+        expected = _signature(CONFIG["secret_key"], self.headers.get("x-amz-date", ""), CONFIG["region"], canonical)
+        return hmac.compare_digest(expected, fields.get("Signature", ""))
+
+    def _object_headers(self, obj):
+        return {
+            "Content-Type": obj["content_type"],
+            "ETag": f'"{hashlib.md5(obj["data"]).hexdigest()}"',
+            "Last-Modified": formatdate(obj["modified"], usegmt=True),
+            "Accept-Ranges": "bytes"
+        }
+
+    # --- Verbs ---
+
+    def do_HEAD(self):
+        self.do_GET(head=True)
+
+    def do_GET(self, head=False):
+        bucket, key = self._parse()
+        if not self._authorized():
+            return self._error(403, "SignatureDoesNotMatch", head)
+        if not key:
+            return self._list(bucket)
+        obj = OBJECTS.get((bucket, key))
+        if obj is None:
+            return self._error(404, "NoSuchKey", head)
+
+        headers = self._object_headers(obj)
+        data = obj["data"]
+        byte_range = self.headers.get("Range", "")
+        if byte_range.startswith("bytes="):
+            start, _, end = byte_range[len("bytes="):].partition("-")
+            if start:
+                first, last = int(start), min(int(end), len(data) - 1) if end else len(data) - 1
+            else:
+                first, last = max(0, len(data) - int(end)), len(data) - 1
+            if first > last:
+                return self._error(416, "InvalidRange", head)
+            headers["Content-Range"] = f"bytes {first}-{last}/{len(data)}"
+            return self._send(206, data[first:last + 1], headers, head)
+        self._send(200, data, headers, head)
+
+    def _list(self, bucket):
+        prefix = self.query.get("prefix", "")
+        keys = sorted(key for b, key in OBJECTS if b == bucket and key.startswith(prefix))
+        start = int(self.query.get("continuation-token") or 0)
+        page = keys[start:start + CONFIG["page_size"]]
+        truncated = start + len(page) < len(keys)
+        items = "".join(
+            f"<Contents><Key>{escape(key)}</Key>"
+            f"<LastModified>{datetime.fromtimestamp(OBJECTS[(bucket, key)]['modified'], timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')}</LastModified>"
+            f"<ETag>\"{hashlib.md5(OBJECTS[(bucket, key)]['data']).hexdigest()}\"</ETag>"
+            f"<Size>{len(OBJECTS[(bucket, key)]['data'])}</Size></Contents>"
+            for key in page
+        )
+        token = f"<NextContinuationToken>{start + len(page)}</NextContinuationToken>" if truncated else ""
+        body = (
+            '<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+            f"<Name>{escape(bucket)}</Name><Prefix>{escape(prefix)}</Prefix><KeyCount>{len(page)}</KeyCount>"
+            f"<IsTruncated>{'true' if truncated else 'false'}</IsTruncated>{token}{items}</ListBucketResult>"
+        )
+        self._send(200, body.encode(), {"Content-Type": "application/xml"})
+
+    def do_PUT(self):
+        bucket, key = self._parse()
+        body = self._body()
+        if not self._authorized():
+            return self._error(403, "SignatureDoesNotMatch")
+
+        if "uploadId" in self.query:
+            parts = UPLOADS.get(self.query["uploadId"])
+            if parts is None:
+                return self._error(404, "NoSuchUpload")
+            parts[int(self.query["partNumber"])] = body
+            return self._send(200, headers={"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+
+        copy_source = self.headers.get("x-amz-copy-source")
+        if copy_source:
+            source_bucket, _, source_key = unquote(copy_source).lstrip("/").partition("/")
+            source = OBJECTS.get((source_bucket, source_key))
+            if source is None:
+                return self._error(404, "NoSuchKey")
+            OBJECTS[(bucket, key)] = {**source, "modified": time.time()}
+            if self.headers.get("x-amz-metadata-directive") == "REPLACE":
+                OBJECTS[(bucket, key)]["content_type"] = self.headers.get("Content-Type") or "binary/octet-stream"
+            result = f"<CopyObjectResult><LastModified>{formatdate(usegmt=True)}</LastModified></CopyObjectResult>"
+            return self._send(200, result.encode(), {"Content-Type": "application/xml"})
+
+        OBJECTS[(bucket, key)] = {
+            "data": body,
+            "content_type": self.headers.get("Content-Type") or "binary/octet-stream",
+            "modified": time.time()
+        }
+        self._send(200, headers={"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+
+    def do_POST(self):
+        bucket, key = self._parse()
+        self._body()
+        if not self._authorized():
+            return self._error(403, "SignatureDoesNotMatch")
+
+        if "uploads" in self.query:
+            upload_id = uuid.uuid4().hex
+            UPLOADS[upload_id] = {"__content_type__": self.headers.get("Content-Type") or "binary/octet-stream"}
+            body = (
+                '<InitiateMultipartUploadResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+                f"<Bucket>{escape(bucket)}</Bucket><Key>{escape(key)}</Key><UploadId>{upload_id}</UploadId>"
+                "</InitiateMultipartUploadResult>"
+            )
+            return self._send(200, body.encode(), {"Content-Type": "application/xml"})
+
+        parts = UPLOADS.pop(self.query.get("uploadId"), None)
+        if parts is None:
+            return self._error(404, "NoSuchUpload")
+        content_type = parts.pop("__content_type__")
+        OBJECTS[(bucket, key)] = {
+            "data": b"".join(parts[number] for number in sorted(parts)),
+            "content_type": content_type,
+            "modified": time.time()
+        }
+        self._send(200, b"<CompleteMultipartUploadResult/>", {"Content-Type": "application/xml"})
+
+    def do_DELETE(self):
+        bucket, key = self._parse()
+        if not self._authorized():
+            return self._error(403, "SignatureDoesNotMatch")
+        if "uploadId" in self.query:
+            UPLOADS.pop(self.query["uploadId"], None)
+        else:
+            OBJECTS.pop((bucket, key), None)
+        self._send(204)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local in-memory stub of an S3-compatible bucket.")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--access-key", default="", help="Expected access key (with --secret-key)")
+    parser.add_argument("--secret-key", default="", help="Verify Signature V4 with this secret; empty accepts anything")
+    parser.add_argument("--region", default="us-east-1")
+    parser.add_argument("--page-size", type=int, default=1000, help="ListObjectsV2 page size (lower it to test pagination)")
+    args = parser.parse_args()
+    CONFIG.update(access_key=args.access_key, secret_key=args.secret_key, region=args.region, page_size=args.page_size)
+
+    print(f"Stub S3 listening on http://127.0.0.1:{args.port} (path-style, any bucket)")
+    ThreadingHTTPServer(("127.0.0.1", args.port), StubHandler).serve_forever()
@@ -0,0 +1,29 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.db.database import SessionLocal
+from sqlalchemy import text
+
+def migrate_availability_indexes():
+    db = SessionLocal()
+    try:
+        sql_statements = [
+            "CREATE INDEX IF NOT EXISTS ix_availability_caterer_date ON availability (caterer_id, date)",
+            "CREATE INDEX IF NOT EXISTS ix_bookings_caterer_event_date ON bookings (caterer_id, event_date, status)"
+        ]
+
+        for sql in sql_statements:
+            print(f"Executing: {sql}")
+            db.execute(text(sql))
+
+        db.commit()
+        print("Availability index migration successful.")
+    except Exception as e:
+        print(f"Migration failed: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    migrate_availability_indexes()
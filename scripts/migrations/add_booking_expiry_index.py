@@ -0,0 +1,28 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.db.database import SessionLocal
+from sqlalchemy import text
+
+def migrate_booking_expiry_index():
+    db = SessionLocal()
+    try:
+        sql_statements = [
+            "CREATE INDEX IF NOT EXISTS ix_bookings_status_expires_at ON bookings (status, expires_at)"
+        ]
+
+        for sql in sql_statements:
+            print(f"Executing: {sql}")
+            db.execute(text(sql))
+
+        db.commit()
+        print("Booking expiry index migration successful.")
+    except Exception as e:
+        print(f"Migration failed: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    migrate_booking_expiry_index()
@@ -0,0 +1,91 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+from app.db.database import SessionLocal
+from app.db import models
+from sqlalchemy import text
+
+def migrate_id_document_hashes():
+    db = SessionLocal()
+    try:
+        sql_statements = [
+            """
+            CREATE TABLE IF NOT EXISTS id_document_hashes (
+                id SERIAL PRIMARY KEY,
+                user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+                document_url VARCHAR,
+                phash BIGINT NOT NULL,
+                dhash BIGINT NOT NULL,
+                phash_band_0 INTEGER NOT NULL,
+                phash_band_1 INTEGER NOT NULL,
+                phash_band_2 INTEGER NOT NULL,
+                phash_band_3 INTEGER NOT NULL,
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+            )
+            """,
+            # Tables created before the FK cascaded
+            "ALTER TABLE id_document_hashes DROP CONSTRAINT IF EXISTS id_document_hashes_user_id_fkey",
+            "ALTER TABLE id_document_hashes ADD CONSTRAINT id_document_hashes_user_id_fkey FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE",
+            "CREATE INDEX IF NOT EXISTS ix_id_document_hashes_id ON id_document_hashes (id)",
+            "CREATE INDEX IF NOT EXISTS ix_id_document_hashes_user_id ON id_document_hashes (user_id)",
+            "CREATE INDEX IF NOT EXISTS ix_id_document_hashes_band_0 ON id_document_hashes (phash_band_0)",
+            "CREATE INDEX IF NOT EXISTS ix_id_document_hashes_band_1 ON id_document_hashes (phash_band_1)",
+            "CREATE INDEX IF NOT EXISTS ix_id_document_hashes_band_2 ON id_document_hashes (phash_band_2)",
+            "CREATE INDEX IF NOT EXISTS ix_id_document_hashes_band_3 ON id_document_hashes (phash_band_3)"
+        ]
+
+        for sql in sql_statements:
+            print(f"Executing: {' '.join(sql.split())[:100]}")
+            db.execute(text(sql))
+
+        db.commit()
+        print("ID document hash migration successful.")
+    except Exception as e:
+        print(f"Migration failed: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+def backfill_id_document_hashes():
+    """Hashes ID documents submitted before the index existed, flagging duplicates among them."""
+    # Imported here: hashing decrypts documents and needs OpenCV and the KYC keys
+    from app.services.document_hashes import document_hash_index
+    from app.services.verification import verification_service
+
+    db = SessionLocal()
+    try:
+        hashed = {url for (url,) in db.query(models.IdDocumentHash.document_url)}
+        records = db.query(models.IdentityVerification).filter(
+            models.IdentityVerification.document_url.isnot(None)
+        ).order_by(models.IdentityVerification.id).all()
+
+        added = flagged = failed = 0
+        for record in records:
+            if record.document_url in hashed:
+                continue
+            try:
+                hashes = document_hash_index.compute(verification_service._prepare_image(record.document_url))
+            except Exception as e:
+                print(f"  skipped verification #{record.id}: {e}")
+                failed += 1
+                continue
+            matches = document_hash_index.record(db, record.user_id, record.document_url, hashes)
+            # Flush so later records in this run are matched against this one
+            db.flush()
+            added += 1
+            flagged += len(matches)
+
+        db.commit()
+        print(f"Backfilled: {added} documents ({flagged} multiple_ids flags, {failed} unreadable)")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create id_document_hashes (perceptual-hash index of ID images).")
+    parser.add_argument("--backfill", action="store_true", help="Also hash every existing ID document")
+    args = parser.parse_args()
+    migrate_id_document_hashes()
+    if args.backfill:
+        backfill_id_document_hashes()
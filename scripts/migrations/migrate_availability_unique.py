@@ -0,0 +1,47 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.db.database import SessionLocal
+from sqlalchemy import text
+
+def migrate_availability_unique():
+    db = SessionLocal()
+    try:
+        sql_statements = [
+            # Keep only the most recent row per (caterer_id, date) before adding the constraint
+            """
+            DELETE FROM availability a
+            USING availability b
+            WHERE a.caterer_id = b.caterer_id
+              AND a.date = b.date
+              AND a.id < b.id
+            """,
+            "DROP INDEX IF EXISTS ix_availability_caterer_date",
+            """
+            DO $$
+            BEGIN
+                IF NOT EXISTS (
+                    SELECT 1 FROM pg_constraint WHERE conname = 'uq_availability_caterer_date'
+                ) THEN
+                    ALTER TABLE availability
+                        ADD CONSTRAINT uq_availability_caterer_date UNIQUE (caterer_id, date);
+                END IF;
+            END $$;
+            """
+        ]
+
+        for sql in sql_statements:
+            print(f"Executing: {' '.join(sql.split())[:80]}")
+            db.execute(text(sql))
+
+        db.commit()
+        print("Availability unique constraint migration successful.")
+    except Exception as e:
+        print(f"Migration failed: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    migrate_availability_unique()
@@ -0,0 +1,29 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.db.database import SessionLocal
+from sqlalchemy import text
+
+def migrate_availability_version():
+    db = SessionLocal()
+    try:
+        sql_statements = [
+            "ALTER TABLE caterer_profiles ADD COLUMN IF NOT EXISTS availability_version INTEGER DEFAULT 0",
+            "ALTER TABLE caterer_profiles ADD COLUMN IF NOT EXISTS availability_updated_at TIMESTAMP WITH TIME ZONE"
+        ]
+
+        for sql in sql_statements:
+            print(f"Executing: {sql}")
+            db.execute(text(sql))
+
+        db.commit()
+        print("Availability version migration successful.")
+    except Exception as e:
+        print(f"Migration failed: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    migrate_availability_version()
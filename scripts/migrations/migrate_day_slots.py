@@ -0,0 +1,53 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.db.database import SessionLocal, engine
+from app.db.models import Base
+from sqlalchemy import text
+
+def migrate_day_slots():
+    # Creates caterer_day_slots if missing
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        sql_statements = [
+            "ALTER TABLE caterer_profiles ADD COLUMN IF NOT EXISTS max_events_per_day INTEGER DEFAULT 1",
+            "ALTER TABLE caterer_profiles ADD COLUMN IF NOT EXISTS max_pax_per_day INTEGER",
+            "ALTER TABLE bookings ADD COLUMN IF NOT EXISTS slot_reserved BOOLEAN DEFAULT FALSE",
+            # Drafts never hold a slot (an abandoned one would block the date); this also
+            # clears holds taken by drafts before the slot moved to the payment step
+            "UPDATE bookings SET slot_reserved = FALSE WHERE status = 'draft'",
+            # Existing live bookings hold a slot
+            """
+            UPDATE bookings SET slot_reserved = TRUE
+            WHERE status IN ('pending', 'pending_payment', 'confirmed')
+              AND event_date IS NOT NULL
+              AND caterer_id IS NOT NULL
+            """,
+            # Rebuild counters from the bookings that hold slots
+            "DELETE FROM caterer_day_slots",
+            """
+            INSERT INTO caterer_day_slots (caterer_id, date, events_reserved, pax_reserved)
+            SELECT caterer_id, event_date, COUNT(*), COALESCE(SUM(guest_count), 0)
+            FROM bookings
+            WHERE slot_reserved = TRUE
+            GROUP BY caterer_id, event_date
+            """
+        ]
+
+        for sql in sql_statements:
+            print(f"Executing: {' '.join(sql.split())[:80]}")
+            db.execute(text(sql))
+
+        db.commit()
+        print("Day slot migration successful.")
+    except Exception as e:
+        print(f"Migration failed: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    migrate_day_slots()
@@ -0,0 +1,29 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.db.database import SessionLocal
+from sqlalchemy import text
+
+def migrate_package_pricing_version():
+    db = SessionLocal()
+    try:
+        sql_statements = [
+            "ALTER TABLE catering_packages ADD COLUMN IF NOT EXISTS pricing_version INTEGER DEFAULT 0",
+            "UPDATE catering_packages SET pricing_version = 0 WHERE pricing_version IS NULL"
+        ]
+
+        for sql in sql_statements:
+            print(f"Executing: {sql}")
+            db.execute(text(sql))
+
+        db.commit()
+        print("Package pricing version migration successful.")
+    except Exception as e:
+        print(f"Migration failed: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    migrate_package_pricing_version()
@@ -0,0 +1,29 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.db.database import SessionLocal
+from sqlalchemy import text
+
+def migrate_payment_event_retries():
+    db = SessionLocal()
+    try:
+        sql_statements = [
+            "ALTER TABLE payment_events ADD COLUMN IF NOT EXISTS booking_reference VARCHAR(64)",
+            "ALTER TABLE payment_events ADD COLUMN IF NOT EXISTS next_attempt_at TIMESTAMP WITH TIME ZONE"
+        ]
+
+        for sql in sql_statements:
+            print(f"Executing: {sql}")
+            db.execute(text(sql))
+
+        db.commit()
+        print("Payment event retry migration successful.")
+    except Exception as e:
+        print(f"Migration failed: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    migrate_payment_event_retries()
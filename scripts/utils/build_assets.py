@@ -0,0 +1,23 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+from app.services.assets import asset_manifest, brotli
+
+def build_assets(prune: bool):
+    report = asset_manifest.build(prune=prune)
+    print(f"Assets:        {report['assets']} ({report['written']} files written, {report['pruned']} stale removed)")
+    print(f"Original size: {report['bytes']} bytes")
+    print(f"Gzip size:     {report['gzip_bytes']} bytes")
+    if brotli is None:
+        print("Brotli:        skipped (pip install brotli to build .br files)")
+    else:
+        print(f"Brotli size:   {report['brotli_bytes']} bytes")
+    print(f"Manifest:      {asset_manifest.manifest_path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fingerprint and precompress CSS/JS into app/static/dist.")
+    parser.add_argument("--keep-stale", action="store_true", help="Keep files from previous builds (e.g. during a rolling deploy)")
+    args = parser.parse_args()
+    build_assets(prune=not args.keep_stale)
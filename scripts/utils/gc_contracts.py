@@ -0,0 +1,24 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+from app.db import database
+from app.services.contracts import contract_renderer
+
+def gc_contracts(dry_run: bool):
+    db = database.SessionLocal()
+    try:
+        report = contract_renderer.collect_garbage(db, dry_run=dry_run)
+        print(f"Contract directories: {report['directories']}")
+        print(f"Orphaned deleted:     {report['deleted']}")
+        if dry_run:
+            print("Dry run: nothing was changed.")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Delete rendered contract PDFs whose booking no longer exists.")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be deleted without deleting")
+    args = parser.parse_args()
+    gc_contracts(args.dry_run)
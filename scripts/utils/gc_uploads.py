@@ -0,0 +1,36 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+from datetime import timedelta
+from app.db import database
+from app.services.blobs import blob_store
+
+def gc_uploads(grace_hours: float, dry_run: bool, adopt_legacy: bool):
+    db = database.SessionLocal()
+    try:
+        if adopt_legacy:
+            report = blob_store.adopt_legacy(db, dry_run=dry_run)
+            print(f"Legacy files adopted: {report['files']} ({report['duplicates']} duplicates, {report['missing']} missing)")
+            print(f"Rows repointed:       {report['rows']}")
+            print(f"Duplicate bytes:      {report['saved_bytes']}")
+
+        report = blob_store.collect_garbage(db, grace=timedelta(hours=grace_hours), dry_run=dry_run)
+        print(f"Blobs:                {report['blobs']} ({report['referenced']} referenced, {report['references']} references)")
+        print(f"Unreferenced deleted: {report['deleted']}")
+        print(f"Reused during run:    {report['reused']}")
+        print(f"Temp files deleted:   {report['temp_files']}")
+        print(f"Bytes freed:          {report['freed_bytes']}")
+        if dry_run:
+            print("Dry run: nothing was changed.")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Delete upload blobs that no database row references.")
+    parser.add_argument("--grace-hours", type=float, default=24, help="Keep unreferenced blobs younger than this")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be deleted without deleting")
+    parser.add_argument("--adopt-legacy", action="store_true", help="First move referenced uuid-named uploads into the blob store")
+    args = parser.parse_args()
+    gc_uploads(args.grace_hours, args.dry_run, args.adopt_legacy)
@@ -0,0 +1,24 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+from app.db import database
+from app.services.payment_events import payment_event_service
+
+def process(max_batches: int):
+    db = database.SessionLocal()
+    try:
+        report = payment_event_service.drain(db, max_batches=max_batches)
+        print(f"Processed events: {report['processed']}")
+        print(f"Ignored events:   {report['ignored']}")
+        print(f"Failed events:    {report['failed']}")
+        print(f"Awaiting retry:   {report['retrying']}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply stored payment webhook events (when the in-app worker is disabled).")
+    parser.add_argument("--max-batches", type=int, default=50)
+    args = parser.parse_args()
+    process(args.max_batches)
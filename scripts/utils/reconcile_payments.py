@@ -0,0 +1,56 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+import asyncio
+from datetime import timedelta
+from app.db import database
+from app.services.payment_gateway import paymongo_client
+from app.services.reconciliation import payment_reconciler
+
+async def reconcile(concurrency: int, page_size: int, grace_minutes: int, dry_run: bool):
+    if not paymongo_client.is_configured:
+        print("PAYMONGO_SECRET_KEY is not set; nothing to reconcile against.")
+        return
+
+    db = database.SessionLocal()
+    try:
+        report = await payment_reconciler.reconcile(
+            db,
+            concurrency=concurrency,
+            page_size=page_size,
+            grace=timedelta(minutes=grace_minutes),
+            dry_run=dry_run
+        )
+    finally:
+        db.close()
+        await paymongo_client.close()
+
+    print(f"Gateway: {paymongo_client.base_url}{' (dry run)' if dry_run else ''}")
+    print(f"Checked:          {report['checked']}")
+    print(f"Confirmed:        {report['confirmed']}")
+    print(f"Recovered:        {report['recovered']} (paid after expiry, date still free)")
+    print(f"Refund required:  {report['refund_required']} (paid after expiry, date taken)")
+    print(f"Still unpaid:     {report['unpaid']}")
+    print(f"Already updated:  {report['already_updated']}")
+    print(f"No link on file:  {report['no_reference']}")
+    print(f"Gateway errors:   {report['errors']}")
+    if report["confirmed_ids"]:
+        print(f"Confirmed bookings: {', '.join(map(str, report['confirmed_ids']))}")
+    if report["refund_ids"]:
+        print(f"Flagged for refund: {', '.join(map(str, report['refund_ids']))}")
+    if report["error_ids"]:
+        print(f"Bookings with errors: {', '.join(map(str, report['error_ids']))}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Confirm pending_payment (and recently expired) bookings that Paymongo recorded as paid (missed webhooks). "
+                    "Set PAYMONGO_API_BASE to run against a local stub (see scripts/debug/stub_paymongo.py)."
+    )
+    parser.add_argument("--concurrency", type=int, default=10, help="Max concurrent gateway requests")
+    parser.add_argument("--page-size", type=int, default=200)
+    parser.add_argument("--grace-minutes", type=int, default=15, help="Skip bookings updated more recently than this")
+    parser.add_argument("--dry-run", action="store_true", help="Report without changing bookings")
+    args = parser.parse_args()
+    asyncio.run(reconcile(args.concurrency, args.page_size, args.grace_minutes, args.dry_run))
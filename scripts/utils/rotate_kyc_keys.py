@@ -0,0 +1,129 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+import multiprocessing
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from app.core.config import settings
+from app.core.encryption import KEYRING, DecryptionError, key_id
+from app.services.kyc_documents import kyc_documents
+from app.services.storage import StorageError, private_storage, upload_storage
+
+# Workers get store names, not store objects (those hold connections and don't pickle)
+STORES = {"private": private_storage, "uploads": upload_storage}
+DONE = ("current", "rotated", "migrated")
+
+_throttle = {"rate": 0.0, "started": 0.0, "bytes": 0}
+
+def _init_worker(bytes_per_second: float):
+    _throttle.update(rate=bytes_per_second, started=time.monotonic(), bytes=0)
+
+def _rotate_one(store_name: str, key: str, size: int, dry_run: bool):
+    try:
+        outcome = kyc_documents.rotate(STORES[store_name], key, size, dry_run=dry_run)
+    except DecryptionError as e:
+        return store_name, key, "undecryptable", str(e)
+    except FileNotFoundError:
+        return store_name, key, "missing", None
+    except (StorageError, OSError) as e:
+        return store_name, key, "error", f"{type(e).__name__}: {e}"
+
+    if outcome != "current" and _throttle["rate"]:
+        # Each rewrite reads and writes roughly `size` bytes (a dry run only reads); sleep off any lead over the budget
+        _throttle["bytes"] += size if dry_run else 2 * size
+        ahead = _throttle["bytes"] / _throttle["rate"] - (time.monotonic() - _throttle["started"])
+        if ahead > 0:
+            time.sleep(ahead)
+    return store_name, key, outcome, None
+
+def _load_checkpoint(path: str, current: str) -> set:
+    # Lines are "<key id>:<store>:<key>"; entries from an earlier rotation don't count
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {line.strip()[len(current) + 1:] for line in f if line.startswith(f"{current}:")}
+
+def rotate_keys(workers: int, checkpoint: str, max_mb_per_second: float, dry_run: bool):
+    if not settings.KYC_ENCRYPTION_KEY:
+        # Without it every process would encrypt under its own throwaway development key
+        sys.exit("KYC_ENCRYPTION_KEY is not set; refusing to rotate.")
+    current = key_id().hex()
+    done = set() if dry_run else _load_checkpoint(checkpoint, current)
+    report = Counter()
+    failures = []
+    print(f"Current key: {current} ({len(KEYRING) - 1} previous key(s) configured)")
+    if done:
+        print(f"Resuming: {len(done)} documents already finished in {checkpoint}")
+
+    log = None
+    if checkpoint and not dry_run:
+        os.makedirs(os.path.dirname(checkpoint) or ".", exist_ok=True)
+        log = open(checkpoint, "a", encoding="utf-8")
+
+    def record(futures):
+        for future in futures:
+            store_name, key, outcome, error = future.result()
+            report[outcome] += 1
+            if outcome in DONE:
+                if log is not None:
+                    log.write(f"{current}:{store_name}:{key}\n")
+                    log.flush()
+            else:
+                failures.append(f"{store_name}:{key} ({outcome}{': ' + error if error else ''})")
+
+    # The byte budget is shared evenly between the workers
+    rate = max_mb_per_second * 1024 * 1024 / workers if max_mb_per_second else 0.0
+    pending = set()
+    started = time.monotonic()
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(rate,)
+        ) as pool:
+            for store, info in kyc_documents.documents():
+                store_name = "private" if store is private_storage else "uploads"
+                if f"{store_name}:{info.key}" in done:
+                    report["skipped"] += 1
+                    continue
+                # A bounded window keeps tens of thousands of keys out of the queue
+                if len(pending) >= workers * 4:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    record(finished)
+                pending.add(pool.submit(_rotate_one, store_name, info.key, info.size, dry_run))
+                report["bytes"] += info.size
+            record(wait(pending).done)
+    finally:
+        if log is not None:
+            log.close()
+
+    elapsed = time.monotonic() - started
+    print(f"Already current:       {report['current']}")
+    print(f"Re-encrypted:          {report['rotated']}")
+    print(f"Moved from uploads/:   {report['migrated']}")
+    print(f"Skipped (checkpoint):  {report['skipped']}")
+    print(f"Undecryptable:         {report['undecryptable']}")
+    print(f"Missing / errors:      {report['missing']} / {report['error']}")
+    print(f"Bytes scanned:         {report['bytes']} in {elapsed:.1f}s")
+    for failure in failures:
+        print(f"  failed: {failure}")
+    if dry_run:
+        print("Dry run: every document was decrypted, nothing was changed.")
+    elif failures:
+        print("Failed documents are not checkpointed; rerun to retry them.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Re-encrypt every KYC document under KYC_ENCRYPTION_KEY. Put the old key(s) in "
+                    "KYC_PREVIOUS_KEYS first; remove them once this reports nothing left to rotate."
+    )
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2), help="Worker processes")
+    parser.add_argument("--checkpoint", default="storage/kyc_rotation.checkpoint", help="Finished documents are appended here; rerun to resume")
+    parser.add_argument("--max-mb-per-second", type=float, default=20, help="Combined read+write budget for all workers (0 = unthrottled)")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be re-encrypted without writing")
+    args = parser.parse_args()
+    rotate_keys(max(1, args.workers), args.checkpoint, args.max_mb_per_second, args.dry_run)
@@ -0,0 +1,25 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+from app.db import database
+from app.services.sweeper import booking_sweeper
+
+def sweep(batch_size: int, max_batches: int):
+    db = database.SessionLocal()
+    try:
+        report = booking_sweeper.sweep(db, batch_size=batch_size, max_batches=max_batches)
+        print(f"Expired bookings: {report['expired']}")
+        print(f"Purged bookings:  {report['purged']}")
+        print(f"Batches run:      {report['batches']}")
+        print(f"Idempotency keys: {report['idempotency_keys']}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Expire abandoned drafts/unpaid bookings and purge old expired rows.")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--max-batches", type=int, default=100)
+    args = parser.parse_args()
+    sweep(args.batch_size, args.max_batches)
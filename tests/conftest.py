@@ -0,0 +1,87 @@
+import os
+import sys
+
+# Add project root to path so we can import app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import itertools
+import pytest
+from datetime import date, datetime, timezone
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import Session
+from app.db import models
+from app.services.slots import slot_service
+
+# Tests using the `db` fixture run against a throwaway Postgres database named by
+# TEST_DATABASE_URL (its tables are dropped and recreated from the models). The code
+# under test relies on ON CONFLICT, data-modifying CTEs and FOR UPDATE SKIP LOCKED,
+# so SQLite is no stand-in. Without the variable those tests are skipped.
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+NOW = datetime(2026, 10, 1, 12, 0, tzinfo=timezone.utc)
+EVENT_DAY = date(2026, 12, 5)
+
+_unique = itertools.count(1)
+
+@pytest.fixture(scope="session")
+def engine():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    engine = create_engine(TEST_DATABASE_URL)
+    models.Base.metadata.drop_all(engine)
+    models.Base.metadata.create_all(engine)
+    yield engine
+    models.Base.metadata.drop_all(engine)
+    engine.dispose()
+
+@pytest.fixture
+def db(engine):
+    """A session inside a transaction that is rolled back after the test; commit() only releases a savepoint."""
+    connection = engine.connect()
+    outer = connection.begin()
+    session = Session(bind=connection, join_transaction_mode="create_savepoint")
+    yield session
+    session.close()
+    outer.rollback()
+    connection.close()
+
+def make_user(db, role="customer"):
+    n = next(_unique)
+    user = models.User(email=f"{role}{n}@example.com", password_hash="x", role=role, first_name="Test", last_name=f"User {n}")
+    db.add(user)
+    db.flush()
+    return user
+
+def make_caterer(db, **values):
+    user = make_user(db, "caterer")
+    caterer = models.CatererProfile(user_id=user.id, business_name=f"Caterer {user.id}", slug=f"caterer-{user.id}", **values)
+    db.add(caterer)
+    db.flush()
+    return caterer
+
+def make_booking(db, caterer=None, holds_slot=False, **values):
+    """A booking for EVENT_DAY; holds_slot takes its capacity slot the way the payment step does."""
+    caterer = caterer or make_caterer(db)
+    values = {"event_date": EVENT_DAY, "guest_count": 50, "status": "pending", "payment_status": "pending", **values}
+    booking = models.Booking(user_id=make_user(db).id, caterer_id=caterer.id, **values)
+    db.add(booking)
+    db.flush()
+    if holds_slot:
+        assert slot_service.reserve(db, caterer.id, booking.event_date, booking.guest_count)
+        booking.slot_reserved = True
+        db.flush()
+    return booking
+
+def day_slot(db, caterer_id, day=EVENT_DAY):
+    """(events_reserved, pax_reserved) for a caterer's day, or None if no slot row exists."""
+    row = db.query(models.CatererDaySlot.events_reserved, models.CatererDaySlot.pax_reserved).filter(
+        models.CatererDaySlot.caterer_id == caterer_id,
+        models.CatererDaySlot.date == day
+    ).first()
+    return tuple(row) if row else None
+
+def fresh(db, booking):
+    """Re-reads a booking after set-based updates; None once it has been deleted."""
+    booking_id = inspect(booking).identity[0] # without a refresh, which fails for deleted rows
+    db.expire_all()
+    return db.get(models.Booking, booking_id)
@@ -0,0 +1,112 @@
+import os
+import sys
+
+# Add project root to path so we can import app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import timedelta
+from app.db import models
+from app.services.availability import availability_service
+from app.services.slots import slot_service
+from conftest import EVENT_DAY, day_slot, fresh, make_booking, make_caterer
+
+def available_on(db, caterers, day=EVENT_DAY):
+    query = db.query(models.CatererProfile.id).filter(models.CatererProfile.id.in_([c.id for c in caterers]))
+    return {row.id for row in availability_service.filter_available_on(query, day)}
+
+def test_search_hides_caterers_without_room(db):
+    free = make_caterer(db)
+    blocked = make_caterer(db)
+    db.add(models.Availability(caterer_id=blocked.id, date=EVENT_DAY, is_available=False, reason="Holiday"))
+    booked = make_caterer(db)
+    make_booking(db, booked, status="confirmed")
+    held = make_caterer(db)
+    make_booking(db, held, status="pending_payment", holds_slot=True)
+    room_left = make_caterer(db, max_events_per_day=2)
+    make_booking(db, room_left, status="pending", holds_slot=True)
+    db.flush()
+
+    caterers = [free, blocked, booked, held, room_left]
+    assert available_on(db, caterers) == {free.id, room_left.id}
+    # Other days are untouched
+    assert len(available_on(db, caterers, EVENT_DAY + timedelta(days=1))) == 5
+
+def test_drafts_do_not_take_dates(db):
+    caterer = make_caterer(db)
+    for _ in range(3):
+        make_booking(db, caterer, status="draft")
+    assert available_on(db, [caterer]) == {caterer.id}
+    assert day_slot(db, caterer.id) is None
+
+def test_range_reports_each_day(db):
+    caterer = make_caterer(db)
+    day = EVENT_DAY
+    make_booking(db, caterer, status="confirmed", event_date=day + timedelta(days=1))
+    make_booking(db, caterer, status="pending", event_date=day + timedelta(days=2), holds_slot=True)
+    make_booking(db, caterer, status="draft", event_date=day + timedelta(days=3))
+    make_booking(db, caterer, status="confirmed", event_date=day + timedelta(days=4), holds_slot=True)
+    db.add(models.Availability(caterer_id=caterer.id, date=day + timedelta(days=4), is_available=False, reason="Holiday"))
+    db.flush()
+
+    days = availability_service.get_range(db, caterer.id, day, day + timedelta(days=5))
+    assert [(d["status"], d["reason"]) for d in days] == [
+        ("free", None),
+        ("booked", "Fully Booked"),
+        ("booked", "Fully Booked"), # every slot held by an unpaid booking
+        ("free", None),             # a draft holds nothing
+        ("blocked", "Holiday"),     # the caterer's own block wins
+        ("free", None),
+    ]
+
+def test_full_days_follow_the_caterer_limit(db):
+    caterer = make_caterer(db, max_events_per_day=2)
+    make_booking(db, caterer, status="pending", holds_slot=True)
+    window = (caterer.id, EVENT_DAY, EVENT_DAY)
+    assert db.execute(slot_service.full_days(*window)).all() == []
+    make_booking(db, caterer, status="pending", holds_slot=True)
+    assert [row.day for row in db.execute(slot_service.full_days(*window))] == [EVENT_DAY]
+
+# --- slot reservations ---
+
+def test_hold_takes_a_draft_slot_once(db):
+    booking = make_booking(db, status="draft", guest_count=40)
+    assert slot_service.hold(db, booking.id)
+    assert slot_service.hold(db, booking.id)
+    assert fresh(db, booking).slot_reserved is True
+    assert day_slot(db, booking.caterer_id) == (1, 40)
+
+def test_hold_fails_on_a_full_day(db):
+    caterer = make_caterer(db)
+    make_booking(db, caterer, status="confirmed", holds_slot=True)
+    draft = make_booking(db, caterer, status="draft")
+    assert not slot_service.hold(db, draft.id)
+    assert day_slot(db, caterer.id) == (1, 50)
+
+def test_hold_leaves_other_statuses_alone(db):
+    booking = make_booking(db, status="expired")
+    assert slot_service.hold(db, booking.id)
+    assert fresh(db, booking).slot_reserved is False
+    assert day_slot(db, booking.caterer_id) is None
+
+def test_capacity_limits(db):
+    unset = make_caterer(db, max_events_per_day=None)
+    assert slot_service.get_capacity(db, unset.id) == (slot_service.DEFAULT_MAX_EVENTS, None)
+    assert slot_service.reserve(db, unset.id, EVENT_DAY, 10)
+    assert not slot_service.reserve(db, unset.id, EVENT_DAY, 10)
+
+    # Zero means closed, not the default
+    closed = make_caterer(db, max_events_per_day=0)
+    assert slot_service.get_capacity(db, closed.id) == (0, None)
+    assert not slot_service.reserve(db, closed.id, EVENT_DAY, 10)
+
+    pax_limited = make_caterer(db, max_events_per_day=3, max_pax_per_day=100)
+    assert slot_service.reserve(db, pax_limited.id, EVENT_DAY, 60)
+    assert not slot_service.reserve(db, pax_limited.id, EVENT_DAY, 60)
+    assert slot_service.reserve(db, pax_limited.id, EVENT_DAY, 40)
+    assert day_slot(db, pax_limited.id) == (2, 100)
+
+def test_release_returns_the_slot_once(db):
+    booking = make_booking(db, status="pending", holds_slot=True)
+    assert slot_service.release(db, booking.id)
+    assert not slot_service.release(db, booking.id)
+    assert day_slot(db, booking.caterer_id) == (0, 0)
@@ -0,0 +1,161 @@
+import os
+import sys
+
+# Add project root to path so we can import app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from app.db import models
+from app.services.booking_state import booking_state, TransitionError
+from conftest import day_slot, fresh, make_booking, make_caterer
+
+@pytest.mark.parametrize("action, allowed, refused", [
+    ("accept", ["pending", "verified"], ["draft", "confirmed", "expired"]),
+    ("confirm_payment", ["draft", "pending", "pending_payment"], ["confirmed", "expired", "cancelled"]),
+    ("recover_payment", ["expired"], ["pending_payment", "cancelled", "confirmed"]),
+    ("record_late_payment", ["draft", "expired", "cancelled"], ["confirmed", "pending_payment"]),
+    ("mark_paid", ["pending", "verified", "pending_payment", "confirmed", "completed"], ["expired", "cancelled", "draft"]),
+    ("expire", ["draft", "pending", "pending_payment"], ["confirmed", "expired"]),
+])
+def test_transition_sources(action, allowed, refused):
+    for status in allowed:
+        assert booking_state.can(action, status)
+    for status in refused:
+        assert not booking_state.can(action, status)
+    assert not booking_state.can(action, None)
+
+def test_transition_error_message():
+    error = TransitionError(5, "confirm_payment", "expired")
+    assert error.current_status == "expired"
+    assert "Cannot confirm_payment booking #5 while it is 'expired'" == str(error)
+
+def history(db, booking):
+    return [(h.status, h.notes) for h in db.query(models.BookingHistory).filter(
+        models.BookingHistory.booking_id == booking.id
+    ).order_by(models.BookingHistory.id)]
+
+def flags(db, booking):
+    return [f.flag_type for f in db.query(models.FraudFlag).filter(models.FraudFlag.booking_id == booking.id)]
+
+# --- transition ---
+
+def test_transition_moves_booking_and_logs_history(db):
+    booking = make_booking(db, status="pending")
+    assert booking_state.transition(db, booking.id, "accept", "Accepted by caterer") == "confirmed"
+    assert fresh(db, booking).status == "confirmed"
+    assert history(db, booking) == [("confirmed", "Accepted by caterer")]
+    assert booking.caterer.availability_version == 1
+
+def test_transition_from_wrong_status_is_rejected(db):
+    booking = make_booking(db, status="draft")
+    with pytest.raises(TransitionError) as e:
+        booking_state.transition(db, booking.id, "accept", "Accepted by caterer")
+    assert e.value.current_status == "draft"
+    assert fresh(db, booking).status == "draft"
+    assert history(db, booking) == []
+
+def test_booking_outside_scope_reports_as_missing(db):
+    booking = make_booking(db, status="pending")
+    other = make_caterer(db)
+    with pytest.raises(TransitionError) as e:
+        booking_state.transition(db, booking.id, "cancel", "Cancelled", scope={"caterer_id": other.id})
+    assert e.value.current_status is None
+    assert fresh(db, booking).status == "pending"
+
+def test_cancel_gives_the_slot_back_once(db):
+    booking = make_booking(db, status="pending", holds_slot=True)
+    assert day_slot(db, booking.caterer_id) == (1, 50)
+    booking_state.transition(db, booking.id, "cancel", "Cancelled")
+    assert fresh(db, booking).slot_reserved is False
+    assert day_slot(db, booking.caterer_id) == (0, 0)
+    with pytest.raises(TransitionError):
+        booking_state.transition(db, booking.id, "cancel", "Cancelled again")
+    assert day_slot(db, booking.caterer_id) == (0, 0)
+
+@pytest.mark.parametrize("action, payment_status", [
+    ("customer_cancel", "deposit_paid"),
+    ("customer_cancel", "paid"),
+    ("expire", "deposit_paid"),
+    ("mark_paid", "paid"),
+])
+def test_paid_bookings_are_refused(db, action, payment_status):
+    booking = make_booking(db, status="pending", payment_status=payment_status)
+    with pytest.raises(TransitionError):
+        booking_state.transition(db, booking.id, action, "test")
+    assert fresh(db, booking).payment_status == payment_status
+
+def test_mark_paid_settles_a_deposit(db):
+    booking = make_booking(db, status="confirmed", payment_status="deposit_paid")
+    assert booking_state.transition(db, booking.id, "mark_paid", "Balance received") == "confirmed"
+    assert fresh(db, booking).payment_status == "paid"
+    assert history(db, booking) == [("payment_received", "Balance received")]
+
+def test_transition_many_moves_only_eligible_bookings(db):
+    caterer = make_caterer(db)
+    overdue = make_booking(db, caterer, status="pending", holds_slot=True, guest_count=10)
+    paid = make_booking(db, caterer, status="pending", payment_status="paid")
+    confirmed = make_booking(db, caterer, status="confirmed")
+    moved = booking_state.transition_many(db, [overdue.id, paid.id, confirmed.id], "expire", "Expired")
+    assert moved == [overdue.id]
+    assert [fresh(db, b).status for b in (overdue, paid, confirmed)] == ["expired", "pending", "confirmed"]
+    assert day_slot(db, caterer.id) == (0, 0)
+
+# --- apply_payment ---
+
+def test_payment_confirms_a_booking_holding_its_slot(db):
+    booking = make_booking(db, status="pending_payment", holds_slot=True)
+    assert booking_state.apply_payment(db, booking.id, "Paid") == "confirmed"
+    booking = fresh(db, booking)
+    assert (booking.status, booking.payment_status) == ("confirmed", "paid")
+    assert day_slot(db, booking.caterer_id) == (1, 50)
+
+def test_payment_for_a_draft_takes_the_slot(db):
+    booking = make_booking(db, status="draft")
+    assert day_slot(db, booking.caterer_id) is None
+    assert booking_state.apply_payment(db, booking.id, "Paid") == "confirmed"
+    booking = fresh(db, booking)
+    assert (booking.status, booking.slot_reserved) == ("confirmed", True)
+    assert day_slot(db, booking.caterer_id) == (1, 50)
+
+def test_payment_for_a_draft_on_a_full_day_is_flagged(db):
+    caterer = make_caterer(db)
+    make_booking(db, caterer, status="confirmed", holds_slot=True)
+    draft = make_booking(db, caterer, status="draft")
+    assert booking_state.apply_payment(db, draft.id, "Paid") == "refund_required"
+    draft = fresh(db, draft)
+    assert (draft.status, draft.payment_status, draft.slot_reserved) == ("draft", "paid", False)
+    assert day_slot(db, caterer.id) == (1, 50)
+    assert flags(db, draft) == ["late_payment"]
+
+def test_payment_after_expiry_recovers_a_free_date(db):
+    booking = make_booking(db, status="expired")
+    assert booking_state.apply_payment(db, booking.id, "Paid") == "recovered"
+    booking = fresh(db, booking)
+    assert (booking.status, booking.slot_reserved) == ("confirmed", True)
+    assert day_slot(db, booking.caterer_id) == (1, 50)
+    assert flags(db, booking) == []
+
+def test_payment_after_expiry_on_a_taken_date_is_flagged_once(db):
+    caterer = make_caterer(db)
+    make_booking(db, caterer, status="confirmed", holds_slot=True)
+    expired = make_booking(db, caterer, status="expired")
+    assert booking_state.apply_payment(db, expired.id, "Paid") == "refund_required"
+    expired = fresh(db, expired)
+    assert (expired.status, expired.payment_status) == ("expired", "paid")
+    assert history(db, expired)[-1][0] == "refund_required"
+    assert flags(db, expired) == ["late_payment"]
+    assert day_slot(db, caterer.id) == (1, 50)
+
+    # A second event for the same payment neither flags again nor fails
+    assert booking_state.apply_payment(db, expired.id, "Paid") == "refund_required"
+    assert flags(db, expired) == ["late_payment"]
+
+def test_payment_on_a_confirmed_booking_is_a_no_op(db):
+    booking = make_booking(db, status="confirmed", payment_status="paid", holds_slot=True)
+    assert booking_state.apply_payment(db, booking.id, "Paid") == "already_confirmed"
+    assert history(db, booking) == []
+
+def test_payment_for_a_missing_booking_raises(db):
+    with pytest.raises(TransitionError) as e:
+        booking_state.apply_payment(db, 987654, "Paid")
+    assert e.value.current_status is None
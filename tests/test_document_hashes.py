@@ -0,0 +1,94 @@
+import os
+import sys
+
+# Add project root to path so we can import app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import random
+import cv2
+import numpy as np
+import pytest
+from sqlalchemy.dialects import postgresql
+from app.services.document_hashes import document_hash_index as index
+
+def flip_bits(value, count, rng):
+    for bit in rng.sample(range(64), count):
+        value ^= 1 << bit
+    return value
+
+def band_candidates(phash):
+    """What find_matches asks the database for: every band value within the flip table."""
+    return [{band ^ flip for flip in index._flips} for band in index._bands(phash)]
+
+def test_flip_table_covers_two_bits_per_band():
+    # 1 + 16 + 120 neighbours
+    assert len(index._flips) == 137
+    assert len(set(index._flips)) == 137
+    assert max(bin(flip).count("1") for flip in index._flips) == index.PHASH_RADIUS // index.BANDS
+
+@pytest.mark.parametrize("distance", range(0, index.PHASH_RADIUS + 1))
+def test_band_search_finds_every_hash_within_radius(distance):
+    rng = random.Random(distance)
+    for _ in range(200):
+        stored = rng.getrandbits(64)
+        probe = flip_bits(stored, distance, rng)
+        assert index.distance(stored, probe) == distance
+        # Pigeonhole: some band of the stored hash is among the probe's candidates
+        assert any(band in candidates for band, candidates in zip(index._bands(stored), band_candidates(probe)))
+
+def test_band_search_can_miss_beyond_radius():
+    # Three flipped bits in each band: no band stays within two bits
+    stored = 0
+    probe = sum(0b111 << (16 * band) for band in range(index.BANDS))
+    assert index.distance(stored, probe) == 12
+    assert not any(band in candidates for band, candidates in zip(index._bands(stored), band_candidates(probe)))
+
+def test_signed_storage_round_trip():
+    for value in (0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1):
+        signed = index._signed(value)
+        assert -(1 << 63) <= signed < 1 << 63
+        assert index._unsigned(signed) == value
+
+def test_query_uses_all_band_indexes():
+    class QuerySession:
+        def query(self, *columns):
+            return self
+        def filter(self, *criteria):
+            self.criteria = getattr(self, "criteria", []) + list(criteria)
+            return self
+        def __iter__(self):
+            return iter([])
+    db = QuerySession()
+    assert index.find_matches(db, {"phash": 0x0123456789ABCDEF, "dhash": 0}, exclude_user_id=4) == []
+    sql = " ".join(str(c.compile(dialect=postgresql.dialect())) for c in db.criteria)
+    for band in range(index.BANDS):
+        assert f"id_document_hashes.phash_band_{band} IN" in sql
+    assert "id_document_hashes.user_id !=" in sql
+
+def synthetic_id(seed):
+    rng = np.random.default_rng(seed)
+    img = np.full((400, 640, 3), 235, np.uint8)
+    for _ in range(25):
+        x, y = rng.integers(0, 600), rng.integers(0, 360)
+        color = tuple(int(c) for c in rng.integers(0, 200, 3))
+        cv2.rectangle(img, (int(x), int(y)), (int(x + rng.integers(10, 200)), int(y + rng.integers(5, 60))), color, -1)
+    cv2.putText(img, f"ID {seed:08d}", (40, 360), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (20, 20, 20), 3)
+    return img
+
+def test_hashes_survive_recompression_and_resizing():
+    original = synthetic_id(1)
+    ok, jpeg = cv2.imencode(".jpg", original, [cv2.IMWRITE_JPEG_QUALITY, 40])
+    variants = [
+        cv2.imdecode(jpeg, cv2.IMREAD_COLOR),
+        cv2.resize(original, (320, 200), interpolation=cv2.INTER_AREA),
+        cv2.convertScaleAbs(original, alpha=1.0, beta=15),
+    ]
+    hashes = index.compute(original)
+    for variant in variants:
+        other = index.compute(variant)
+        assert index.distance(hashes["phash"], other["phash"]) <= index.PHASH_RADIUS
+        assert index.distance(hashes["dhash"], other["dhash"]) <= index.DHASH_RADIUS
+
+def test_different_documents_are_far_apart():
+    a, b = index.compute(synthetic_id(1)), index.compute(synthetic_id(2))
+    assert index.distance(a["phash"], b["phash"]) > index.PHASH_RADIUS
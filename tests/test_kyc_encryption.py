@@ -0,0 +1,94 @@
+import os
+import sys
+
+# Add project root to path so we can import app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from cryptography.fernet import Fernet
+from app.core.encryption import (
+    HEADER_SIZE, TAG_SIZE, DecryptionError, StreamHeader, decrypt_range, encrypt_stream
+)
+
+SEGMENT = 1024
+PLAINTEXT = os.urandom(SEGMENT * 5 + 321)
+
+def encrypt(data=PLAINTEXT, chunk=700, **kwargs):
+    return b"".join(encrypt_stream((data[i:i + chunk] for i in range(0, len(data), chunk)), segment_size=SEGMENT, **kwargs))
+
+def decrypt(blob, start=0, end=None, **kwargs):
+    fetched = []
+    def fetch(first, last):
+        fetched.append((first, last))
+        return [blob[first:last + 1]]
+    header = StreamHeader.parse(blob[:HEADER_SIZE])
+    plain = b"".join(decrypt_range(header, fetch, len(blob), start, end, **kwargs))
+    return plain, fetched
+
+def test_round_trip_and_sizes():
+    blob = encrypt()
+    header = StreamHeader.parse(blob[:HEADER_SIZE])
+    assert header.segment_count(len(blob)) == 6
+    assert header.plaintext_size(len(blob)) == len(PLAINTEXT)
+    assert len(blob) == HEADER_SIZE + len(PLAINTEXT) + 6 * TAG_SIZE
+    assert decrypt(blob)[0] == PLAINTEXT
+
+@pytest.mark.parametrize("size", [0, 1, SEGMENT - 1, SEGMENT, SEGMENT + 1, 3 * SEGMENT])
+def test_round_trip_at_segment_boundaries(size):
+    data = PLAINTEXT[:size]
+    assert decrypt(encrypt(data))[0] == data
+
+@pytest.mark.parametrize("start, end", [
+    (0, 0), (10, 20), (SEGMENT - 5, SEGMENT + 5), (2 * SEGMENT, 3 * SEGMENT - 1),
+    (len(PLAINTEXT) - 10, len(PLAINTEXT) - 1), (100, 10 ** 9),
+])
+def test_range_decrypts_only_covering_segments(start, end):
+    blob = encrypt()
+    plain, fetched = decrypt(blob, start, end)
+    assert plain == PLAINTEXT[start:end + 1]
+    sealed = SEGMENT + TAG_SIZE
+    (first, last), = fetched
+    assert first == HEADER_SIZE + (start // SEGMENT) * sealed
+    assert last - first < (min(end, len(PLAINTEXT) - 1) // SEGMENT - start // SEGMENT + 1) * sealed
+
+def test_empty_range():
+    assert decrypt(encrypt(), 50, 10)[0] == b""
+
+def test_tampered_segment_fails():
+    blob = bytearray(encrypt())
+    blob[HEADER_SIZE + SEGMENT + TAG_SIZE + 3] ^= 1
+    with pytest.raises(DecryptionError):
+        decrypt(bytes(blob))
+    # Segments before the damage still decrypt on their own
+    assert decrypt(bytes(blob), 0, SEGMENT - 1)[0] == PLAINTEXT[:SEGMENT]
+
+def test_tampered_header_fails():
+    blob = bytearray(encrypt())
+    blob[HEADER_SIZE - 1] ^= 1 # nonce prefix is authenticated with every segment
+    with pytest.raises(DecryptionError):
+        decrypt(bytes(blob))
+
+@pytest.mark.parametrize("cut", [1, TAG_SIZE, len(PLAINTEXT) % SEGMENT + TAG_SIZE, SEGMENT + TAG_SIZE + 1])
+def test_truncation_is_detected(cut):
+    # Dropping whole segments leaves a non-final segment last, whose nonce flag doesn't match
+    with pytest.raises(DecryptionError):
+        decrypt(encrypt()[:-cut])
+
+def test_swapped_segments_fail():
+    blob = encrypt()
+    sealed = SEGMENT + TAG_SIZE
+    first, second = blob[HEADER_SIZE:HEADER_SIZE + sealed], blob[HEADER_SIZE + sealed:HEADER_SIZE + 2 * sealed]
+    swapped = blob[:HEADER_SIZE] + second + first + blob[HEADER_SIZE + 2 * sealed:]
+    with pytest.raises(DecryptionError):
+        decrypt(swapped)
+
+def test_unknown_key_is_reported():
+    other = Fernet.generate_key().decode()
+    blob = encrypt(key=other)
+    with pytest.raises(DecryptionError, match="not configured"):
+        decrypt(blob)
+    assert decrypt(blob, key=other)[0] == PLAINTEXT
+
+def test_not_a_stream():
+    with pytest.raises(DecryptionError):
+        StreamHeader.parse(b"gAAAAA" + b"\0" * HEADER_SIZE)
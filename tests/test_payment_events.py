@@ -0,0 +1,160 @@
+import os
+import sys
+
+# Add project root to path so we can import app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import pytest
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from app.db import models
+from app.services.payment_events import payment_event_service
+from conftest import fresh, make_booking
+
+def paymongo_body(remarks="booking_id:15", event_id="evt_1", status="paid"):
+    return json.dumps({
+        "data": {
+            "id": event_id,
+            "attributes": {
+                "type": "link.payment.paid",
+                "data": {"attributes": {"remarks": remarks, "status": status}}
+            }
+        }
+    }).encode()
+
+# --- parse ---
+
+def test_parse_paymongo_event():
+    event_id, event_type, booking_id, payload = payment_event_service.parse(paymongo_body())
+    assert (event_id, event_type, booking_id) == ("evt_1", "link.payment.paid", 15)
+    assert payload["data"]["id"] == "evt_1"
+
+def test_parse_balance_remarks_do_not_name_a_booking():
+    _, _, booking_id, _ = payment_event_service.parse(paymongo_body(remarks="booking_id:15_balance"))
+    assert booking_id is None
+
+def test_parse_mock_event():
+    body = json.dumps({"event_id": "mock-1", "booking_id": "9", "status": "success"}).encode()
+    assert payment_event_service.parse(body)[:3] == ("mock-1", "mock", 9)
+
+def test_parse_without_event_id_hashes_the_body():
+    body = json.dumps({"booking_id": 3}).encode()
+    event_id = payment_event_service.parse(body)[0]
+    assert event_id.startswith("sha256:")
+    assert event_id == payment_event_service.parse(body)[0]
+
+@pytest.mark.parametrize("body", [
+    b"not json",
+    b"\xff\xfe",
+    json.dumps({"data": "oops"}).encode(),
+    json.dumps({"data": ["a", "b"]}).encode(),
+    json.dumps({"data": {"attributes": "x"}}).encode(),
+    json.dumps({"data": {"attributes": {"data": 5}}}).encode(),
+    json.dumps({"data": {"attributes": {"data": {"attributes": []}}}}).encode(),
+    json.dumps({"data": {"attributes": {"type": 7}}}).encode(),
+])
+def test_parse_rejects_malformed_bodies(body):
+    # The webhook turns ValueError into a 400
+    with pytest.raises(ValueError):
+        payment_event_service.parse(body)
+
+def test_parse_tolerates_missing_nested_objects():
+    body = json.dumps({"data": {"id": "evt_2", "attributes": {"type": "link.payment.paid", "data": None}}}).encode()
+    assert payment_event_service.parse(body)[:3] == ("evt_2", "link.payment.paid", None)
+
+# --- store ---
+
+def stored(db):
+    return db.query(models.PaymentEvent).order_by(models.PaymentEvent.id).all()
+
+def test_store_links_known_booking(db):
+    booking = make_booking(db, status="pending_payment")
+    assert payment_event_service.store(db, paymongo_body(remarks=f"booking_id:{booking.id}")) is True
+    event, = stored(db)
+    assert (event.event_id, event.booking_id, event.booking_reference) == ("evt_1", booking.id, str(booking.id))
+    assert event.status == "received"
+
+def test_store_keeps_events_for_unknown_bookings(db):
+    # No foreign key violation; the reference is kept for the "not found" message
+    assert payment_event_service.store(db, paymongo_body(remarks="booking_id:424242")) is True
+    event, = stored(db)
+    assert (event.booking_id, event.booking_reference) == (None, "424242")
+
+def test_store_without_booking(db):
+    payment_event_service.store(db, json.dumps({"event_id": "x", "status": "success"}).encode())
+    event, = stored(db)
+    assert (event.booking_id, event.booking_reference) == (None, None)
+
+def test_store_reports_duplicates(db):
+    assert payment_event_service.store(db, paymongo_body()) is True
+    assert payment_event_service.store(db, paymongo_body()) is False
+    assert len(stored(db)) == 1
+
+# --- apply / retries ---
+
+def make_event(**values):
+    defaults = dict(id=1, event_type="mock", booking_id=None, booking_reference=None, payload={"status": "success"},
+                    status="received", attempts=0, next_attempt_at=None, last_error=None, processed_at=None)
+    return SimpleNamespace(**{**defaults, **values})
+
+def test_apply_unknown_booking_is_ignored_with_reference():
+    event = make_event(booking_reference="424242")
+    assert payment_event_service.apply(None, event) == "ignored"
+    assert event.last_error == "Booking #424242 not found"
+
+def test_apply_unpaid_status_is_ignored():
+    assert payment_event_service.apply(None, make_event(payload={"status": "failed"}, booking_id=3)) == "ignored"
+
+def add_event(db, booking, event_id, **values):
+    event = models.PaymentEvent(event_id=event_id, event_type="mock", booking_id=booking.id,
+                                payload={"status": "success", "method": "GCash"}, status="received", attempts=0, **values)
+    db.add(event)
+    db.flush()
+    return event
+
+def test_batch_confirms_paid_bookings(db):
+    booking = make_booking(db, status="pending_payment", holds_slot=True)
+    event = add_event(db, booking, "evt_paid")
+    assert payment_event_service.process_batch(db)["processed"] == 1
+    assert fresh(db, booking).status == "confirmed"
+    assert (event.status, event.attempts, event.processed_at is not None) == ("processed", 1, True)
+    # Nothing left to claim
+    assert payment_event_service.process_batch(db)["processed"] == 0
+
+def test_failed_events_back_off_then_fail(db, monkeypatch):
+    booking = make_booking(db, status="pending_payment")
+    event = add_event(db, booking, "evt_flaky")
+    def boom(db, e):
+        raise RuntimeError("database hiccup")
+    monkeypatch.setattr(payment_event_service, "apply", boom)
+
+    delays = []
+    for attempt in range(1, payment_event_service.MAX_ATTEMPTS):
+        before = datetime.now(timezone.utc)
+        report = payment_event_service.process_batch(db)
+        assert report["retrying"] == 1 and event.status == "received"
+        assert event.attempts == attempt
+        delays.append(event.next_attempt_at - before)
+        # Not picked up again until its retry time comes
+        assert payment_event_service.process_batch(db)["retrying"] == 0
+        event.next_attempt_at = before - timedelta(seconds=1)
+        db.flush()
+
+    # Exponential and capped
+    assert all(later > earlier for earlier, later in zip(delays, delays[1:]))
+    assert delays[0] >= payment_event_service.RETRY_BASE
+    assert max(delays) <= payment_event_service.RETRY_MAX + timedelta(seconds=1)
+
+    report = payment_event_service.process_batch(db)
+    assert report["failed"] == 1
+    assert (event.status, event.last_error) == ("failed", "database hiccup")
+    assert fresh(db, booking).status == "pending_payment"
+
+def test_later_events_wait_behind_a_retrying_one(db):
+    booking = make_booking(db, status="pending_payment", holds_slot=True)
+    add_event(db, booking, "evt_first", next_attempt_at=datetime.now(timezone.utc) + timedelta(minutes=5))
+    second = add_event(db, booking, "evt_second")
+    assert payment_event_service.process_batch(db) == {"processed": 0, "ignored": 0, "failed": 0, "retrying": 0}
+    assert second.status == "received"
+    assert fresh(db, booking).status == "pending_payment"
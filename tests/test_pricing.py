@@ -0,0 +1,243 @@
+import os
+import sys
+
+# Add project root to path so we can import app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import numpy as np
+from datetime import date, timedelta
+from decimal import Decimal
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.core import security as auth
+from app.db import database, models
+from app.routers import quotations
+from app.services.pricing import pricing_engine, PricingRules, PromotionRule, from_cents, to_cents
+from app.services.quotation import quotation_service
+from conftest import make_booking, make_caterer
+
+# 450/guest for the first 50, 400 for each extra guest, at least 25,000,
+# 1,500 per overtime hour; 10% off or 3,000 off, whichever is more
+RULES = PricingRules(
+    unit_price_cents=45000,
+    included_guests=50,
+    extra_guest_cents=40000,
+    min_contract_cents=2500000,
+    service_hours=4,
+    overtime_cents=150000,
+    promotions=(PromotionRule(1, percent_bp=1000), PromotionRule(2, fixed_cents=300000)),
+)
+ADDONS = 125050 # 1,250.50
+
+# --- quote tables ---
+
+def test_table_prices_every_guest_count_and_downpayment():
+    table = pricing_engine.quote_table(RULES, ADDONS, [40, 80], [30, 50], overtime_hours=2)
+    # 40 guests hit the 25,000 minimum; 80 guests are 50 x 450 + 30 x 400
+    assert table["base_cents"].tolist() == [2500000, 3450000]
+    assert int(table["overtime_cents"]) == 300000
+    # The better promotion wins: 3,000 off 29,250.50, but 10% of 38,750.50
+    assert table["discount_cents"].tolist() == [300000, 387505]
+    assert table["total_cents"].tolist() == [2625050, 3487545]
+    # Deposits round half up: 30% of 34,875.45 is 10,462.635
+    assert table["deposit_cents"].tolist() == [[787515, 1312525], [1046264, 1743773]]
+
+@pytest.mark.parametrize("rules", [
+    RULES,
+    PricingRules(unit_price_cents=9999),
+    PricingRules(unit_price_cents=45000, included_guests=50, extra_guest_cents=40000),
+    PricingRules(unit_price_cents=1000, min_contract_cents=500000, promotions=(PromotionRule(3, fixed_cents=10 ** 9),)),
+    PricingRules(unit_price_cents=33333, overtime_cents=12345, promotions=(PromotionRule(4, percent_bp=1250),)),
+])
+def test_table_matches_single_quotes(rules):
+    guests = list(range(0, 301, 7))
+    percents = list(range(pricing_engine.DOWNPAYMENT_MIN, pricing_engine.DOWNPAYMENT_MAX + 1))
+    table = pricing_engine.quote_table(rules, 4321, guests, percents, overtime_hours=3)
+    for i, guest_count in enumerate(guests):
+        for j, percent in enumerate(percents):
+            single = pricing_engine.quote(rules, 4321, guest_count, percent, overtime_hours=3)
+            assert Decimal(int(table["total_cents"][i])) / 100 == single["total_amount"]
+            assert Decimal(int(table["deposit_cents"][i, j])) / 100 == single["deposit_amount"]
+            assert Decimal(int(table["discount_cents"][i])) / 100 == single["discount_amount"]
+
+@pytest.mark.parametrize("guests, percents, overtime", [
+    ([], [30], 0),
+    ([10], [], 0),
+    ([-1], [30], 0),
+    ([10], [29], 0),
+    ([10], [51], 0),
+    ([10], [30], 25),
+    (list(range(1000)), list(range(30, 51)), 0),
+])
+def test_table_rejects_bad_input(guests, percents, overtime):
+    with pytest.raises(ValueError):
+        pricing_engine.quote_table(RULES, 0, guests, percents, overtime)
+
+def test_table_amounts_stay_exact_for_large_events():
+    table = pricing_engine.quote_table(RULES, ADDONS, np.arange(0, 20000), [30])
+    assert table["total_cents"].dtype == np.int64
+    # 50 x 450 + 19,949 x 400 + 1,250.50 = 8,003,350.50, less 10%
+    assert int(table["total_cents"][-1]) == 720301545
+
+# --- batch what-if endpoint ---
+
+@pytest.fixture
+def client(db):
+    app = FastAPI()
+    app.include_router(quotations.router)
+    app.dependency_overrides[database.get_db] = lambda: db
+    return TestClient(app)
+
+def make_package(db, caterer, **values):
+    values = {"name": "Grand Buffet", "price_per_head": 450, "min_guests": 50, "additional_guest_price": 400,
+              "min_contract_amount": 25000, "service_duration": 4, "overtime_fee": 1500, **values}
+    package = models.CateringPackage(caterer_id=caterer.id, **values)
+    db.add(package)
+    db.flush()
+    return package
+
+def login(client, user):
+    client.cookies.set("access_token", f"Bearer {auth.create_access_token({'sub': user.email})}")
+
+def test_batch_endpoint_prices_the_booking_package(db, client):
+    caterer = make_caterer(db)
+    package = make_package(db, caterer)
+    booking = make_booking(db, caterer, status="draft", package_id=package.id, guest_count=80)
+    login(client, booking.user)
+
+    response = client.post(f"/api/bookings/{booking.id}/calculate/batch", json={
+        "guest_counts": [40, 80], "downpayment_percents": [30, 50], "overtime_hours": 2
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert body["base_amounts"] == [25000.0, 34500.0]
+    assert body["overtime_amount"] == 3000.0
+    assert body["total_amounts"] == [28000.0, 37500.0]
+    assert body["deposit_amounts"] == [[8400.0, 14000.0], [11250.0, 18750.0]]
+
+def test_batch_endpoint_rejects_bad_input_and_other_users(db, client):
+    caterer = make_caterer(db)
+    booking = make_booking(db, caterer, status="draft", package_id=make_package(db, caterer).id)
+    login(client, booking.user)
+    assert client.post(f"/api/bookings/{booking.id}/calculate/batch", json={
+        "guest_counts": [10], "downpayment_percents": [20]
+    }).status_code == 400
+
+    other = make_booking(db, caterer, status="draft", package_id=booking.package_id)
+    assert client.post(f"/api/bookings/{other.id}/calculate/batch", json={"guest_counts": [10]}).status_code == 404
+
+# --- pricing rules ---
+
+def test_amounts_convert_to_whole_centavos():
+    assert to_cents(0.1 + 0.2) == 30
+    assert to_cents("19.999") == 2000
+    assert to_cents(None) == 0
+    assert from_cents(123456) == 1234.56
+
+def quote(rules, guests, percent=30, overtime=0, addons=0):
+    return pricing_engine.quote(rules, addons, guests, percent, overtime)
+
+def test_flat_price_per_guest():
+    amounts = quote(PricingRules(unit_price_cents=45000), 30)
+    assert amounts["total_amount"] == Decimal("13500")
+    assert amounts["deposit_amount"] == Decimal("4050")
+
+def test_guests_beyond_the_package_minimum_use_the_additional_price():
+    rules = PricingRules(unit_price_cents=45000, included_guests=50, extra_guest_cents=40000)
+    assert quote(rules, 50)["base_amount"] == Decimal("22500")
+    assert quote(rules, 51)["base_amount"] == Decimal("22900")
+    assert quote(rules, 80)["base_amount"] == Decimal("34500")
+    # Fewer guests than the minimum are still billed per head
+    assert quote(rules, 20)["base_amount"] == Decimal("9000")
+
+def test_minimum_contract_floors_the_guest_charge():
+    rules = PricingRules(unit_price_cents=45000, min_contract_cents=2500000)
+    assert quote(rules, 40)["base_amount"] == Decimal("25000")
+    assert quote(rules, 60)["base_amount"] == Decimal("27000")
+
+def test_overtime_is_added_on_top_of_the_minimum():
+    rules = PricingRules(unit_price_cents=45000, min_contract_cents=2500000, service_hours=4, overtime_cents=150000)
+    amounts = quote(rules, 10, overtime=2)
+    assert (amounts["base_amount"], amounts["overtime_amount"], amounts["total_amount"]) == (Decimal("25000"), Decimal("3000"), Decimal("28000"))
+    with pytest.raises(ValueError):
+        quote(rules, 10, overtime=pricing_engine.MAX_OVERTIME_HOURS + 1)
+
+def test_percentage_discounts_round_half_up_to_the_centavo():
+    rules = PricingRules(unit_price_cents=9999, promotions=(PromotionRule(1, percent_bp=1250),))
+    amounts = quote(rules, 3)
+    # 12.5% of 299.97 is 37.49625
+    assert (amounts["discount_amount"], amounts["total_amount"]) == (Decimal("37.5"), Decimal("262.47"))
+
+def test_best_promotion_wins_and_never_goes_below_zero():
+    both = (PromotionRule(1, percent_bp=1000), PromotionRule(2, fixed_cents=300000))
+    rules = PricingRules(unit_price_cents=100000, promotions=both)
+    assert quote(rules, 20)["discount_amount"] == Decimal("3000") # 10% would be 2,000
+    assert quote(rules, 40)["discount_amount"] == Decimal("4000") # 10% beats 3,000 off
+    assert quote(rules, 2)["total_amount"] == Decimal("0") # 3,000 off a 2,000 order
+
+def test_deposits_round_half_up():
+    assert pricing_engine.deposit(10001, 50) == Decimal("50.01")
+    assert quote(PricingRules(unit_price_cents=3487545), 1)["deposit_amount"] == Decimal("10462.64")
+    with pytest.raises(ValueError):
+        quote(PricingRules(unit_price_cents=100), 1, percent=pricing_engine.DOWNPAYMENT_MAX + 1)
+
+def test_all_rules_together():
+    amounts = quote(RULES, 80, overtime=2, addons=ADDONS)
+    assert amounts == {
+        "base_amount": Decimal("34500"),
+        "overtime_amount": Decimal("3000"),
+        "discount_amount": Decimal("3875.05"),
+        "total_amount": Decimal("34875.45"),
+        "deposit_amount": Decimal("10462.64"),
+    }
+
+def test_snapshot_round_trip():
+    assert PricingRules.from_snapshot({"pricing_rules": RULES.snapshot()}) == RULES
+    # Quotations from before compiled rules only carry the unit price
+    assert PricingRules.from_snapshot({"unit_price": 450.5}) == PricingRules(unit_price_cents=45050)
+
+# --- rules from the database ---
+
+def add_promotion(db, caterer, discount_type, value, days_left=7, **values):
+    db.add(models.Promotion(caterer_id=caterer.id, title="Promo", discount_type=discount_type, discount_value=value,
+                            start_date=date.today() - timedelta(days=1), end_date=date.today() + timedelta(days=days_left), **values))
+    db.flush()
+
+def test_package_rules_pick_up_active_promotions_only(db):
+    caterer = make_caterer(db)
+    package = make_package(db, caterer)
+    add_promotion(db, caterer, "percentage", 10)
+    add_promotion(db, caterer, "fixed", 3000)
+    add_promotion(db, caterer, "fixed", 9000, is_active=False)
+    add_promotion(db, caterer, "percentage", 50, days_left=-2)
+
+    rules = pricing_engine.rules(db, pricing_engine.load(db, package.id))
+    assert rules == RULES.with_promotions(rules.promotions)
+    assert sorted((p.percent_bp, p.fixed_cents) for p in rules.promotions) == [(0, 300000), (1000, 0)]
+
+def test_quotation_records_the_quoted_amounts(db, client):
+    caterer = make_caterer(db)
+    package = make_package(db, caterer)
+    add_promotion(db, caterer, "percentage", 10)
+    add_promotion(db, caterer, "fixed", 3000)
+    addon = models.MenuItem(package_id=package.id, name="Lechon", is_addon=True, addon_price=1250.50)
+    db.add(addon)
+    db.flush()
+    booking = make_booking(db, caterer, status="draft", package_id=package.id, guest_count=80)
+    db.add(models.BookingMenuItem(booking_id=booking.id, menu_item_id=addon.id, is_add_on=True, price=1250.50))
+    db.flush()
+
+    quotation = quotation_service.create_quotation(db, booking, 30, overtime_hours=2)
+    assert quotation.total_amount == Decimal("34875.45")
+    assert quotation.addons == [{"id": addon.id, "name": "Lechon", "price": 1250.5}]
+    details = quotation.package_details
+    assert (details["base_amount"], details["overtime_amount"], details["discount_amount"]) == (34500, 3000, 3875.05)
+    assert (booking.total_amount, booking.reservation_fee) == (34875.45, Decimal("10462.64"))
+
+    # Later price changes don't reach what-if prices for a quoted booking
+    package.price_per_head = 999
+    pricing_engine.bump_version(db, package.id)
+    login(client, booking.user)
+    body = client.post(f"/api/bookings/{booking.id}/calculate/batch", json={"guest_counts": [80], "downpayment_percents": [30]}).json()
+    assert (body["total_amounts"], body["deposit_amounts"]) == ([34875.45], [[10462.64]])
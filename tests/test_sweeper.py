@@ -0,0 +1,117 @@
+import os
+import sys
+
+# Add project root to path so we can import app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import timedelta
+from app.db import models
+from app.services.contracts import contract_renderer
+from app.services.sweeper import booking_sweeper
+from conftest import NOW, day_slot, fresh, make_booking, make_caterer
+
+OVERDUE = NOW - timedelta(hours=1)
+LONG_EXPIRED = NOW - booking_sweeper.PURGE_AFTER - timedelta(days=1)
+
+def test_expire_takes_unpaid_bookings_past_their_deadline(db):
+    caterer = make_caterer(db)
+    expired = [
+        make_booking(db, caterer, status="draft", expires_at=OVERDUE),
+        make_booking(db, caterer, status="pending", expires_at=OVERDUE, holds_slot=True, guest_count=20),
+        make_booking(db, caterer, status="pending_payment", expires_at=OVERDUE),
+    ]
+    kept = [
+        make_booking(db, caterer, status="pending", expires_at=NOW + timedelta(hours=1)),
+        make_booking(db, caterer, status="pending", expires_at=OVERDUE, payment_status="paid"),
+        make_booking(db, caterer, status="pending", expires_at=OVERDUE, payment_status="deposit_paid"),
+        make_booking(db, caterer, status="confirmed", expires_at=OVERDUE),
+    ]
+    assert booking_sweeper.expire_batch(db, NOW, 50) == 3
+    assert [fresh(db, b).status for b in expired] == ["expired"] * 3
+    assert [fresh(db, b).status for b in kept] == ["pending", "pending", "pending", "confirmed"]
+    # The pending booking's slot went back to the pool
+    assert day_slot(db, caterer.id) == (0, 0)
+    assert booking_sweeper.expire_batch(db, NOW, 50) == 0
+
+def test_expire_ages_out_drafts_without_a_deadline(db):
+    stale = make_booking(db, status="draft", created_at=NOW - booking_sweeper.DRAFT_TTL - timedelta(minutes=1))
+    recent = make_booking(db, status="draft", created_at=NOW - timedelta(hours=1))
+    assert booking_sweeper.expire_batch(db, NOW, 50) == 1
+    stale = fresh(db, stale)
+    # Stamped so the purge pass can age it out later
+    assert (stale.status, stale.expires_at) == ("expired", NOW)
+    assert fresh(db, recent).status == "draft"
+
+def add_history(db, booking, status, created_at):
+    db.add(models.BookingHistory(booking_id=booking.id, status=status, notes="test", created_at=created_at))
+    db.flush()
+
+def test_expire_waits_for_payments_that_may_still_arrive(db):
+    recent_link = make_booking(db, status="pending_payment", expires_at=OVERDUE)
+    add_history(db, recent_link, "pending_payment", NOW - timedelta(minutes=30))
+    old_link = make_booking(db, status="pending_payment", expires_at=OVERDUE)
+    add_history(db, old_link, "pending_payment", NOW - booking_sweeper.PAYMENT_LINK_TTL - timedelta(minutes=1))
+    unapplied = make_booking(db, status="pending", expires_at=OVERDUE)
+    applied = make_booking(db, status="pending", expires_at=OVERDUE)
+    db.add_all([
+        models.PaymentEvent(event_id="evt_waiting", event_type="mock", booking_id=unapplied.id, payload={}, status="received"),
+        models.PaymentEvent(event_id="evt_done", event_type="mock", booking_id=applied.id, payload={}, status="ignored"),
+    ])
+    db.flush()
+
+    assert booking_sweeper.expire_batch(db, NOW, 50) == 2
+    assert fresh(db, recent_link).status == "pending_payment"
+    assert fresh(db, unapplied).status == "pending"
+    assert fresh(db, old_link).status == "expired"
+    assert fresh(db, applied).status == "expired"
+
+def test_sweep_works_through_bounded_batches(db):
+    caterer = make_caterer(db)
+    for _ in range(5):
+        make_booking(db, caterer, status="pending", expires_at=OVERDUE)
+    assert booking_sweeper.expire_batch(db, NOW, 2) == 2
+    assert booking_sweeper.sweep(db, batch_size=2, now=NOW)["expired"] == 3
+
+def write_contract(booking_id):
+    path = contract_renderer.path_for(booking_id, "ab" * 32)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "wb").close()
+
+def test_purge_deletes_long_expired_unpaid_bookings(db, monkeypatch, tmp_path):
+    monkeypatch.setattr(contract_renderer, "directory", str(tmp_path))
+    caterer = make_caterer(db)
+    purged = make_booking(db, caterer, status="expired", expires_at=LONG_EXPIRED)
+    recent = make_booking(db, caterer, status="expired", expires_at=NOW - timedelta(days=2))
+    paid = make_booking(db, caterer, status="expired", expires_at=LONG_EXPIRED, payment_status="paid")
+    active = make_booking(db, caterer, status="pending", expires_at=LONG_EXPIRED)
+    for booking in (purged, recent):
+        write_contract(booking.id)
+
+    assert booking_sweeper.purge_batch(db, NOW, 50) == 1
+    assert fresh(db, purged) is None
+    assert [fresh(db, b).status for b in (recent, paid, active)] == ["expired", "expired", "pending"]
+    # Rendered contracts hold customer PII and go with the booking
+    assert os.listdir(tmp_path) == [str(recent.id)]
+    assert booking_sweeper.purge_batch(db, NOW, 50) == 0
+
+def test_purge_removes_dependents_and_keeps_audit_records(db):
+    booking = make_booking(db, status="expired", expires_at=LONG_EXPIRED)
+    add_history(db, booking, "expired", LONG_EXPIRED)
+    db.add_all([
+        models.Quotation(booking_id=booking.id, total_amount=1000),
+        models.IdempotencyKey(booking_id=booking.id, action="reservation_payment", key="k1"),
+        models.PaymentEvent(event_id="evt_audit", event_type="mock", booking_id=booking.id, payload={}, status="ignored"),
+        models.FraudFlag(booking_id=booking.id, flag_type="late_payment", description="audit"),
+    ])
+    db.flush()
+
+    booking_id = booking.id
+    assert booking_sweeper.purge_batch(db, NOW, 50) == 1
+    for table in booking_sweeper.DEPENDENT_TABLES:
+        assert db.query(table).filter(table.booking_id == booking_id).count() == 0
+    event = db.query(models.PaymentEvent).filter(models.PaymentEvent.event_id == "evt_audit").one()
+    flag = db.query(models.FraudFlag).filter(models.FraudFlag.description == "audit").one()
+    assert (event.booking_id, flag.booking_id) == (None, None)
+
+def test_dependent_and_detached_tables_are_disjoint():
+    assert not set(booking_sweeper.DEPENDENT_TABLES) & set(booking_sweeper.DETACHED_TABLES)